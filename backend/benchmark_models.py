@@ -0,0 +1,94 @@
+"""Benchmark the GGUF models in models/ and pick the one the backend should use.
+
+Run from the backend directory:
+
+    python benchmark_models.py run                   # new or changed models
+    python benchmark_models.py run --threads 4,8 --force
+    python benchmark_models.py report                # stored results
+    python benchmark_models.py select                # what the backend would load
+
+Each model is loaded in a fresh process per thread count and given an
+itinerary-shaped prompt; load time, prompt-eval and decode tokens/sec and
+peak RSS are stored in cache/model_benchmarks.json. Unless LLM_MODEL_PATH is
+set, the backend loads the fastest model at or above VB_MODEL_MIN_QUALITY,
+preferring ones that meet VB_MODEL_TARGET_SECONDS.
+"""
+import argparse
+import json
+import os
+
+def parse_threads(value: str):
+    try:
+        return sorted({int(n) for n in value.split(',')})
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected comma-separated integers, got {value!r}")
+
+def print_report(entries, choice):
+    print(f"{'model':<44} {'tier':<9} {'threads':>7} {'load s':>7} {'eval t/s':>9} "
+          f"{'gen t/s':>8} {'RSS MB':>8} {'plan s':>7}")
+    for entry in entries:
+        for run in entry['runs']:
+            marker = '*' if choice and entry['path'] == choice['path'] and run == entry['best'] else ' '
+            if 'error' in run:
+                print(f"{marker}{entry['name'][:43]:<43} {entry['tier']:<9} {run['threads']:>7}  {run['error']}")
+                continue
+            print(f"{marker}{entry['name'][:43]:<43} {entry['tier']:<9} {run['threads']:>7} {run['load_s']:>7} "
+                  f"{run['prompt_tps']:>9} {run['decode_tps']:>8} {run['peak_rss_mb'] or '-':>8} "
+                  f"{run['est_plan_s'] or '-':>7}")
+
+def print_choice(choice):
+    if choice is None:
+        print("\nNo benchmarked model meets the quality tier; the backend uses LLM_MODEL_PATH or the default model")
+        return
+    status = "meets" if choice['meets_target'] else "misses"
+    print(f"\nSelected: {os.path.basename(choice['path'])} on {choice['threads']} threads, "
+          f"~{choice['est_plan_s']}s per typical plan ({status} the {choice['target_seconds']:g}s target)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('command', choices=['run', 'report', 'select'])
+    parser.add_argument('--models-dir', help='directory with .gguf files (default: VB_MODELS_DIR or models)')
+    parser.add_argument('--threads', type=parse_threads, help='thread counts to try (default: 2,4,cores/2,cores)')
+    parser.add_argument('--decode-tokens', type=int, default=128, help='tokens to generate per run (default: 128)')
+    parser.add_argument('--force', action='store_true', help='re-run models that already have results')
+    parser.add_argument('--min-quality', choices=['draft', 'standard', 'high'],
+                        help='lowest acceptable tier (default: VB_MODEL_MIN_QUALITY or standard)')
+    parser.add_argument('--target-seconds', type=float,
+                        help='latency target for a typical plan (default: VB_MODEL_TARGET_SECONDS or 60)')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    from llm.benchmark import BenchmarkStore, benchmark_model, find_models, select_model
+
+    store = BenchmarkStore()
+    models = find_models(args.models_dir)
+    if not models:
+        print(f"No .gguf models found in {args.models_dir or os.getenv('VB_MODELS_DIR', 'models')}")
+        return
+
+    if args.command == 'run':
+        for path in models:
+            if store.get(path) and not args.force:
+                print(f"✓ {os.path.basename(path)} already benchmarked (use --force to redo)")
+                continue
+            print(f"⏱️  Benchmarking {os.path.basename(path)}...")
+            entry = benchmark_model(path, args.threads, args.decode_tokens)
+            store.put(entry)
+            if entry['best']:
+                print(f"   best: {entry['best']['threads']} threads, {entry['best']['prompt_tps']} t/s eval, "
+                      f"{entry['best']['decode_tps']} t/s decode")
+            else:
+                print(f"   failed: {entry['runs'][0].get('error')}")
+
+    entries = [entry for entry in (store.get(path) for path in models) if entry]
+    choice = select_model(args.models_dir, args.min_quality, args.target_seconds, store)
+
+    if args.json:
+        print(json.dumps({'models': entries, 'selected': choice}, indent=2))
+        return
+    if args.command != 'select':
+        print_report(entries, choice)
+    print_choice(choice)
+
+if __name__ == '__main__':
+    main()
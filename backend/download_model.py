@@ -0,0 +1,92 @@
+"""Download a GGUF model into models/ with parallel, resumable range requests.
+
+Run from the backend directory:
+
+    python download_model.py mistral-7b-instruct     # a catalog name
+    python download_model.py https://host/path/model.Q4_K_M.gguf --sha256 <hex>
+    python download_model.py --list
+
+An interrupted download (Ctrl-C, a dropped connection) continues from the
+chunks already on disk when the same command is run again. The SHA-256 is
+computed while the file streams in and checked against --sha256 or, for
+Hugging Face, the hash it publishes; the model only appears in models/ once
+it has been verified.
+"""
+import argparse
+import sys
+import threading
+
+def format_bytes(count) -> str:
+    if count is None:
+        return '?'
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if count < 1024 or unit == 'GB':
+            return f"{count:.1f} {unit}" if unit != 'B' else f"{count} B"
+        count /= 1024
+
+def print_progress(status):
+    percent = f"{status['percent']:5.1f}%" if status['percent'] is not None else '    ?%'
+    eta = f", {status['eta_seconds'] // 60}m{status['eta_seconds'] % 60:02d}s left" if status['eta_seconds'] else ''
+    line = (f"\r   {percent} {format_bytes(status['downloaded_bytes'])} of {format_bytes(status['total_bytes'])} "
+            f"at {format_bytes(status['bytes_per_second'])}/s{eta} "
+            f"(verified {format_bytes(status['verified_bytes'])})")
+    sys.stdout.write(f"{line:<100}")
+    sys.stdout.flush()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('model', nargs='?', help='catalog name or http(s) URL of a .gguf file')
+    parser.add_argument('--name', help='file name in the models directory (default: from the URL)')
+    parser.add_argument('--sha256', help='expected SHA-256 of the file')
+    parser.add_argument('--connections', type=int, help='parallel range requests (default: VB_DOWNLOAD_CONNECTIONS or 4)')
+    parser.add_argument('--models-dir', help='target directory (default: VB_MODELS_DIR or models)')
+    parser.add_argument('--list', action='store_true', help='show the catalog')
+    args = parser.parse_args()
+
+    from llm.download import CATALOG, DownloadCancelled, DownloadError, ModelDownload, resolve
+
+    if args.list or not args.model:
+        for name, url in CATALOG.items():
+            print(f"{name:<22} {url}")
+        return
+
+    try:
+        download = ModelDownload(resolve(args.model), args.name, args.sha256, args.models_dir, args.connections)
+    except ValueError as e:
+        parser.error(str(e))
+
+    print(f"⬇️  {download.name} -> {download.path}")
+    result = {}
+
+    def run():
+        try:
+            result['path'] = download.run()
+        except DownloadError as e:
+            result['error'] = e
+
+    thread = threading.Thread(target=run, name='download')
+    thread.start()
+    try:
+        while thread.is_alive():
+            thread.join(0.5)
+            print_progress(download.status())
+    except KeyboardInterrupt:
+        download.cancel()
+        thread.join()
+    print()
+
+    status = download.status()
+    if isinstance(result.get('error'), DownloadCancelled):
+        print("⏸️  Stopped; run the same command again to resume")
+        sys.exit(130)
+    if 'error' in result:
+        print(f"❌ {result['error']}")
+        sys.exit(1)
+    if status['sha256'] is None:
+        print(f"✓ {result['path']} is already there")
+        return
+    checksum = "verified" if status['checksum_verified'] else "no published checksum to compare"
+    print(f"✅ {result['path']} (SHA-256 {status['sha256']}, {checksum})")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,12 @@
+import os
+
+def mediawiki_api(host: str) -> str:
+    """api.php URL of a wiki, e.g. "en.wikivoyage.org"
+
+    VB_MEDIAWIKI_BASE_URL reroutes every wiki to one server (such as the
+    load-test stub), with the host kept as the first path segment.
+    """
+    base = os.getenv("VB_MEDIAWIKI_BASE_URL")
+    if base:
+        return f"{base.rstrip('/')}/{host}/w/api.php"
+    return f"https://{host}/w/api.php"
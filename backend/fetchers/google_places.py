@@ -1,15 +1,47 @@
-import googlemaps
+import contextvars
 import os
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Optional
-import requests
+from .places_cache import PlacesCache
+from .rate_limiter import TokenBucket
+from .resilience import ResilientSession
 
 class GooglePlacesFetcher:
     """Fetch data from Google Places API"""
 
+    # Place Details field masks: only request what callers use. Basic and
+    # Contact fields are billed far below Atmosphere fields like reviews.
+    DETAIL_FIELDS = ['name', 'formatted_address', 'rating', 'opening_hours', 'website']
+    REVIEW_FIELDS = ['reviews']
+    HOURS_FIELDS = ['opening_hours']
+
     def __init__(self):
         self.api_key = os.getenv("GOOGLE_PLACES_API_KEY", "")
+        self.cache = None
+        self.limiter = None
+
         if self.api_key:
-            self.client = googlemaps.Client(key=self.api_key)
+            import googlemaps
+
+            client_kwargs = {
+                'key': self.api_key,
+                # Text search and details are cheap to retry but billed, so no hedging
+                'requests_session': ResilientSession('places', hedge=False)
+            }
+            # Point at a local stub of the Places endpoints for testing
+            base_url = os.getenv("GOOGLE_PLACES_BASE_URL")
+            if base_url:
+                client_kwargs['base_url'] = base_url.rstrip('/')
+            self.client = googlemaps.Client(**client_kwargs)
+
+            self.cache = PlacesCache()
+            self.limiter = TokenBucket(
+                rate=float(os.getenv("GOOGLE_PLACES_QPS", "5")),
+                burst=int(os.getenv("GOOGLE_PLACES_BURST", "5")),
+                daily_quota=int(os.getenv("GOOGLE_PLACES_DAILY_QUOTA", "1000")),
+                quota_store=self.cache
+            )
         else:
             self.client = None
             print("Warning: GOOGLE_PLACES_API_KEY not set. Google Places features disabled.")
@@ -19,47 +51,119 @@ class GooglePlacesFetcher:
         if not self.client:
             return []
 
+        query = f"tourist attractions in {location}"
+
+        # Serve from cache when every place for this query is still retained;
+        # an empty list (stored by older versions) is a miss, not an answer
+        place_ids = self.cache.get_query(query)
+        if place_ids:
+            cached = [self.cache.get_place(pid, 'summary') for pid in place_ids[:limit]]
+            if all(cached):
+                return cached
+
+        if not self._acquire(f"text search for {location}"):
+            return []
+
         try:
             # Get place details
             places_result = self.client.places(
-                query=f"tourist attractions in {location}",
+                query=query,
                 type="tourist_attraction"
             )
 
             attractions = []
-            for place in places_result.get('results', [])[:limit]:
-                attractions.append({
+            for place in places_result.get('results', []):
+                geo = place.get('geometry', {}).get('location', {})
+                attraction = {
                     'name': place.get('name', ''),
                     'address': place.get('formatted_address', ''),
                     'rating': place.get('rating', 0),
                     'types': place.get('types', []),
-                    'place_id': place.get('place_id', '')
-                })
+                    'place_id': place.get('place_id', ''),
+                    'lat': geo.get('lat'),
+                    'lng': geo.get('lng')
+                }
+                attractions.append(attraction)
+                if attraction['place_id']:
+                    self.cache.put_place(attraction['place_id'], 'summary', attraction)
 
-            return attractions
+            # No results may be a transient upstream problem (or
+            # ZERO_RESULTS); don't pin that for the whole QUERY_TTL
+            place_ids = [a['place_id'] for a in attractions if a['place_id']]
+            if place_ids:
+                self.cache.put_query(query, place_ids)
+            return attractions[:limit]
         except Exception as e:
             print(f"Error fetching attractions for {location}: {e}")
             return []
 
-    def get_place_details(self, place_id: str) -> Optional[Dict]:
+    def get_place_details(self, place_id: str, fields: Optional[List[str]] = None) -> Optional[Dict]:
         """Get detailed information about a place"""
         if not self.client:
             return None
 
+        fields = fields or self.DETAIL_FIELDS
+        kind = 'details:' + ','.join(sorted(fields))
+
+        cached = self.cache.get_place(place_id, kind)
+        if cached is not None:
+            return cached
+
+        if not self._acquire(f"details for {place_id}"):
+            return None
+
         try:
-            details = self.client.place(
-                place_id=place_id,
-                fields=['name', 'rating', 'reviews', 'photos', 'formatted_address',
-                        'opening_hours', 'website', 'formatted_phone_number']
-            )
-            return details.get('result', {})
+            details = self.client.place(place_id=place_id, fields=fields)
+            result = details.get('result', {})
+            self.cache.put_place(place_id, kind, result)
+            return result
         except Exception as e:
             print(f"Error fetching place details: {e}")
             return None
 
+    def get_top_place_details(self, places: List[Dict], top_n: int = 5,
+                              fields: Optional[List[str]] = None) -> Dict[str, Dict]:
+        """Fetch details for the top-N places concurrently, keyed by place_id
+
+        Each lookup goes through the cache and the rate limiter like
+        get_place_details.
+        """
+        place_ids = [p['place_id'] for p in places[:top_n] if p.get('place_id')]
+        if not self.client or not place_ids:
+            return {}
+
+        # Workers run in the caller's context so deadlines and trace spans apply
+        context = contextvars.copy_context()
+        with ThreadPoolExecutor(max_workers=min(len(place_ids), 5)) as pool:
+            results = pool.map(lambda pid: context.copy().run(self.get_place_details, pid, fields), place_ids)
+
+        return {pid: details for pid, details in zip(place_ids, results) if details}
+
+    @staticmethod
+    def summarize_hours(opening_hours: Optional[Dict]) -> str:
+        """One line from Places weekday_text, e.g. '9:00 AM – 7:00 PM, closed Monday'"""
+        days = {}
+        for line in (opening_hours or {}).get('weekday_text', []):
+            day, _, hours = line.partition(': ')
+            if hours.strip():
+                days[day] = hours.strip()
+        if not days:
+            return ''
+
+        closed = [day for day, hours in days.items() if hours.lower() == 'closed']
+        open_hours = [hours for hours in days.values() if hours.lower() != 'closed']
+        if not open_hours:
+            return 'closed'
+
+        usual = Counter(open_hours).most_common(1)[0][0]
+        summary = usual if len(set(open_hours)) == 1 else f"usually {usual}"
+        if closed:
+            summary += f", closed {', '.join(closed)}"
+        return summary
+
     def get_reviews(self, place_id: str, limit: int = 5) -> List[Dict]:
         """Get reviews for a place"""
-        details = self.get_place_details(place_id)
+        details = self.get_place_details(place_id, fields=self.REVIEW_FIELDS)
         if not details:
             return []
 
@@ -70,3 +174,11 @@ class GooglePlacesFetcher:
             'text': r.get('text', ''),
             'time': r.get('relative_time_description', '')
         } for r in reviews]
+
+    def _acquire(self, what: str) -> bool:
+        """Take a rate-limiter token, logging when the daily quota is spent"""
+        if self.limiter.acquire():
+            return True
+        print(f"Google Places quota/rate limit reached, skipping {what} "
+              f"({self.limiter.remaining_today()} requests left today)")
+        return False
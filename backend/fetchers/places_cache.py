@@ -0,0 +1,105 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+class PlacesCache:
+    """Persistent SQLite cache for Google Places results
+
+    Google's terms allow place IDs to be stored indefinitely, but other
+    place content (names, ratings, reviews, ...) only for up to 30 days.
+    Queries therefore map to place IDs with no content, and the content
+    itself lives in a separate table with a retention TTL.
+    """
+
+    CONTENT_TTL = 30 * 24 * 3600
+    QUERY_TTL = 90 * 24 * 3600  # Refresh rankings now and then
+
+    def __init__(self, path: Optional[str] = None):
+        cache_dir = os.getenv("VB_CACHE_DIR", "cache")
+        self.path = path or os.path.join(cache_dir, "places.sqlite")
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS queries (
+                query TEXT PRIMARY KEY,
+                place_ids TEXT NOT NULL,
+                fetched_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS places (
+                place_id TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                data TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                PRIMARY KEY (place_id, kind)
+            );
+            CREATE TABLE IF NOT EXISTS usage (
+                day TEXT PRIMARY KEY,
+                requests INTEGER NOT NULL
+            );
+        """)
+        self.purge_expired()
+
+    def get_query(self, query: str) -> Optional[List[str]]:
+        """Return cached place IDs for a text search query"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT place_ids, fetched_at FROM queries WHERE query = ?", (query,)
+            ).fetchone()
+        if not row or time.time() - row[1] > self.QUERY_TTL:
+            return None
+        return json.loads(row[0])
+
+    def put_query(self, query: str, place_ids: List[str]):
+        """Store the place IDs returned for a text search query"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO queries VALUES (?, ?, ?)",
+                (query, json.dumps(place_ids), time.time())
+            )
+
+    def get_place(self, place_id: str, kind: str) -> Optional[Dict]:
+        """Return cached place content of a given kind ('summary', 'details', ...)"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, fetched_at FROM places WHERE place_id = ? AND kind = ?",
+                (place_id, kind)
+            ).fetchone()
+        if not row or time.time() - row[1] > self.CONTENT_TTL:
+            return None
+        return json.loads(row[0])
+
+    def put_place(self, place_id: str, kind: str, data: Dict):
+        """Store place content of a given kind"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO places VALUES (?, ?, ?, ?)",
+                (place_id, kind, json.dumps(data), time.time())
+            )
+
+    def get_usage(self, day: str) -> int:
+        """Return the number of billed requests recorded for a UTC day"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT requests FROM usage WHERE day = ?", (day,)
+            ).fetchone()
+        return row[0] if row else 0
+
+    def set_usage(self, day: str, requests: int):
+        """Record the number of billed requests for a UTC day"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO usage VALUES (?, ?)", (day, requests)
+            )
+
+    def purge_expired(self):
+        """Delete place content older than the retention window"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM places WHERE fetched_at < ?",
+                (time.time() - self.CONTENT_TTL,)
+            )
@@ -0,0 +1,74 @@
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+class TokenBucket:
+    """Thread-safe token bucket with an optional daily request quota
+
+    Tokens refill continuously at `rate` per second up to `burst`. When a
+    `quota_store` is given (anything with get_usage/set_usage, e.g.
+    PlacesCache), the daily count survives restarts.
+    """
+
+    def __init__(self, rate: float, burst: int = 1, daily_quota: Optional[int] = None,
+                 quota_store=None):
+        if rate <= 0:
+            raise ValueError(f"Token bucket rate must be positive, got {rate}")
+        self.rate = rate
+        self.burst = burst
+        self.daily_quota = daily_quota
+        self.quota_store = quota_store
+
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+        self._day = self._today()
+        self._used_today = quota_store.get_usage(self._day) if quota_store else 0
+
+    def acquire(self, timeout: float = 10.0) -> bool:
+        """Wait for a token; False if the daily quota is spent or the wait times out"""
+        deadline = time.monotonic() + timeout
+
+        while True:
+            with self._lock:
+                self._roll_day()
+                if self.daily_quota is not None and self._used_today >= self.daily_quota:
+                    return False
+
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    self._used_today += 1
+                    if self.quota_store:
+                        self.quota_store.set_usage(self._day, self._used_today)
+                    return True
+
+                wait = (1 - self._tokens) / self.rate
+
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    def remaining_today(self) -> Optional[int]:
+        """Requests left in today's quota (None if unlimited)"""
+        if self.daily_quota is None:
+            return None
+        with self._lock:
+            self._roll_day()
+            return max(0, self.daily_quota - self._used_today)
+
+    def _roll_day(self):
+        """Reset the daily counter at UTC midnight"""
+        today = self._today()
+        if today != self._day:
+            self._day = today
+            self._used_today = self.quota_store.get_usage(today) if self.quota_store else 0
+
+    @staticmethod
+    def _today() -> str:
+        return datetime.now(timezone.utc).strftime("%Y-%m-%d")
@@ -0,0 +1,268 @@
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, as_completed
+from contextlib import contextmanager
+from typing import Dict, Optional
+import urllib.parse
+import requests
+from profiling import span
+from .rate_limiter import TokenBucket
+
+class SourceUnavailable(Exception):
+    """Raised instead of calling a source whose circuit is open or whose deadline passed"""
+
+class CircuitBreaker:
+    """Rolling-window circuit breaker driven by error rate and slow calls
+
+    closed    -> calls pass; opens when, over the last `window` seconds and at
+                 least `min_calls` calls, the share of failed or slow calls
+                 reaches `failure_rate`
+    open      -> calls are rejected for `cooldown` seconds
+    half_open -> one probe call is let through; success closes, failure reopens
+    """
+
+    def __init__(self, name: str, window: float = 60.0, min_calls: int = 5,
+                 failure_rate: float = 0.5, slow_call_seconds: float = 4.0,
+                 cooldown: float = 30.0):
+        self.name = name
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.cooldown = cooldown
+
+        self._calls = deque()  # (timestamp, ok, latency)
+        self._state = 'closed'
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def allow(self) -> bool:
+        """Whether a call may go out now"""
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == 'closed':
+                return True
+            if self._state == 'half_open' and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record(self, ok: bool, latency: float):
+        """Record the outcome of a call"""
+        now = time.monotonic()
+        with self._lock:
+            if self._state == 'half_open':
+                self._probe_in_flight = False
+                if ok and latency < self.slow_call_seconds:
+                    self._state = 'closed'
+                    self._calls.clear()
+                else:
+                    self._open(now)
+                return
+
+            self._calls.append((now, ok, latency))
+            self._trim(now)
+
+            if len(self._calls) >= self.min_calls:
+                bad = sum(1 for _, ok_, lat in self._calls if not ok_ or lat >= self.slow_call_seconds)
+                if bad / len(self._calls) >= self.failure_rate:
+                    self._open(now)
+
+    def p95(self, min_samples: int = 10) -> Optional[float]:
+        """95th percentile latency of successful calls in the window"""
+        with self._lock:
+            self._trim(time.monotonic())
+            latencies = sorted(lat for _, ok, lat in self._calls if ok)
+        if len(latencies) < min_samples:
+            return None
+        return latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+
+    def snapshot(self) -> Dict:
+        """State summary for health reporting"""
+        p95 = self.p95()
+        with self._lock:
+            calls = len(self._calls)
+            failures = sum(1 for _, ok, _ in self._calls if not ok)
+        return {
+            'state': self.state,
+            'calls': calls,
+            'failures': failures,
+            'p95_seconds': round(p95, 3) if p95 is not None else None
+        }
+
+    def _open(self, now: float):
+        self._state = 'open'
+        self._opened_at = now
+        print(f"⚡ Circuit for {self.name} opened; skipping it for {self.cooldown:.0f}s")
+
+    def _maybe_half_open(self):
+        if self._state == 'open' and time.monotonic() - self._opened_at >= self.cooldown:
+            self._state = 'half_open'
+            self._probe_in_flight = False
+
+    def _trim(self, now: float):
+        while self._calls and now - self._calls[0][0] > self.window:
+            self._calls.popleft()
+
+# Time budget (seconds) each source gets within one fetch scope, e.g. the
+# enrichment of one destination. Override with VB_SOURCE_SLOS="commons=4,...".
+DEFAULT_SLOS = {
+    'wikivoyage': 8.0,
+    'commons': 5.0,
+    'images': 6.0,
+    'places': 6.0,
+}
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+_deadlines: contextvars.ContextVar = contextvars.ContextVar('source_deadlines', default=None)
+_host_limits: contextvars.ContextVar = contextvars.ContextVar('host_limits', default=None)
+_hedge_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix='hedge')
+
+def _load_slos() -> Dict[str, float]:
+    slos = dict(DEFAULT_SLOS)
+    for item in os.getenv("VB_SOURCE_SLOS", "").split(','):
+        if '=' in item:
+            name, seconds = item.split('=', 1)
+            slos[name.strip()] = float(seconds)
+    return slos
+
+SOURCE_SLOS = _load_slos()
+
+def get_breaker(source: str) -> CircuitBreaker:
+    """Shared breaker for a source"""
+    with _breakers_lock:
+        if source not in _breakers:
+            _breakers[source] = CircuitBreaker(source)
+        return _breakers[source]
+
+def breaker_states() -> Dict[str, Dict]:
+    """Snapshot of every source's breaker"""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {b.name: b.snapshot() for b in breakers}
+
+@contextmanager
+def fetch_deadlines():
+    """Scope in which each source's SLO clock starts at its first call"""
+    token = _deadlines.set({})
+    try:
+        yield
+    finally:
+        _deadlines.reset(token)
+
+def remaining_time(source: str) -> Optional[float]:
+    """Seconds left for a source in the current scope (None outside a scope)"""
+    deadlines = _deadlines.get()
+    slo = SOURCE_SLOS.get(source)
+    if deadlines is None or slo is None:
+        return None
+    deadline = deadlines.setdefault(source, time.monotonic() + slo)
+    return deadline - time.monotonic()
+
+@contextmanager
+def host_rate_limits(rate: float, burst: int = 1):
+    """Scope in which every host is limited to `rate` requests per second
+
+    Used by background jobs (cache warming) that should be polite to
+    upstreams; interactive requests run outside such a scope.
+    """
+    if rate <= 0:
+        raise ValueError(f"Host rate limit must be positive, got {rate}")
+    token = _host_limits.set({'rate': rate, 'burst': burst, 'buckets': {}, 'lock': threading.Lock()})
+    try:
+        yield
+    finally:
+        _host_limits.reset(token)
+
+def throttle(url: str):
+    """Wait for the host's token if a host_rate_limits scope is active"""
+    limits = _host_limits.get()
+    if limits is None:
+        return
+    host = urllib.parse.urlparse(url).netloc
+    with limits['lock']:
+        bucket = limits['buckets'].get(host)
+        if bucket is None:
+            bucket = limits['buckets'][host] = TokenBucket(limits['rate'], limits['burst'])
+    bucket.acquire(timeout=300)
+
+class ResilientSession(requests.Session):
+    """requests.Session guarded by a per-source breaker, deadline and GET hedging
+
+    Inside a host_rate_limits() scope, calls also wait for their host's token.
+    Idempotent GETs that haven't answered after the source's p95 latency get
+    a duplicate request; whichever answers first wins.
+    """
+
+    def __init__(self, source: str, hedge: bool = True, default_timeout: float = 10.0):
+        super().__init__()
+        self.source = source
+        self.hedge = hedge
+        self.default_timeout = default_timeout
+        self.breaker = get_breaker(source)
+        self.verify = False
+
+    def request(self, method, url, **kwargs):
+        # Check the budget first: allow() may hand out the half-open probe,
+        # which must always be followed by a record()
+        timeout = kwargs.get('timeout') or self.default_timeout
+        remaining = remaining_time(self.source)
+        if remaining is not None:
+            if remaining <= 0:
+                raise SourceUnavailable(f"{self.source} exceeded its {SOURCE_SLOS[self.source]:.0f}s budget")
+            timeout = min(timeout, remaining)
+        kwargs['timeout'] = timeout
+
+        if not self.breaker.allow():
+            raise SourceUnavailable(f"{self.source} is unhealthy (circuit open)")
+
+        with span(f"{method.upper()} {self.source}", 'fetch', url=url) as info:
+            throttle(url)
+            started = time.monotonic()
+            try:
+                if self.hedge and method.upper() == 'GET':
+                    response = self._hedged(method, url, kwargs, timeout)
+                else:
+                    response = super().request(method, url, **kwargs)
+            except Exception as e:
+                self.breaker.record(False, time.monotonic() - started)
+                info['error'] = type(e).__name__
+                raise
+            info['status'] = response.status_code
+
+        ok = response.status_code < 500 and response.status_code != 429
+        self.breaker.record(ok, time.monotonic() - started)
+        return response
+
+    def _hedged(self, method, url, kwargs, timeout):
+        """Send a backup request if the first is slower than p95"""
+        send = lambda: requests.Session.request(self, method, url, **kwargs)
+
+        delay = self.breaker.p95()
+        if delay is None or delay >= timeout:
+            return send()
+
+        primary = _hedge_pool.submit(contextvars.copy_context().run, send)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+
+        backup = _hedge_pool.submit(contextvars.copy_context().run, send)
+        error = None
+        for future in as_completed([primary, backup], timeout=timeout):
+            try:
+                return future.result()
+            except Exception as e:
+                error = e
+        raise error
@@ -1,22 +1,63 @@
-import requests
-from bs4 import BeautifulSoup
-from typing import List, Dict, Optional
+import aiohttp
+import asyncio
+import os
+import re
 import time
+import urllib.parse
+import urllib.robotparser
+from lxml import etree
+from typing import List, Dict, Optional
+from profiling import async_span
+from .resilience import throttle
 
 class WebScraper:
-    """Generic web scraper for travel information"""
+    """Async crawler that collects travel tips from configurable sources"""
 
-    def __init__(self):
-        self.headers = {
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
-        }
-        self.session = requests.Session()
-        self.session.headers.update(self.headers)
+    USER_AGENT = 'VacationBuilder/1.0 (+https://github.com/msollami/vacabuilder)'
+
+    # URL templates; {title} is the destination with spaces as underscores,
+    # {query} is the URL-encoded destination name. Override with
+    # VB_TIP_SOURCES (comma separated). Sources must be crawlable: Wikimedia's
+    # robots.txt disallows everything under /w/, so Wikivoyage is read from
+    # its /wiki/ article page (page chrome is skipped while parsing).
+    DEFAULT_SOURCES = [
+        "https://en.wikivoyage.org/wiki/{title}",
+        "https://wikitravel.org/en/{title}",
+    ]
+
+    MAX_PAGE_BYTES = 512 * 1024
+    PAGE_TIMEOUT = 8
+    ROBOTS_TTL = 6 * 3600
+    # An unreachable robots.txt disallows the host, but only briefly
+    ROBOTS_RETRY = 10 * 60
+    CHUNK_SIZE = 16 * 1024
+
+    # Text blocks are only collected from these elements...
+    CONTENT_TAGS = {'p', 'li'}
+    # ...and never from inside page chrome
+    SKIP_TAGS = {'script', 'style', 'nav', 'header', 'footer', 'aside', 'form', 'noscript', 'table'}
+
+    TIP_PATTERN = re.compile(
+        r"\b(avoid|beware|be aware|careful|recommend|best time|don't|do not|"
+        r"make sure|remember|tip|tipping|cash|scam|pickpocket|book ahead|"
+        r"reserve|crowd|closed on|free entry|dress code)\b",
+        re.IGNORECASE
+    )
+
+    def __init__(self, sources: Optional[List[str]] = None):
+        env_sources = os.getenv("VB_TIP_SOURCES")
+        self.sources = sources or (
+            [s.strip() for s in env_sources.split(',') if s.strip()] if env_sources
+            else list(self.DEFAULT_SOURCES)
+        )
+        self.max_page_bytes = int(os.getenv("VB_SCRAPER_MAX_BYTES", self.MAX_PAGE_BYTES))
+
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._robots: Dict[str, tuple] = {}  # host -> (parser, expires_at)
+        self._robots_locks: Dict[str, asyncio.Lock] = {}
 
     def scrape_travel_tips(self, destination: str) -> List[str]:
-        """Scrape general travel tips (placeholder - can be expanded)"""
-        # This is a basic implementation
-        # In production, you'd want to use specific APIs or be more careful with scraping
+        """Generic fallback tips when no source yields anything"""
         tips = [
             f"Research {destination} weather patterns before your trip",
             f"Check visa requirements for {destination}",
@@ -26,35 +67,160 @@ class WebScraper:
         ]
         return tips
 
-    def get_page_content(self, url: str) -> Optional[str]:
-        """Fetch and parse page content"""
-        try:
-            response = self.session.get(url, timeout=10)
-            response.raise_for_status()
+    async def get_page_content(self, url: str) -> Optional[str]:
+        """Fetch a page and return its main text content"""
+        blocks = await self._fetch_blocks(url)
+        if blocks is None:
+            return None
+        return ' '.join(blocks)[:5000]  # Limit to 5000 chars
+
+    async def search_destination_info(self, destination: str, max_tips: int = 5) -> Dict:
+        """Crawl all tip sources in parallel and extract travel tips"""
+        urls = [self._source_url(template, destination) for template in self.sources]
+        results = await asyncio.gather(*(self._fetch_blocks(url) for url in urls))
+
+        tips = []
+        seen = set()
+        for blocks in results:
+            for tip in self._extract_tips(blocks or []):
+                key = tip.lower()
+                if key not in seen:
+                    seen.add(key)
+                    tips.append(tip)
+
+        used_fallback = not tips
+        return {
+            'destination': destination,
+            'tips': tips[:max_tips] if tips else self.scrape_travel_tips(destination),
+            'sources': [url for url, blocks in zip(urls, results) if blocks],
+            'fallback': used_fallback
+        }
 
-            soup = BeautifulSoup(response.content, 'html.parser')
+    async def close(self):
+        """Close the underlying HTTP session"""
+        if self._session and not self._session.closed:
+            await self._session.close()
 
-            # Remove script and style elements
-            for script in soup(["script", "style"]):
-                script.decompose()
+    def _source_url(self, template: str, destination: str) -> str:
+        """Fill a source URL template for a destination"""
+        return template.format(
+            title=urllib.parse.quote(destination.strip().replace(' ', '_')),
+            query=urllib.parse.quote_plus(destination.strip())
+        )
 
-            # Get text
-            text = soup.get_text()
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Lazily create the session inside the running event loop"""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                headers={'User-Agent': self.USER_AGENT},
+                timeout=aiohttp.ClientTimeout(total=self.PAGE_TIMEOUT),
+                connector=aiohttp.TCPConnector(limit_per_host=2, ssl=False)
+            )
+        return self._session
 
-            # Clean up text
-            lines = (line.strip() for line in text.splitlines())
-            chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-            text = ' '.join(chunk for chunk in chunks if chunk)
+    async def _allowed(self, url: str) -> bool:
+        """Check robots.txt for a URL, caching the parsed file per host
 
-            return text[:5000]  # Limit to 5000 chars
+        Follows RFC 9309: a missing robots.txt (4xx) allows everything, while
+        401/403, a server error or no answer at all disallow the host.
+        """
+        parsed = urllib.parse.urlparse(url)
+        host = f"{parsed.scheme}://{parsed.netloc}"
+
+        lock = self._robots_locks.setdefault(host, asyncio.Lock())
+        async with lock:
+            cached = self._robots.get(host)
+            if not cached or time.time() > cached[1]:
+                parser = urllib.robotparser.RobotFileParser()
+                ttl = self.ROBOTS_TTL
+                try:
+                    await self._throttle(f"{host}/robots.txt")
+                    async with self._get_session().get(f"{host}/robots.txt") as response:
+                        if response.status in (401, 403):
+                            parser.disallow_all = True
+                        elif response.status >= 500:
+                            parser.disallow_all = True
+                            ttl = self.ROBOTS_RETRY
+                        elif response.status >= 400:
+                            parser.allow_all = True
+                        else:
+                            parser.parse((await response.text(errors='replace')).splitlines())
+                except Exception as e:
+                    print(f"Error fetching robots.txt for {host}: {e}")
+                    parser.disallow_all = True
+                    ttl = self.ROBOTS_RETRY
+                cached = (parser, time.time() + ttl)
+                self._robots[host] = cached
+
+        return cached[0].can_fetch(self.USER_AGENT, url)
+
+    async def _throttle(self, url: str):
+        """Wait for the host's token inside a host_rate_limits() scope (cache warming)"""
+        # The limiter blocks, so wait on a worker thread; to_thread carries
+        # the scope's context over
+        await asyncio.to_thread(throttle, url)
+
+    async def _fetch_blocks(self, url: str) -> Optional[List[str]]:
+        """Stream a page into lxml and return its main-content text blocks"""
+        try:
+            if not await self._allowed(url):
+                print(f"Skipping {url}: disallowed by robots.txt")
+                return None
+
+            parser = etree.HTMLPullParser(events=('start', 'end'))
+            blocks: List[str] = []
+            skip_depth = 0
+            downloaded = 0
+
+            with async_span("GET tips", 'fetch', url=url) as info:
+                await self._throttle(url)
+                async with self._get_session().get(url) as response:
+                    info['status'] = response.status
+                    response.raise_for_status()
+                    if 'html' not in response.headers.get('Content-Type', 'text/html'):
+                        return None
+
+                    async for chunk in response.content.iter_chunked(self.CHUNK_SIZE):
+                        downloaded += len(chunk)
+                        parser.feed(chunk)
+                        skip_depth = self._drain(parser, blocks, skip_depth)
+                        if downloaded >= self.max_page_bytes:
+                            break  # Enough content; don't pull the rest of the page
+                info['bytes'] = downloaded
+
+            return blocks
         except Exception as e:
             print(f"Error scraping {url}: {e}")
             return None
 
-    def search_destination_info(self, destination: str) -> Dict:
-        """Search for destination information (basic implementation)"""
-        return {
-            'destination': destination,
-            'tips': self.scrape_travel_tips(destination),
-            'note': 'This is a basic scraper. Consider using specific APIs for better data.'
-        }
+    def _drain(self, parser: etree.HTMLPullParser, blocks: List[str], skip_depth: int) -> int:
+        """Consume pending parse events, collecting text outside page chrome"""
+        for event, element in parser.read_events():
+            tag = element.tag if isinstance(element.tag, str) else ''
+            if event == 'start':
+                if tag in self.SKIP_TAGS:
+                    skip_depth += 1
+                continue
+
+            if tag in self.SKIP_TAGS:
+                skip_depth -= 1
+            elif tag in self.CONTENT_TAGS and skip_depth == 0:
+                text = ' '.join(''.join(element.itertext()).split())
+                if text:
+                    blocks.append(text)
+
+            # Free finished subtrees so memory stays flat on long pages
+            if tag in self.CONTENT_TAGS or tag in self.SKIP_TAGS:
+                element.clear(keep_tail=True)
+
+        return skip_depth
+
+    def _extract_tips(self, blocks: List[str]) -> List[str]:
+        """Pick short, advice-like sentences out of content blocks"""
+        tips = []
+        for block in blocks:
+            for sentence in re.split(r'(?<=[.!?])\s+', block):
+                sentence = sentence.strip()
+                if 40 <= len(sentence) <= 220 and self.TIP_PATTERN.search(sentence):
+                    tips.append(sentence)
+        return tips
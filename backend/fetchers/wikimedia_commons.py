@@ -1,152 +1,107 @@
-import requests
-from typing import List
-import urllib.parse
+from typing import Dict, List, Optional
+from .endpoints import mediawiki_api
+from .resilience import ResilientSession
 
 class WikimediaCommonsFetcher:
     """Fetch images from Wikimedia Commons"""
 
-    BASE_URL = "https://commons.wikimedia.org/w/api.php"
+    BASE_URL = mediawiki_api("commons.wikimedia.org")
+
+    # Server-side filters: only raster photos of a usable size
+    ALLOWED_MIME_TYPES = ('image/jpeg', 'image/png', 'image/webp')
+    EXCLUDED_MIME_TYPES = ('image/gif', 'image/tiff', 'image/x-xcf')
+    MIN_WIDTH = 640
+    MIN_HEIGHT = 400
+    THUMB_WIDTH = 800
+
+    # Maximum number of result pages to walk before giving up
+    MAX_PAGES = 3
 
     def __init__(self):
-        self.session = requests.Session()
-        self.session.verify = False
+        self.session = ResilientSession('commons')
 
     def search_images(self, query: str, limit: int = 10) -> List[str]:
         """Search for images related to a location or topic"""
-        try:
-            # Try multiple search strategies
-            all_images = []
-
-            # Strategy 1: Direct search
-            images = self._search_by_query(query, limit)
-            all_images.extend(images)
-
-            # Strategy 2: Search with "landscape" or "city" suffix
-            if len(all_images) < limit:
-                landscape_images = self._search_by_query(f"{query} landscape", limit - len(all_images))
-                all_images.extend(landscape_images)
-
-            # Strategy 3: Search with "tourism" suffix
-            if len(all_images) < limit:
-                tourism_images = self._search_by_query(f"{query} tourism", limit - len(all_images))
-                all_images.extend(tourism_images)
-
-            # Remove duplicates while preserving order
-            seen = set()
-            unique_images = []
-            for img in all_images:
-                if img not in seen:
-                    seen.add(img)
-                    unique_images.append(img)
-
-            return unique_images[:limit]
-
-        except Exception as e:
-            print(f"Error searching Wikimedia Commons for {query}: {e}")
-            return []
+        return self._search(self._build_query([query]), limit)
 
-    def _search_by_query(self, query: str, limit: int) -> List[str]:
-        """Search for images by query"""
+    def get_destination_images(self, destination: str, limit: int = 10) -> List[str]:
+        """Get images for a destination with a single combined search"""
+        search_terms = [
+            destination,
+            f"{destination} city",
+            f"{destination} landscape",
+            f"{destination} architecture",
+            f"{destination} street"
+        ]
+        return self._search(self._build_query(search_terms), limit)
+
+    def _build_query(self, terms: List[str]) -> str:
+        """Build a CirrusSearch query that ORs the terms and filters files server-side"""
+        ored = ' OR '.join(f'"{term}"' for term in terms)
+        # filetype:bitmap excludes SVG/drawings; negate the remaining non-photo bitmaps
+        mimes = ' '.join(f'-filemime:{mime}' for mime in self.EXCLUDED_MIME_TYPES)
+        return (
+            f"({ored}) filetype:bitmap {mimes} "
+            f"filew:>{self.MIN_WIDTH - 1} fileh:>{self.MIN_HEIGHT - 1}"
+        )
+
+    def _search(self, search_query: str, limit: int) -> List[str]:
+        """Run a search generator query and return thumbnail URLs"""
+        params = {
+            'action': 'query',
+            'format': 'json',
+            'formatversion': 2,
+            'generator': 'search',
+            'gsrsearch': search_query,
+            'gsrnamespace': 6,  # File namespace
+            'gsrlimit': min(limit * 2, 50),  # Headroom for client-side checks
+            'prop': 'imageinfo',
+            'iiprop': 'url|size|mime',
+            'iiurlwidth': self.THUMB_WIDTH
+        }
+
+        image_urls = []
+        seen = set()
         try:
-            # Search for files
-            params = {
-                'action': 'query',
-                'format': 'json',
-                'list': 'search',
-                'srsearch': f'File:{query}',
-                'srnamespace': 6,  # File namespace
-                'srlimit': limit * 2,  # Get more to filter
-                'srinfo': 'totalhits'
-            }
-
-            response = self.session.get(self.BASE_URL, params=params, timeout=10)
-            data = response.json()
-
-            search_results = data.get('query', {}).get('search', [])
-
-            image_urls = []
-            for result in search_results:
-                title = result.get('title', '')
-
-                # Filter out non-photo files
-                if self._is_valid_image(title):
-                    url = self._get_image_url(title)
-                    if url:
+            for _ in range(self.MAX_PAGES):
+                response = self.session.get(self.BASE_URL, params=params, timeout=10)
+                data = response.json()
+
+                pages = data.get('query', {}).get('pages', [])
+                # Generator results are unordered; restore search rank
+                pages.sort(key=lambda page: page.get('index', 0))
+
+                for page in pages:
+                    url = self._select_url(page)
+                    if url and url not in seen:
+                        seen.add(url)
                         image_urls.append(url)
                         if len(image_urls) >= limit:
-                            break
+                            return image_urls
+
+                if 'continue' not in data:
+                    break
+                params.update(data['continue'])
 
             return image_urls
 
         except Exception as e:
-            print(f"Error in Wikimedia Commons search: {e}")
-            return []
-
-    def _is_valid_image(self, title: str) -> bool:
-        """Check if the file is a valid image"""
-        lower_title = title.lower()
-
-        # Exclude unwanted file types
-        exclude_keywords = [
-            'icon', 'logo', 'svg', 'map', 'diagram', 'chart',
-            'flag', 'coat', 'seal', 'symbol', 'wikidata',
-            'button', 'banner'
-        ]
-
-        if any(keyword in lower_title for keyword in exclude_keywords):
-            return False
-
-        # Include photo formats
-        valid_extensions = ['.jpg', '.jpeg', '.png', '.webp']
-        return any(ext in lower_title for ext in valid_extensions)
+            print(f"Error searching Wikimedia Commons: {e}")
+            return image_urls
 
-    def _get_image_url(self, title: str) -> str:
-        """Get direct URL for an image"""
-        try:
-            params = {
-                'action': 'query',
-                'format': 'json',
-                'titles': title,
-                'prop': 'imageinfo',
-                'iiprop': 'url',
-                'iiurlwidth': 800  # Get 800px wide version
-            }
-
-            response = self.session.get(self.BASE_URL, params=params, timeout=10)
-            data = response.json()
-
-            pages = data.get('query', {}).get('pages', {})
-            if pages:
-                page = next(iter(pages.values()))
-                imageinfo = page.get('imageinfo', [])
-                if imageinfo:
-                    # Try to get the thumbnail URL, fallback to original
-                    return imageinfo[0].get('thumburl') or imageinfo[0].get('url')
+    def _select_url(self, page: Dict) -> Optional[str]:
+        """Return the thumbnail URL for a page if it passes the image checks"""
+        imageinfo = page.get('imageinfo', [])
+        if not imageinfo:
             return None
 
-        except Exception as e:
-            print(f"Error getting image URL: {e}")
+        info = imageinfo[0]
+        # CirrusSearch filters usually do this already; keep a cheap guard
+        # for mirrors or results served from a stale index
+        if info.get('mime') not in self.ALLOWED_MIME_TYPES:
+            return None
+        if info.get('width', 0) < self.MIN_WIDTH or info.get('height', 0) < self.MIN_HEIGHT:
             return None
 
-    def get_destination_images(self, destination: str, limit: int = 10) -> List[str]:
-        """Get images for a destination using multiple search terms"""
-        all_images = []
-
-        # Search with different terms
-        search_terms = [
-            destination,
-            f"{destination} city",
-            f"{destination} landscape",
-            f"{destination} architecture",
-            f"{destination} street"
-        ]
-
-        for term in search_terms:
-            if len(all_images) >= limit:
-                break
-            images = self.search_images(term, limit=3)
-            all_images.extend(images)
-
-        # Remove duplicates
-        unique_images = list(dict.fromkeys(all_images))
-        return unique_images[:limit]
+        # Try to get the thumbnail URL, fallback to original
+        return info.get('thumburl') or info.get('url')
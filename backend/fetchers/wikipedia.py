@@ -1,3 +1,4 @@
+import os
 import wikipedia
 import requests
 from requests.adapters import HTTPAdapter
@@ -5,6 +6,7 @@ from urllib3.util.retry import Retry
 from typing import Dict, Optional, List
 import ssl
 import urllib3
+from .endpoints import mediawiki_api
 
 # Disable SSL warnings for development
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
@@ -14,6 +16,8 @@ class WikipediaFetcher:
 
     def __init__(self):
         wikipedia.set_lang("en")
+        if os.getenv("VB_MEDIAWIKI_BASE_URL"):
+            wikipedia.wikipedia.API_URL = mediawiki_api("en.wikipedia.org")
 
         # Configure session to bypass SSL verification
         session = requests.Session()
@@ -59,7 +63,7 @@ class WikipediaFetcher:
                 'title': page.title,
                 'summary': page.summary,
                 'url': page.url,
-                'content': page.content[:2000],  # First 2000 chars
+                'content': page.content[:6000],  # Chunked and ranked by the retriever
                 'images': page.images[:5] if hasattr(page, 'images') else []
             }
         except Exception as e:
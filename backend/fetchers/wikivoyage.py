@@ -1,15 +1,16 @@
-import requests
 from typing import Dict, List, Optional
 import re
+from .endpoints import mediawiki_api
+from .resilience import ResilientSession
 
 class WikivoyageFetcher:
     """Fetch travel information from Wikivoyage"""
 
-    BASE_URL = "https://en.wikivoyage.org/w/api.php"
+    BASE_URL = mediawiki_api("en.wikivoyage.org")
 
     def __init__(self):
-        self.session = requests.Session()
-        self.session.verify = False  # Disable SSL verification for development
+        # Breaker, SLO deadline and hedging for every call; verify is off for development
+        self.session = ResilientSession('wikivoyage')
 
     def get_destination_info(self, destination: str) -> Dict:
         """Get comprehensive travel information for a destination"""
@@ -91,12 +92,15 @@ class WikivoyageFetcher:
     def _get_page_images(self, page_title: str) -> List[str]:
         """Get all images from a page"""
         try:
+            # One generator query instead of an imageinfo call per image
             params = {
                 'action': 'query',
                 'format': 'json',
                 'titles': page_title,
-                'prop': 'images',
-                'imlimit': 50
+                'generator': 'images',
+                'gimlimit': 50,
+                'prop': 'imageinfo',
+                'iiprop': 'url'
             }
 
             response = self.session.get(self.BASE_URL, params=params, timeout=10)
@@ -106,49 +110,22 @@ class WikivoyageFetcher:
             if not pages:
                 return []
 
-            page = next(iter(pages.values()))
-            images = page.get('images', [])
-
             # Get image URLs
             image_urls = []
-            for img in images:
-                title = img.get('title', '')
+            for page in pages.values():
+                title = page.get('title', '')
                 # Filter out icons and UI images
-                if not any(x in title.lower() for x in ['icon', 'logo', 'button', 'wikivoyage']):
-                    url = self._get_image_url(title)
-                    if url:
-                        image_urls.append(url)
+                if any(x in title.lower() for x in ['icon', 'logo', 'button', 'wikivoyage']):
+                    continue
+                imageinfo = page.get('imageinfo', [])
+                if imageinfo and imageinfo[0].get('url'):
+                    image_urls.append(imageinfo[0]['url'])
 
             return image_urls
         except Exception as e:
             print(f"Error getting Wikivoyage images: {e}")
             return []
 
-    def _get_image_url(self, image_title: str) -> Optional[str]:
-        """Get direct URL for an image"""
-        try:
-            params = {
-                'action': 'query',
-                'format': 'json',
-                'titles': image_title,
-                'prop': 'imageinfo',
-                'iiprop': 'url',
-                'iiurlwidth': 800
-            }
-
-            response = self.session.get(self.BASE_URL, params=params, timeout=10)
-            data = response.json()
-
-            pages = data.get('query', {}).get('pages', {})
-            if pages:
-                page = next(iter(pages.values()))
-                imageinfo = page.get('imageinfo', [])
-                if imageinfo:
-                    return imageinfo[0].get('url')
-            return None
-        except Exception as e:
-            return None
-
     def _parse_sections(self, content: str) -> Dict[str, str]:
         """Parse content into sections"""
         sections = {}
@@ -161,6 +138,6 @@ class WikivoyageFetcher:
             pattern = rf'{section}\s*==+\s*\n(.*?)(?:==|$)'
             match = re.search(pattern, content, re.IGNORECASE | re.DOTALL)
             if match:
-                sections[section.lower()] = match.group(1).strip()[:1000]
+                sections[section.lower()] = match.group(1).strip()[:4000]  # Retrieval picks what reaches the prompt
 
         return sections
@@ -0,0 +1,52 @@
+import threading
+import time
+from typing import Callable, Generic, Optional, TypeVar
+
+T = TypeVar('T')
+
+class LazyService(Generic[T]):
+    """Build a service (and import its heavy modules) on first use
+
+    The factory runs at most once; concurrent callers block on the same
+    lock until it finishes. `warm()` starts the build on a daemon thread so
+    the HTTP server can bind its port first.
+    """
+
+    def __init__(self, name: str, factory: Callable[[], T]):
+        self.name = name
+        self._factory = factory
+        self._instance: Optional[T] = None
+        self._lock = threading.Lock()
+        self.build_seconds: Optional[float] = None
+
+    def get(self) -> T:
+        """Return the service, building it if needed"""
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    started = time.perf_counter()
+                    print(f"Initializing {self.name}...")
+                    self._instance = self._factory()
+                    self.build_seconds = time.perf_counter() - started
+                    print(f"✓ {self.name} ready in {self.build_seconds:.2f}s")
+        return self._instance
+
+    def is_built(self) -> bool:
+        """True once the factory has finished"""
+        return self._instance is not None
+
+    def peek(self) -> Optional[T]:
+        """Return the service if built, without triggering a build"""
+        return self._instance
+
+    def warm(self) -> threading.Thread:
+        """Build the service in the background"""
+        thread = threading.Thread(target=self._warm, name=f"warm-{self.name}", daemon=True)
+        thread.start()
+        return thread
+
+    def _warm(self):
+        try:
+            self.get()
+        except Exception as e:
+            print(f"Error initializing {self.name}: {e}")
@@ -0,0 +1,256 @@
+import glob
+import json
+import multiprocessing
+import os
+import queue
+import re
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+
+# Quality tiers, lowest first. A model's tier comes from its quantization
+# and parameter count (parsed from the file name, or estimated from size)
+TIERS = ['draft', 'standard', 'high']
+
+QUANT = re.compile(r'(?:^|[.\-_])(I?Q\d(?:_[A-Z0-9]+)*|BF16|F16|F32)(?=[.\-_]|$)', re.IGNORECASE)
+PARAMS = re.compile(r'(?:^|[.\-_])(\d+(?:\.\d+)?)[bB](?=[.\-_]|$)')
+
+# A typical 3-day plan: the structured prompt with enrichment context, and
+# TOKENS_PER_DAY-sized days of JSON. Used to turn rates into seconds.
+TYPICAL_PROMPT_TOKENS = 1500
+TYPICAL_OUTPUT_TOKENS = 800
+
+BENCHMARK_SYSTEM = (
+    "You are a professional travel planner. Write a day-by-day itinerary with times, "
+    "specific places, dining suggestions and practical tips."
+)
+
+BENCHMARK_USER = """Plan a 3-day trip to Lisbon (2025-06-03 to 2025-06-05) for a traveller who likes food, museums and a relaxed pace.
+
+Suggested day plan for Lisbon (visit in this order):
+- Lisbon day 1: Praça do Comércio -> Lisbon Cathedral -> São Jorge Castle -> Miradouro da Senhora do Monte
+- Lisbon day 2: Jerónimos Monastery -> Belém Tower -> MAAT -> LX Factory
+- Lisbon day 3: Calouste Gulbenkian Museum -> Parque Eduardo VII -> Time Out Market -> Bairro Alto
+
+Relevant local info for Lisbon:
+- (See) The Alfama district is the oldest in the city, a maze of narrow lanes and stairways below the castle. Tram 28 climbs through it from Martim Moniz, but it is crowded from mid-morning; walking downhill from the castle is easier.
+- (See) Belém holds the Manueline monastery and tower built with spice-trade wealth. Pastéis de Belém has baked custard tarts next to the monastery since 1837; the queue for take-away moves faster than the one for tables.
+- (Eat) Lisbon restaurants serve lunch from 12:30 and dinner rarely before 20:00. Small tascas offer a prato do dia at a fixed price. Bread and olives put on the table are charged if eaten.
+- (Eat) Grilled sardines are the dish of June, when the Santo António festivities fill Alfama and Mouraria with street grills.
+- (Do) Fado houses in Alfama and Bairro Alto have a minimum spend; smaller venues let you listen for the price of a drink.
+- (Do) The Gulbenkian collection runs from Egyptian antiquities to Lalique jewellery; the modern art centre and garden are included with the same ticket.
+
+Travel Tips for Lisbon:
+- Buy a rechargeable Viva Viagem card for metro, trams, buses and the ferries across the Tagus.
+- Wear shoes with grip: the polished limestone pavements are slippery, especially on hills.
+- Many museums close on Mondays.
+
+Write the itinerary now. For each day give a theme, 4-5 timed activities with a short reason for each, lunch and dinner suggestions, and one practical tip."""
+
+class BenchmarkStore:
+    """Benchmark results per model file, invalidated when the file changes"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.path.join(os.getenv("VB_CACHE_DIR", "cache"), "model_benchmarks.json")
+        self._lock = threading.Lock()
+
+    def load(self) -> Dict[str, Dict]:
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return json.load(f).get('models', {})
+        except (OSError, ValueError):
+            return {}
+
+    def get(self, model_path: str) -> Optional[Dict]:
+        """Stored result for a model, unless the file was replaced since"""
+        path = os.path.abspath(model_path)
+        entry = self.load().get(path)
+        if entry is None or not os.path.exists(path):
+            return None
+        stat = os.stat(path)
+        if entry['size'] != stat.st_size or entry['mtime'] != stat.st_mtime:
+            return None
+        return entry
+
+    def put(self, entry: Dict):
+        with self._lock:
+            models = self.load()
+            models[entry['path']] = entry
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp = f"{self.path}.{os.getpid()}.part"
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump({'models': models}, f, indent=2)
+            os.replace(tmp, self.path)
+
+def models_dir() -> str:
+    return os.getenv("VB_MODELS_DIR", "models")
+
+def find_models(directory: Optional[str] = None) -> List[str]:
+    """GGUF files in the models directory, skipping embedding models"""
+    paths = sorted(glob.glob(os.path.join(directory or models_dir(), "*.gguf")))
+    return [os.path.abspath(p) for p in paths if 'embed' not in os.path.basename(p).lower()]
+
+def describe_model(path: str) -> Dict:
+    """Quantization, parameter count and quality tier of a GGUF file"""
+    name = os.path.basename(path)
+    size = os.path.getsize(path)
+
+    quant_match = QUANT.search(name)
+    quant = quant_match.group(1).upper() if quant_match else None
+    if quant in ('F32', 'F16', 'BF16'):
+        bits = 32 if quant == 'F32' else 16
+    elif quant:
+        bits = int(re.search(r'\d', quant).group())
+    else:
+        bits = None
+
+    params_match = PARAMS.search(name)
+    if params_match:
+        params_b = float(params_match.group(1))
+    else:
+        # Roughly bits per weight plus block scales
+        params_b = round(size * 8 / ((bits or 4) + 0.5) / 1e9, 1)
+
+    if bits is not None and bits >= 5 and params_b >= 7:
+        tier = 'high'
+    elif (bits is None or bits >= 4) and params_b >= 3:
+        tier = 'standard'
+    else:
+        tier = 'draft'
+
+    return {'name': name, 'quant': quant, 'bits': bits, 'params_b': params_b, 'tier': tier, 'size': size}
+
+def find_draft_model(directory: Optional[str] = None, exclude: Optional[str] = None) -> Optional[str]:
+    """Smallest draft-tier model other than `exclude`, for progressive generation"""
+    exclude = os.path.abspath(exclude) if exclude else None
+    drafts = [
+        info for info in (dict(describe_model(path), path=path) for path in find_models(directory))
+        if info['tier'] == 'draft' and info['path'] != exclude
+    ]
+    return min(drafts, key=lambda info: info['size'])['path'] if drafts else None
+
+def default_threads() -> List[int]:
+    """Thread counts worth comparing on this machine"""
+    cores = os.cpu_count() or 4
+    return sorted({n for n in (2, 4, cores // 2, cores) if 0 < n <= cores})
+
+def estimate_plan_seconds(prompt_tps: float, decode_tps: float) -> float:
+    """Seconds for a typical 3-day plan at the measured rates"""
+    return TYPICAL_PROMPT_TOKENS / prompt_tps + TYPICAL_OUTPUT_TOKENS / decode_tps
+
+def _peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:
+        return None  # Windows
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+def _measure(path: str, threads: int, n_ctx: int, decode_tokens: int, results):
+    """One model/thread-count run, in its own process so load time and RSS are clean"""
+    try:
+        from llama_cpp import Llama
+        from llm.model import LocalLLM
+
+        started = time.perf_counter()
+        llm = Llama(model_path=path, n_ctx=n_ctx, n_threads=threads, n_gpu_layers=0, verbose=False)
+        load_s = time.perf_counter() - started
+
+        prompt = LocalLLM.create_prompt(BENCHMARK_SYSTEM, BENCHMARK_USER)
+        # Tokenized the way the completion call below does it, BOS included
+        prompt_tokens = len(llm.tokenize(prompt.encode('utf-8'), add_bos=True, special=True))
+
+        # Time to the first streamed token is prompt evaluation; the rest is decoding
+        started = time.perf_counter()
+        first_at = None
+        tokens = 0
+        for _ in llm(prompt, max_tokens=decode_tokens, temperature=0.0, seed=0, stream=True):
+            tokens += 1
+            if first_at is None:
+                first_at = time.perf_counter()
+        finished = time.perf_counter()
+
+        prompt_tps = prompt_tokens / (first_at - started)
+        decode_tps = (tokens - 1) / (finished - first_at) if tokens > 1 else 0.0
+        results.put({
+            'threads': threads,
+            'load_s': round(load_s, 2),
+            'prompt_tokens': prompt_tokens,
+            'prompt_tps': round(prompt_tps, 1),
+            'decode_tokens': tokens,
+            'decode_tps': round(decode_tps, 2),
+            'peak_rss_mb': _peak_rss_mb(),
+            'est_plan_s': round(estimate_plan_seconds(prompt_tps, decode_tps), 1) if decode_tps else None
+        })
+    except Exception as e:
+        results.put({'threads': threads, 'error': f"{type(e).__name__}: {e}"})
+
+def benchmark_model(path: str, threads: Optional[List[int]] = None, decode_tokens: int = 128,
+                    n_ctx: Optional[int] = None, timeout: float = 1800) -> Dict:
+    """Benchmark one model at each thread count and return its entry"""
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    n_ctx = n_ctx or int(os.getenv("LLM_N_CTX", "4096"))
+    context = multiprocessing.get_context('spawn')
+
+    runs = []
+    for count in threads or default_threads():
+        results = context.Queue()
+        process = context.Process(target=_measure, args=(path, count, n_ctx, decode_tokens, results))
+        process.start()
+        result = None
+        deadline = time.monotonic() + timeout
+        while result is None and time.monotonic() < deadline:
+            try:
+                result = results.get(timeout=1)
+            except queue.Empty:
+                if not process.is_alive():  # Crashed, e.g. out of memory
+                    result = {'threads': count, 'error': f"worker exited with code {process.exitcode}"}
+        runs.append(result or {'threads': count, 'error': f"timed out after {timeout:.0f}s"})
+        process.join(10)
+        if process.is_alive():
+            process.kill()
+
+    measured = [r for r in runs if r.get('est_plan_s')]
+    return {
+        'path': path,
+        **describe_model(path),
+        'mtime': stat.st_mtime,
+        'benchmarked_at': time.time(),
+        'runs': runs,
+        'best': min(measured, key=lambda r: r['est_plan_s']) if measured else None
+    }
+
+def select_model(directory: Optional[str] = None, min_tier: Optional[str] = None,
+                 target_seconds: Optional[float] = None,
+                 store: Optional[BenchmarkStore] = None) -> Optional[Dict]:
+    """Fastest benchmarked model at or above the quality tier
+
+    Prefers models whose typical plan time meets the target; if none do,
+    the fastest one of sufficient quality is returned with meets_target
+    False. None if no model in the directory has (current) results.
+    """
+    min_tier = min_tier or os.getenv("VB_MODEL_MIN_QUALITY", "standard")
+    if target_seconds is None:
+        target_seconds = float(os.getenv("VB_MODEL_TARGET_SECONDS", "60"))
+    store = store or BenchmarkStore()
+
+    candidates = []
+    for path in find_models(directory):
+        entry = store.get(path)
+        if entry and entry.get('best') and TIERS.index(entry['tier']) >= TIERS.index(min_tier):
+            candidates.append(entry)
+    if not candidates:
+        return None
+
+    fastest = min(candidates, key=lambda e: e['best']['est_plan_s'])
+    return {
+        'path': fastest['path'],
+        'tier': fastest['tier'],
+        'threads': fastest['best']['threads'],
+        'est_plan_s': fastest['best']['est_plan_s'],
+        'meets_target': fastest['best']['est_plan_s'] <= target_seconds,
+        'target_seconds': target_seconds
+    }
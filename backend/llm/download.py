@@ -0,0 +1,438 @@
+import hashlib
+import json
+import os
+import queue
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+from typing import Dict, List, Optional, Set
+from urllib.parse import unquote, urlparse
+
+from llm.benchmark import models_dir
+
+# Short names for the models the README recommends; anything else is a URL
+CATALOG = {
+    'mistral-7b-instruct': 'https://huggingface.co/TheBloke/Mistral-7B-Instruct-v0.2-GGUF/resolve/main/mistral-7b-instruct-v0.2.Q4_K_M.gguf',
+    'llama-2-7b-chat': 'https://huggingface.co/TheBloke/Llama-2-7B-Chat-GGUF/resolve/main/llama-2-7b-chat.Q4_K_M.gguf',
+    'tinyllama-1.1b-chat': 'https://huggingface.co/TheBloke/TinyLlama-1.1B-Chat-v1.0-GGUF/resolve/main/tinyllama-1.1b-chat-v1.0.Q4_K_M.gguf',
+}
+
+SHA256 = re.compile(r'^[0-9a-f]{64}$')
+CONTENT_RANGE = re.compile(r'bytes (\d+)-(\d+)/(\d+)')
+
+BLOCK_SIZE = 1024 * 1024
+USER_AGENT = 'VacationBuilder/1.0 (model download)'
+
+class DownloadError(Exception):
+    """A download that cannot continue (retries exhausted, checksum mismatch, ...)"""
+
+class DownloadCancelled(DownloadError):
+    """Stopped on request; the partial file is kept for resuming"""
+
+def resolve(model: str) -> str:
+    """URL for a catalog name or a URL"""
+    url = CATALOG.get(model, model)
+    if urlparse(url).scheme not in ('http', 'https'):
+        raise ValueError(f"unknown model {model!r}: expected one of {', '.join(CATALOG)} or an http(s) URL")
+    return url
+
+def file_name(url: str, name: Optional[str] = None) -> str:
+    """File name in the models directory: `name`, or the last URL path segment"""
+    name = name or unquote(urlparse(url).path.rsplit('/', 1)[-1])
+    if not name or name != os.path.basename(name) or name.startswith('.'):
+        raise ValueError(f"invalid model file name {name!r}")
+    if not name.endswith('.gguf'):
+        raise ValueError(f"model file must be a .gguf, got {name!r}")
+    return name
+
+class _RecordRedirects(urllib.request.HTTPRedirectHandler):
+    """Keeps the headers of every redirect hop
+
+    Hugging Face puts the file's SHA-256 (X-Linked-Etag) on the redirect
+    to its CDN, not on the final response.
+    """
+
+    def __init__(self):
+        self.hops: List = []
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        self.hops.append(headers)
+        return super().redirect_request(req, fp, code, msg, headers, newurl)
+
+class ModelDownload:
+    """Fetch one GGUF into the models directory with parallel range requests
+
+    The file is split into CHUNK_SIZE pieces fetched by `connections`
+    threads into `<name>.part`; finished chunks are recorded in
+    `<name>.part.json` so an interrupted download resumes where it stopped.
+    A hashing thread follows the downloaded prefix in order, so the SHA-256
+    is ready moments after the last byte. The verified file is moved into
+    place with a rename, so the backend never sees a partial model.
+    """
+
+    CHUNK_SIZE = 32 * 1024 * 1024
+    RETRIES = 8  # Per chunk; a retry continues from the last byte written
+    STALL_TIMEOUT = 30.0  # Seconds without data before a connection is retried
+
+    def __init__(self, url: str, name: Optional[str] = None, sha256: Optional[str] = None,
+                 directory: Optional[str] = None, connections: Optional[int] = None):
+        self.url = url
+        self.name = file_name(url, name)
+        self.directory = directory or models_dir()
+        self.path = os.path.join(self.directory, self.name)
+        self.part_path = self.path + '.part'
+        self.state_path = self.part_path + '.json'
+        self.expected = sha256.lower() if sha256 else None
+        if self.expected and not SHA256.match(self.expected):
+            raise ValueError(f"invalid SHA-256 {sha256!r}")
+        self.connections = max(1, connections or int(os.getenv("VB_DOWNLOAD_CONNECTIONS", "4")))
+
+        self.state = 'pending'
+        self.error: Optional[str] = None
+        self.total: Optional[int] = None
+        self.downloaded = 0
+        self.verified = 0
+        self.resumed = 0
+        self.sha256: Optional[str] = None
+        self.checked = False  # Whether the hash was compared with a known value
+        self._started: Optional[float] = None
+        self._finished: Optional[float] = None
+        self._lock = threading.Lock()
+        self._chunk_done = threading.Condition(self._lock)
+        self._cancel = threading.Event()
+        self._done: Set[int] = set()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def status(self) -> Dict:
+        """Progress snapshot for the CLI and /api/models/downloads"""
+        with self._lock:
+            elapsed = ((self._finished or time.monotonic()) - self._started) if self._started else 0
+            fetched = self.downloaded - self.resumed
+            speed = fetched / elapsed if elapsed > 0 else 0
+            remaining = (self.total - self.downloaded) if self.total else None
+            return {
+                'name': self.name,
+                'url': self.url,
+                'state': self.state,
+                'total_bytes': self.total,
+                'downloaded_bytes': self.downloaded,
+                'verified_bytes': self.verified,
+                'percent': round(100 * self.downloaded / self.total, 1) if self.total else None,
+                'bytes_per_second': round(speed),
+                'eta_seconds': round(remaining / speed) if speed and remaining is not None
+                               and self.state == 'downloading' else None,
+                'sha256': self.sha256,
+                'checksum_verified': self.checked,
+                'error': self.error,
+            }
+
+    def run(self) -> str:
+        """Download, verify and install the model; returns its path"""
+        self._started = time.monotonic()
+        try:
+            if os.path.exists(self.path):
+                self.state = 'done'
+                self.total = self.downloaded = self.verified = os.path.getsize(self.path)
+                return self.path
+            os.makedirs(self.directory, exist_ok=True)
+
+            self.state = 'downloading'
+            probe = self._probe()
+            self.total = probe['size']
+            if self.expected is None and probe['linked_sha256']:
+                self.expected = probe['linked_sha256']
+
+            if probe['ranges']:
+                digest = self._download_ranges(probe)
+            else:
+                digest = self._download_stream()
+
+            self.state = 'verifying'
+            self.sha256 = digest
+            if self.expected:
+                if digest != self.expected:
+                    self._discard()
+                    raise DownloadError(f"SHA-256 mismatch for {self.name}: expected {self.expected}, got {digest}")
+                self.checked = True
+            else:
+                print(f"⚠️  No published checksum for {self.name}; SHA-256 is {digest}")
+
+            os.replace(self.part_path, self.path)
+            if os.path.exists(self.state_path):
+                os.remove(self.state_path)
+            self.state = 'done'
+            return self.path
+        except DownloadCancelled as e:
+            self.state, self.error = 'cancelled', str(e)
+            raise
+        except Exception as e:
+            self.state, self.error = 'error', str(e)
+            raise
+        finally:
+            self._finished = time.monotonic()
+
+    def _request(self, headers: Optional[Dict] = None, redirects: Optional[_RecordRedirects] = None):
+        request = urllib.request.Request(self.url, headers={'User-Agent': USER_AGENT, **(headers or {})})
+        opener = urllib.request.build_opener(redirects) if redirects else urllib.request.build_opener()
+        return opener.open(request, timeout=self.STALL_TIMEOUT)
+
+    def _probe(self) -> Dict:
+        """Size, range support, validator and published hash of the remote file"""
+        redirects = _RecordRedirects()
+        with self._request({'Range': 'bytes=0-0'}, redirects) as response:
+            headers = response.headers
+            match = CONTENT_RANGE.match(headers.get('Content-Range', ''))
+            ranges = response.status == 206 and match is not None
+            size = int(match.group(3)) if ranges else int(headers.get('Content-Length') or 0) or None
+
+        linked = None
+        for hop in [*redirects.hops, headers]:
+            value = (hop.get('X-Linked-Etag') or '').strip('"').lower()
+            if SHA256.match(value):
+                linked = value
+        etag = headers.get('ETag')
+        return {
+            'size': size,
+            'ranges': ranges and bool(size),
+            # If-Range needs a strong validator; a weak ETag falls back to Last-Modified
+            'validator': etag if etag and not etag.startswith('W/') else headers.get('Last-Modified'),
+            'linked_sha256': linked,
+        }
+
+    def _load_state(self, probe: Dict) -> Set[int]:
+        """Chunks already on disk from an earlier run of the same remote file"""
+        try:
+            with open(self.state_path, encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return set()
+        same = (state.get('url') == self.url and state.get('size') == probe['size']
+                and state.get('chunk_size') == self.CHUNK_SIZE
+                and state.get('validator') == probe['validator']
+                and os.path.exists(self.part_path))
+        if not same:
+            print(f"   Remote file changed since the partial download; starting {self.name} over")
+            self._discard()
+            return set()
+        return set(state.get('done', []))
+
+    def _save_state(self, probe: Dict):
+        """Record finished chunks; called with the lock held"""
+        tmp = self.state_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({
+                'url': self.url,
+                'size': probe['size'],
+                'validator': probe['validator'],
+                'chunk_size': self.CHUNK_SIZE,
+                'done': sorted(self._done),
+            }, f)
+        os.replace(tmp, self.state_path)
+
+    def _discard(self):
+        for path in (self.part_path, self.state_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _download_ranges(self, probe: Dict) -> str:
+        size = probe['size']
+        chunks = (size + self.CHUNK_SIZE - 1) // self.CHUNK_SIZE
+        self._done = self._load_state(probe)
+        self.resumed = self.downloaded = sum(self._chunk_length(i, size) for i in self._done)
+        if self._done:
+            print(f"   Resuming {self.name}: {len(self._done)}/{chunks} chunks on disk")
+
+        fd = os.open(self.part_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            os.ftruncate(fd, size)
+            pending: queue.Queue = queue.Queue()
+            for index in range(chunks):
+                if index not in self._done:
+                    pending.put(index)
+
+            errors: List[BaseException] = []
+            failed = threading.Event()
+
+            def worker():
+                while not failed.is_set():
+                    try:
+                        index = pending.get_nowait()
+                    except queue.Empty:
+                        return
+                    try:
+                        self._fetch_chunk(fd, index, size, probe)
+                    except BaseException as e:
+                        errors.append(e)
+                        failed.set()
+                    with self._chunk_done:
+                        self._chunk_done.notify_all()
+
+            digest = {}
+            hasher = threading.Thread(target=self._hash_ranges, args=(fd, chunks, size, failed, digest),
+                                      name='download-hash')
+            workers = [threading.Thread(target=worker, name=f'download-{n}')
+                       for n in range(min(self.connections, max(1, pending.qsize())))]
+            hasher.start()
+            for thread in workers:
+                thread.start()
+            for thread in workers:
+                thread.join()
+            if errors:
+                failed.set()
+            with self._chunk_done:
+                self._chunk_done.notify_all()
+            hasher.join()
+
+            if errors:
+                # Prefer reporting a cancel over the errors it caused elsewhere
+                raise next((e for e in errors if isinstance(e, DownloadCancelled)), errors[0])
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        return digest['sha256']
+
+    def _chunk_length(self, index: int, size: int) -> int:
+        return min(self.CHUNK_SIZE, size - index * self.CHUNK_SIZE)
+
+    def _fetch_chunk(self, fd: int, index: int, size: int, probe: Dict):
+        """Fetch one chunk, continuing from the last byte written after a failure"""
+        start = index * self.CHUNK_SIZE
+        end = start + self._chunk_length(index, size) - 1
+        position = start
+        attempt = 0
+
+        while position <= end:
+            if self._cancel.is_set():
+                raise DownloadCancelled(f"{self.name} download cancelled")
+            headers = {'Range': f'bytes={position}-{end}'}
+            if probe['validator']:
+                headers['If-Range'] = probe['validator']
+            try:
+                with self._request(headers) as response:
+                    if response.status != 206:
+                        # If-Range failed: the file changed under us. The
+                        # next run sees the new validator and starts over
+                        raise DownloadError(f"{self.name} changed on the server; run the download again")
+                    while position <= end:
+                        if self._cancel.is_set():
+                            raise DownloadCancelled(f"{self.name} download cancelled")
+                        block = response.read(min(BLOCK_SIZE, end - position + 1))
+                        if not block:
+                            raise ConnectionError("connection closed mid-chunk")
+                        os.pwrite(fd, block, position)
+                        position += len(block)
+                        with self._lock:
+                            self.downloaded += len(block)
+                        attempt = 0  # Progress resets the retry budget
+            except urllib.error.HTTPError as e:
+                if e.code < 500 and e.code != 429:
+                    raise DownloadError(f"{self.name}: HTTP {e.code} {e.reason}") from e
+                attempt += 1
+                if attempt > self.RETRIES:
+                    raise DownloadError(f"{self.name}: giving up after {self.RETRIES} retries ({e})") from e
+                time.sleep(min(30, 2 ** attempt))
+            except (urllib.error.URLError, OSError) as e:
+                attempt += 1
+                if attempt > self.RETRIES:
+                    raise DownloadError(f"{self.name}: giving up on bytes {position}-{end} after "
+                                        f"{self.RETRIES} retries ({e})") from e
+                time.sleep(min(30, 2 ** attempt))
+
+        with self._chunk_done:
+            self._done.add(index)
+            self._save_state(probe)
+
+    def _hash_ranges(self, fd: int, chunks: int, size: int, failed: threading.Event, digest: Dict):
+        """Hash chunks in file order as soon as each one is on disk"""
+        sha = hashlib.sha256()
+        for index in range(chunks):
+            with self._chunk_done:
+                while index not in self._done and not failed.is_set():
+                    self._chunk_done.wait()
+                if index not in self._done:
+                    return
+            offset = index * self.CHUNK_SIZE
+            end = offset + self._chunk_length(index, size)
+            while offset < end:
+                block = os.pread(fd, min(BLOCK_SIZE, end - offset), offset)
+                sha.update(block)
+                offset += len(block)
+                with self._lock:
+                    self.verified += len(block)
+        digest['sha256'] = sha.hexdigest()
+
+    def _download_stream(self) -> str:
+        """Single request for servers without range support; cannot resume"""
+        self._discard()
+        sha = hashlib.sha256()
+        with self._request() as response, open(self.part_path, 'wb') as f:
+            while True:
+                if self._cancel.is_set():
+                    raise DownloadCancelled(f"{self.name} download cancelled")
+                block = response.read(BLOCK_SIZE)
+                if not block:
+                    break
+                f.write(block)
+                sha.update(block)
+                with self._lock:
+                    self.downloaded += len(block)
+                    self.verified += len(block)
+            f.flush()
+            os.fsync(f.fileno())
+        if self.total and self.downloaded != self.total:
+            raise DownloadError(f"{self.name}: connection closed after {self.downloaded} of {self.total} bytes")
+        self.total = self.downloaded
+        return sha.hexdigest()
+
+class DownloadManager:
+    """Background model downloads for the API, one per file name"""
+
+    def __init__(self, on_complete=None):
+        self.on_complete = on_complete  # Called with the installed path
+        self._downloads: Dict[str, ModelDownload] = {}
+        self._lock = threading.Lock()
+
+    def start(self, model: str, name: Optional[str] = None, sha256: Optional[str] = None) -> ModelDownload:
+        """Start (or resume) a download; a running one for the same file is returned as is"""
+        download = ModelDownload(resolve(model), name, sha256)
+        with self._lock:
+            current = self._downloads.get(download.name)
+            if current and current.state in ('pending', 'downloading', 'verifying'):
+                return current
+            self._downloads[download.name] = download
+        threading.Thread(target=self._run, args=(download,), name=f'download {download.name}',
+                         daemon=True).start()
+        return download
+
+    def _run(self, download: ModelDownload):
+        try:
+            path = download.run()
+        except DownloadCancelled:
+            print(f"⏸️  Download of {download.name} cancelled; it resumes when started again")
+            return
+        except Exception as e:
+            print(f"❌ Download of {download.name} failed: {e}")
+            return
+        print(f"✅ Downloaded {download.name}")
+        if self.on_complete:
+            self.on_complete(path)
+
+    def get(self, name: str) -> Optional[ModelDownload]:
+        with self._lock:
+            return self._downloads.get(name)
+
+    def list(self) -> List[Dict]:
+        with self._lock:
+            downloads = list(self._downloads.values())
+        return [d.status() for d in downloads]
+
+    def cancel(self, name: str) -> bool:
+        download = self.get(name)
+        if download is None:
+            return False
+        download.cancel()
+        return True
@@ -0,0 +1,98 @@
+import os
+import re
+import threading
+import zlib
+from typing import Dict, List, Optional
+import numpy as np
+
+class LocalEmbedder:
+    """Embed text with a small local GGUF model, or a hashing fallback
+
+    With LLM_EMBED_MODEL_PATH pointing at an embedding GGUF (e.g.
+    nomic-embed-text or bge-small), llama.cpp runs in embedding mode.
+    Without one, texts are embedded as signed feature-hashed bags of words
+    and bigrams: no semantics, but cheap and good enough to match
+    "museums" to a paragraph about museums.
+    """
+
+    HASH_DIM = 1024
+    CACHE_SIZE = 4096
+
+    def __init__(self, model_path: Optional[str] = None):
+        self.model_path = model_path or os.getenv(
+            "LLM_EMBED_MODEL_PATH",
+            "models/embedding.gguf"
+        )
+        self.llm = None
+        self._cache: Dict[str, np.ndarray] = {}
+        # Shared by both model threads and the event loop; llama.cpp must not
+        # be entered concurrently and the cache may be cleared mid-call
+        self._lock = threading.Lock()
+        self._load_model()
+
+    def _load_model(self):
+        """Load the embedding model if one is available"""
+        if not os.path.exists(self.model_path):
+            print("No embedding model found, using hashed bag-of-words embeddings")
+            return
+
+        try:
+            from llama_cpp import Llama
+
+            print(f"Loading embedding model from {self.model_path}...")
+            self.llm = Llama(
+                model_path=self.model_path,
+                embedding=True,
+                n_ctx=512,
+                n_threads=4,
+                verbose=False
+            )
+        except Exception as e:
+            print(f"Error loading embedding model: {e}")
+            self.llm = None
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Return an (n, dim) float32 matrix of L2-normalized embeddings"""
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+
+        with self._lock:
+            found = {t: self._cache[t] for t in dict.fromkeys(texts) if t in self._cache}
+            missing = [t for t in dict.fromkeys(texts) if t not in found]
+            if missing:
+                vectors = self._embed_model(missing) if self.llm else self._embed_hashed(missing)
+                if len(self._cache) + len(missing) > self.CACHE_SIZE:
+                    self._cache.clear()
+                self._cache.update(zip(missing, vectors))
+                found.update(zip(missing, vectors))
+
+        return np.stack([found[t] for t in texts])
+
+    @property
+    def dim(self) -> int:
+        if self.llm:
+            return self.llm.n_embd()
+        return self.HASH_DIM
+
+    def _embed_model(self, texts: List[str]) -> np.ndarray:
+        """Batch-embed with llama.cpp"""
+        vectors = np.asarray(self.llm.embed(texts), dtype=np.float32)
+        return self._normalize(vectors)
+
+    def _embed_hashed(self, texts: List[str]) -> np.ndarray:
+        """Signed feature hashing of unigrams and bigrams with sublinear TF"""
+        vectors = np.zeros((len(texts), self.HASH_DIM), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = re.findall(r"[a-z0-9]+", text.lower())
+            features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+            for feature in features:
+                h = zlib.crc32(feature.encode('utf-8'))
+                vectors[row, h % self.HASH_DIM] += 1.0 if h & 0x80000000 else -1.0
+
+        vectors = np.sign(vectors) * np.log1p(np.abs(vectors))
+        return self._normalize(vectors)
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
@@ -0,0 +1,102 @@
+import json
+import socket
+import threading
+import time
+from typing import Dict, Iterator, List
+from llm.inference_protocol import (
+    CHUNK, ERROR, REQUEST, RESULT, TOKENS, decode_tokens, encode_json, read_frame
+)
+
+class RemoteLlama:
+    """Stand-in for llama_cpp.Llama that forwards calls to the inference server
+
+    Covers what LocalLLM uses: completions (streamed or not), tokenize and
+    the prompt-cache flag. Grammars are sent as JSON schema strings and
+    compiled on the server. Each thread keeps its own connection, so
+    concurrent callers don't interleave frames.
+    """
+
+    def __init__(self, socket_path: str, connect_timeout: float = 60.0):
+        self.socket_path = socket_path
+        self._local = threading.local()
+
+        # The server may still be starting; wait for its socket
+        deadline = time.monotonic() + connect_timeout
+        while True:
+            try:
+                self.info = self._request({'op': 'info'})
+                break
+            except (FileNotFoundError, ConnectionRefusedError):
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.5)
+        self.cache = True if self.info.get('prompt_cache') else None
+
+    def __call__(self, prompt: str, stream: bool = False, **params):
+        grammar = params.pop('grammar', None)
+        request = {'op': 'complete', 'prompt': prompt, 'params': params, 'stream': stream}
+        if grammar is not None:
+            request['json_schema'] = grammar
+        if stream:
+            return self._stream(request)
+        return self._request(request)
+
+    def tokenize(self, text: bytes, add_bos: bool = True) -> List[int]:
+        return self._request({'op': 'tokenize', 'text': text.decode('utf-8'), 'add_bos': add_bos})
+
+    def _connection(self) -> socket.socket:
+        sock = getattr(self._local, 'sock', None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.connect(self.socket_path)
+            except OSError:
+                sock.close()
+                raise
+            self._local.sock = sock
+        return sock
+
+    def _drop_connection(self):
+        sock = getattr(self._local, 'sock', None)
+        if sock is not None:
+            sock.close()
+            self._local.sock = None
+
+    def _request(self, request: Dict):
+        """Send a request and return its result"""
+        try:
+            sock = self._connection()
+            sock.sendall(encode_json(REQUEST, request))
+            kind, payload = read_frame(sock)
+        except OSError:
+            self._drop_connection()  # Reconnect on the next call
+            raise
+        return self._result(kind, payload)
+
+    def _stream(self, request: Dict) -> Iterator[Dict]:
+        """Yield llama.cpp-style chunks as the server sends tokens"""
+        finished = False
+        try:
+            sock = self._connection()
+            sock.sendall(encode_json(REQUEST, request))
+            while True:
+                kind, payload = read_frame(sock)
+                if kind != CHUNK:
+                    finished = True
+                    self._result(kind, payload)  # Raises if the server failed
+                    return
+                yield {'choices': [{'text': payload.decode('utf-8'), 'finish_reason': None}]}
+        finally:
+            if not finished:
+                # Stopped early (or failed): hanging up makes the server stop decoding
+                self._drop_connection()
+
+    def _result(self, kind: int, payload: bytes):
+        if kind == TOKENS:
+            return decode_tokens(payload)
+        value = json.loads(payload)
+        if kind == ERROR:
+            raise RuntimeError(value['error'])
+        if kind != RESULT:
+            raise ConnectionError(f"unexpected frame type {kind}")
+        return value
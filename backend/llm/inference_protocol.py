@@ -0,0 +1,55 @@
+"""Framing for the inference server's Unix socket
+
+Every frame is a 5-byte header (type, payload length) and a payload.
+Requests, results and errors carry JSON; streamed chunks are just the
+UTF-8 text of the token and token ids are packed int32s, so the
+per-token traffic stays a few bytes. Both ends run on the same host, so
+native byte order is fine for the token array.
+"""
+import array
+import asyncio
+import json
+import socket
+import struct
+from typing import Dict, List, Tuple
+
+HEADER = struct.Struct('!BI')
+
+REQUEST = 1  # JSON: {'op', ...}
+RESULT = 2   # JSON: final answer (ends a streamed response)
+CHUNK = 3    # UTF-8 text of one streamed token
+TOKENS = 4   # int32 token ids
+ERROR = 5    # JSON: {'error'}
+
+def encode(kind: int, payload: bytes) -> bytes:
+    return HEADER.pack(kind, len(payload)) + payload
+
+def encode_json(kind: int, value: Dict) -> bytes:
+    return encode(kind, json.dumps(value, separators=(',', ':')).encode('utf-8'))
+
+def encode_tokens(tokens: List[int]) -> bytes:
+    return encode(TOKENS, array.array('i', tokens).tobytes())
+
+def decode_tokens(payload: bytes) -> List[int]:
+    tokens = array.array('i')
+    tokens.frombytes(payload)
+    return tokens.tolist()
+
+def _recv_exactly(sock: socket.socket, size: int) -> bytes:
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("inference server closed the connection")
+        data += chunk
+    return bytes(data)
+
+def read_frame(sock: socket.socket) -> Tuple[int, bytes]:
+    """Next frame from a blocking socket"""
+    kind, size = HEADER.unpack(_recv_exactly(sock, HEADER.size))
+    return kind, _recv_exactly(sock, size) if size else b''
+
+async def read_frame_async(reader: asyncio.StreamReader) -> Tuple[int, bytes]:
+    """Next frame from an asyncio stream"""
+    kind, size = HEADER.unpack(await reader.readexactly(HEADER.size))
+    return kind, await reader.readexactly(size) if size else b''
@@ -0,0 +1,165 @@
+"""Hold the model in one process and serve it to every backend worker.
+
+Run from the backend directory (main.py starts it by itself when
+VB_WORKERS > 1):
+
+    python -m llm.inference_server --socket /tmp/vacation-builder-llm.sock
+
+Workers connect with LLM_SERVER_SOCKET set to the same path. The model is
+loaded once, with the usual LLM_* settings, and every completion from
+every worker runs through a single first-come, first-served queue.
+"""
+import argparse
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+from llm.inference_protocol import (
+    CHUNK, ERROR, REQUEST, RESULT, encode, encode_json, encode_tokens, read_frame_async
+)
+
+class InferenceServer:
+    """One copy of the weights behind a Unix socket
+
+    llama.cpp contexts are not thread-safe, so model loading and every
+    completion share a single worker thread; requests queue in arrival
+    order. Tokenizing only reads the vocabulary and runs beside them.
+    """
+
+    def __init__(self, socket_path: str):
+        self.socket_path = socket_path
+        self.llm = None
+        self.pending = 0
+        self._queue = ThreadPoolExecutor(max_workers=1, thread_name_prefix='inference')
+        self._loaded: Optional[asyncio.Future] = None
+
+    async def serve(self):
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)  # Left over from a crashed server
+        server = await asyncio.start_unix_server(self._handle, path=self.socket_path)
+        os.chmod(self.socket_path, 0o600)
+        print(f"Inference server listening on {self.socket_path}")
+
+        # Queued first, so requests that arrive during loading wait for it
+        self._loaded = asyncio.get_running_loop().run_in_executor(self._queue, self._load)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+
+    def _load(self):
+        # The server is the one process that must not be a client itself
+        os.environ.pop("LLM_SERVER_SOCKET", None)
+        from llm.model import LocalLLM
+        self.llm = LocalLLM()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve one worker connection; requests on it are handled in turn"""
+        try:
+            while True:
+                kind, payload = await read_frame_async(reader)
+                if kind != REQUEST:
+                    raise ConnectionError(f"unexpected frame type {kind}")
+                try:
+                    await self._dispatch(json.loads(payload), writer)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    raise
+                except Exception as e:
+                    writer.write(encode_json(ERROR, {'error': f"{type(e).__name__}: {e}"}))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass  # Worker went away
+        finally:
+            writer.close()
+
+    async def _dispatch(self, request: Dict, writer: asyncio.StreamWriter):
+        await self._loaded
+        op = request.get('op')
+
+        if op == 'info':
+            ready = self.llm.is_ready()
+            writer.write(encode_json(RESULT, {
+                'ready': ready,
+                'model_path': os.path.abspath(self.llm.model_path),
+                'n_ctx': self.llm.n_ctx,
+                'prompt_cache': self.llm.has_prompt_cache(),
+                'pending': self.pending
+            }))
+            return
+
+        if not self.llm.is_ready():
+            raise RuntimeError("model not loaded on the inference server")
+
+        if op == 'tokenize':
+            tokens = await asyncio.to_thread(
+                self.llm.llm.tokenize, request['text'].encode('utf-8'), request.get('add_bos', True)
+            )
+            writer.write(encode_tokens(tokens))
+        elif op == 'complete':
+            params = dict(request.get('params') or {})
+            if request.get('json_schema'):
+                params['grammar'] = self.llm._get_grammar(json.loads(request['json_schema']))
+
+            loop = asyncio.get_running_loop()
+            self.pending += 1
+            try:
+                if request.get('stream'):
+                    result = await loop.run_in_executor(
+                        self._queue, self._stream, request['prompt'], params, writer, loop
+                    )
+                else:
+                    response = await loop.run_in_executor(
+                        self._queue, lambda: self.llm.llm(request['prompt'], **params)
+                    )
+                    choice = response['choices'][0]
+                    result = {
+                        'choices': [{'text': choice['text'], 'finish_reason': choice.get('finish_reason')}],
+                        'usage': response.get('usage', {})
+                    }
+            finally:
+                self.pending -= 1
+            writer.write(encode_json(RESULT, result))
+        else:
+            raise ValueError(f"unknown op {op!r}")
+
+    def _stream(self, prompt: str, params: Dict, writer: asyncio.StreamWriter,
+                loop: asyncio.AbstractEventLoop) -> Dict:
+        """Decode on the queue thread, forwarding each token as it comes"""
+        tokens = 0
+        finish_reason = None
+        chunks = self.llm.llm(prompt, stream=True, **params)
+        try:
+            for chunk in chunks:
+                choice = chunk['choices'][0]
+                finish_reason = choice.get('finish_reason')
+                tokens += 1
+                # Waiting for the write gives backpressure, and a worker that
+                # hung up (stopped early) surfaces here and ends decoding
+                asyncio.run_coroutine_threadsafe(
+                    self._send(writer, encode(CHUNK, choice['text'].encode('utf-8'))), loop
+                ).result()
+        finally:
+            chunks.close()
+        return {'finish_reason': finish_reason, 'usage': {'completion_tokens': tokens}}
+
+    async def _send(self, writer: asyncio.StreamWriter, frame: bytes):
+        if writer.is_closing():
+            raise ConnectionError("worker disconnected")
+        writer.write(frame)
+        await writer.drain()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--socket', default=os.getenv("LLM_SERVER_SOCKET", "/tmp/vacation-builder-llm.sock"),
+                        help='Unix socket path (default: LLM_SERVER_SOCKET or /tmp/vacation-builder-llm.sock)')
+    args = parser.parse_args()
+    try:
+        asyncio.run(InferenceServer(args.socket).serve())
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
@@ -1,20 +1,66 @@
-from llama_cpp import Llama
+import json
 import os
-from typing import Optional
+import time
+from typing import Callable, Dict, Iterator, Optional, TYPE_CHECKING
+import profiling
+
+if TYPE_CHECKING:
+    from llama_cpp import Llama
 
 class LocalLLM:
     """Wrapper for llama.cpp model"""
 
-    def __init__(self, model_path: Optional[str] = None):
-        self.model_path = model_path or os.getenv(
-            "LLM_MODEL_PATH",
-            "models/mistral-7b-instruct-v0.2.Q4_K_M.gguf"
+    DEFAULT_MODEL_PATH = "models/mistral-7b-instruct-v0.2.Q4_K_M.gguf"
+
+    def __init__(self, model_path: Optional[str] = None, draft: bool = False):
+        # A draft model (progressive generation) is small and always loaded
+        # in this process; it keeps no prompt cache because llama.cpp's disk
+        # cache is keyed by tokens only and must not mix two models' states
+        self.draft = draft
+        # With a shared inference server (see llm/inference_server.py) this
+        # process holds no weights; self.llm forwards calls over the socket
+        self.server_socket = None if draft else os.getenv("LLM_SERVER_SOCKET")
+        self.n_threads = int(os.getenv("LLM_N_THREADS", "0"))
+        self.model_path = (
+            model_path or os.getenv("LLM_MODEL_PATH") or self._select_model() or self.DEFAULT_MODEL_PATH
         )
-        self.llm: Optional[Llama] = None
+        self.llm: Optional["Llama"] = None
+        self.n_ctx = int(os.getenv("LLM_N_CTX", "4096"))
+        self._grammars: Dict[str, object] = {}  # schema JSON -> compiled grammar
+        # Token usage of the most recent generate*/call, for per-request stats
+        self.last_usage: Dict = {}
+        # Fixed sampling seed makes generations reproducible (and cacheable)
+        seed = os.getenv("LLM_SEED")
+        self.seed: Optional[int] = int(seed) if seed else None
+        self.result_cache = None
         self._load_model()
+        self._enable_result_cache()
+
+    def _select_model(self) -> Optional[str]:
+        """Fastest benchmarked model meeting VB_MODEL_MIN_QUALITY and
+        VB_MODEL_TARGET_SECONDS (see benchmark_models.py), with its best
+        thread count unless LLM_N_THREADS is set
+        """
+        if self.server_socket or os.getenv("VB_MODEL_AUTO_SELECT", "1") == "0":
+            return None
+
+        from llm.benchmark import select_model
+        choice = select_model()
+        if choice is None:
+            return None
+
+        self.n_threads = self.n_threads or choice['threads']
+        note = "" if choice['meets_target'] else f", over the {choice['target_seconds']:.0f}s target"
+        print(f"Auto-selected {os.path.basename(choice['path'])} ({choice['tier']} quality, "
+              f"~{choice['est_plan_s']:.0f}s per plan on {choice['threads']} threads{note})")
+        return choice['path']
 
     def _load_model(self):
         """Load the GGUF model"""
+        if self.server_socket:
+            self._connect_server()
+            return
+
         if not os.path.exists(self.model_path):
             print(f"Warning: Model not found at {self.model_path}")
             print("Please download a GGUF model and place it in the models/ directory")
@@ -23,31 +69,158 @@ class LocalLLM:
             return
 
         try:
+            # Imported here: llama_cpp loads its shared library on import
+            from llama_cpp import Llama
+
             print(f"Loading model from {self.model_path}...")
             self.llm = Llama(
                 model_path=self.model_path,
-                n_ctx=4096,  # Context window
-                n_threads=4,  # CPU threads
+                n_ctx=self.n_ctx,  # Context window
+                n_threads=self.n_threads or 4,  # CPU threads
                 n_gpu_layers=0,  # Set to -1 for GPU acceleration if available
                 verbose=False
             )
             print("Model loaded successfully!")
+
+            self._enable_prompt_cache()
         except Exception as e:
             print(f"Error loading model: {e}")
             self.llm = None
 
+    def _connect_server(self):
+        """Use the model held by the inference server at LLM_SERVER_SOCKET"""
+        try:
+            from llm.inference_client import RemoteLlama
+
+            print(f"Connecting to inference server at {self.server_socket}...")
+            remote = RemoteLlama(self.server_socket)
+            self.model_path = remote.info['model_path']
+            self.n_ctx = remote.info['n_ctx']
+            if not remote.info['ready']:
+                print(f"Inference server has no model loaded ({self.model_path})")
+                return
+            self.llm = remote
+            print(f"Using {os.path.basename(self.model_path)} from the inference server")
+        except Exception as e:
+            print(f"Error connecting to inference server: {e}")
+            self.llm = None
+
+    def _enable_prompt_cache(self):
+        """Persist evaluated prompt prefixes (KV state) on disk if configured
+
+        Set LLM_PROMPT_CACHE_DIR to enable. States are large (roughly 100 MB
+        per 1000 tokens for a 7B model), so capacity is capped.
+        """
+        cache_dir = os.getenv("LLM_PROMPT_CACHE_DIR")
+        if not cache_dir or self.draft:
+            return
+
+        try:
+            from llama_cpp import LlamaDiskCache
+
+            capacity = int(float(os.getenv("LLM_PROMPT_CACHE_GB", "2")) * 1024 ** 3)
+            self.llm.set_cache(LlamaDiskCache(cache_dir=cache_dir, capacity_bytes=capacity))
+            print(f"Prompt prefix cache enabled at {cache_dir}")
+        except Exception as e:
+            print(f"Error enabling prompt cache: {e}")
+
+    def _enable_result_cache(self):
+        """Reuse finished generations for identical requests (VB_RESULT_CACHE=1)"""
+        if os.getenv("VB_RESULT_CACHE", "0") != "1" or not self.is_ready():
+            return
+        if self.seed is None:
+            print("Result cache needs a fixed LLM_SEED to be deterministic; leaving it off")
+            return
+
+        from llm.result_cache import ResultCache
+        self.result_cache = ResultCache()
+        print(f"Result cache enabled at {self.result_cache.path}")
+
+    def _result_key(self, kind: str, prompt: str, params: Dict, **extra) -> Optional[str]:
+        """Cache key for a generation, or None when caching is off"""
+        if self.result_cache is None:
+            return None
+        try:
+            model = self.result_cache.model_hash(self.model_path)
+        except OSError as e:
+            print(f"Error hashing model file: {e}")
+            return None
+        sampling = {k: v for k, v in params.items() if k not in ('grammar', 'echo')}
+        return self.result_cache.make_key(
+            kind=kind, model=model, prompt=prompt, params=sampling, seed=self.seed, **extra
+        )
+
+    def _cached_result(self, key: Optional[str], use_cache: bool):
+        """Output stored under key, restoring the usage stats it was made with"""
+        if key is None or not use_cache:
+            return None
+        with profiling.span("llm.result_cache", "llm") as info:
+            entry = self.result_cache.get(key)
+            info["hit"] = entry is not None
+        if entry is None:
+            return None
+        self.last_usage = {**entry['usage'], "cached": True}
+        return entry['output']
+
+    def _store_result(self, key: Optional[str], output, started: float):
+        if key is not None:
+            self.result_cache.put(key, {
+                "output": output,
+                "usage": self.last_usage,
+                "seconds": time.monotonic() - started
+            })
+
+    def has_prompt_cache(self) -> bool:
+        """Whether evaluated prefixes are kept for reuse"""
+        return self.is_ready() and self.llm.cache is not None
+
+    def warm_prefix(self, prefix: str) -> bool:
+        """Evaluate a prompt prefix so later prompts starting with it skip that work"""
+        if not self.has_prompt_cache():
+            return False
+
+        try:
+            # One token is enough: llama-cpp-python stores the evaluated
+            # state in the cache when the completion finishes
+            self.llm(prefix, max_tokens=1, temperature=0.0, echo=False)
+            return True
+        except Exception as e:
+            print(f"Error warming prompt prefix: {e}")
+            return False
+
+    def use_downloaded(self, model_path: str) -> bool:
+        """Load a model that arrived after startup, if none is loaded yet"""
+        if self.is_ready() or self.server_socket:
+            return False
+        self.model_path = model_path
+        self._load_model()
+        self._enable_result_cache()
+        return self.is_ready()
+
     def is_ready(self) -> bool:
         """Check if model is loaded and ready"""
         return self.llm is not None
 
-    def generate(self, prompt: str, max_tokens: int = 2000, temperature: float = 0.7) -> str:
-        """Generate text from prompt"""
+    def count_tokens(self, text: str) -> int:
+        """Number of tokens the model sees for `text`"""
+        if not self.is_ready():
+            return len(text) // 4  # Rough estimate
+        return len(self.llm.tokenize(text.encode('utf-8'), add_bos=False))
+
+    def generate(self, prompt: str, max_tokens: int = 2000, temperature: float = 0.7,
+                 stop_when: Optional[Callable[[str], bool]] = None,
+                 use_cache: bool = True) -> str:
+        """Generate text from prompt
+
+        If `stop_when` is given, the output is streamed and decoding stops as
+        soon as it returns True for the text generated so far. With the
+        result cache on, `use_cache=False` regenerates (and refreshes) it.
+        """
         if not self.is_ready():
             return "Error: LLM model not loaded. Please check model path."
 
         try:
-            response = self.llm(
-                prompt,
+            params = dict(
                 max_tokens=max_tokens,
                 temperature=temperature,
                 top_p=0.95,
@@ -55,11 +228,138 @@ class LocalLLM:
                 stop=["</s>", "###"],
                 echo=False
             )
-            return response["choices"][0]["text"].strip()
+            if self.seed is not None:
+                params["seed"] = self.seed
+
+            # The stop condition is derived from the prompt, so it isn't keyed
+            key = self._result_key("text", prompt, params, streamed=stop_when is not None)
+            cached = self._cached_result(key, use_cache)
+            if cached is not None:
+                return cached
+            started = time.monotonic()
+
+            if stop_when is None:
+                response = self._complete(prompt, **params)
+                self._record_usage(response.get("usage", {}), stopped_early=False)
+                text = response["choices"][0]["text"].strip()
+                self._store_result(key, text, started)
+                return text
+
+            text = ""
+            tokens = 0
+            stopped_early = False
+            for chunk in self._stream(prompt, **params):
+                text += chunk["choices"][0]["text"]
+                tokens += 1
+                if stop_when(text):
+                    stopped_early = True
+                    break  # Closing the generator stops decoding
+
+            self._record_usage({"completion_tokens": tokens}, stopped_early=stopped_early)
+            self._store_result(key, text.strip(), started)
+            return text.strip()
         except Exception as e:
             return f"Error generating response: {e}"
 
-    def create_prompt(self, system: str, user: str) -> str:
+    def _complete(self, prompt: str, **params) -> Dict:
+        """One completion; in a traced request it is streamed so prompt
+        evaluation and decoding show up as separate spans
+        """
+        if not profiling.active():
+            return self.llm(prompt, **params)
+
+        text = ""
+        tokens = 0
+        for chunk in self._stream(prompt, **params):
+            text += chunk["choices"][0]["text"]
+            tokens += 1
+        return {
+            "choices": [{"text": text}],
+            "usage": {"prompt_tokens": self.count_tokens(prompt), "completion_tokens": tokens}
+        }
+
+    def _stream(self, prompt: str, **params) -> Iterator[Dict]:
+        """Streamed completion; traced requests record time to the first
+        token (prompt eval) and the rest (decode)
+        """
+        chunks = self.llm(prompt, stream=True, **params)
+        if not profiling.active():
+            yield from chunks
+            return
+
+        try:
+            with profiling.span("llm.prompt_eval", "llm", prompt_tokens=self.count_tokens(prompt)):
+                first = next(chunks, None)
+            if first is None:
+                return
+            with profiling.span("llm.decode", "llm", max_tokens=params.get("max_tokens")) as info:
+                info["tokens"] = 1
+                yield first
+                for chunk in chunks:
+                    info["tokens"] += 1
+                    yield chunk
+        finally:
+            chunks.close()  # Stops decoding if the caller broke off early
+
+    def _record_usage(self, usage: Dict, stopped_early: bool):
+        """Remember token counts of the last call"""
+        self.last_usage = {
+            "prompt_tokens": usage.get("prompt_tokens"),
+            "completion_tokens": usage.get("completion_tokens", 0),
+            "stopped_early": stopped_early
+        }
+
+    def generate_structured(self, prompt: str, schema: Dict, max_tokens: int = 2000,
+                            temperature: float = 0.7, use_cache: bool = True) -> Optional[Dict]:
+        """Generate JSON constrained by a JSON schema (compiled to a GBNF grammar)
+
+        Returns the parsed object, or None if the model isn't loaded or the
+        output could not be parsed (e.g. it hit max_tokens mid-object).
+        """
+        if not self.is_ready():
+            return None
+
+        try:
+            with profiling.span("llm.grammar", "llm"):
+                grammar = self._get_grammar(schema)
+            params = dict(
+                max_tokens=max_tokens,
+                temperature=temperature,
+                top_p=0.95,
+                repeat_penalty=1.0,  # JSON repeats keys by design
+                grammar=grammar,
+                echo=False
+            )
+            if self.seed is not None:
+                params["seed"] = self.seed
+
+            key = self._result_key("structured", prompt, params, schema=schema)
+            cached = self._cached_result(key, use_cache)
+            if cached is not None:
+                return cached
+            started = time.monotonic()
+
+            response = self._complete(prompt, **params)
+            self._record_usage(response.get("usage", {}), stopped_early=False)
+            result = json.loads(response["choices"][0]["text"])
+            self._store_result(key, result, started)
+            return result
+        except Exception as e:
+            print(f"Error generating structured response: {e}")
+            return None
+
+    def _get_grammar(self, schema: Dict):
+        """Compile a JSON schema to a llama.cpp grammar, cached per schema"""
+        key = json.dumps(schema, sort_keys=True)
+        if self.server_socket:
+            return key  # Compiled (and cached) by the inference server
+        if key not in self._grammars:
+            from llama_cpp import LlamaGrammar
+            self._grammars[key] = LlamaGrammar.from_json_schema(key, verbose=False)
+        return self._grammars[key]
+
+    @staticmethod
+    def create_prompt(system: str, user: str) -> str:
         """Create a formatted prompt for instruction-following models"""
         return f"""<s>[INST] <<SYS>>
 {system}
@@ -0,0 +1,140 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+class ResultCache:
+    """Completed generations keyed by model, prompt, sampling parameters and seed
+
+    With a fixed seed llama.cpp produces the same output for the same model,
+    prompt and parameters, so a repeated request can be answered from disk.
+    The store is capped at `max_bytes`; least recently used entries go first.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_bytes: Optional[int] = None):
+        cache_dir = os.getenv("VB_CACHE_DIR", "cache")
+        self.path = path or os.path.join(cache_dir, "results.sqlite")
+        self.max_bytes = max_bytes or int(float(os.getenv("VB_RESULT_CACHE_MB", "256")) * 1024 * 1024)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used);
+            CREATE TABLE IF NOT EXISTS model_hashes (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                sha256 TEXT NOT NULL
+            );
+        """)
+
+        # Counters since process start, for /api/metrics
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self.seconds_saved = 0.0
+        self.tokens_saved = 0
+        self.evictions = 0
+
+    def model_hash(self, model_path: str) -> str:
+        """SHA-256 of the model file, recomputed only when size or mtime change"""
+        path = os.path.abspath(model_path)
+        stat = os.stat(path)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT sha256 FROM model_hashes WHERE path = ? AND size = ? AND mtime = ?",
+                (path, stat.st_size, stat.st_mtime)
+            ).fetchone()
+        if row:
+            return row[0]
+
+        print(f"Hashing model file {os.path.basename(path)} for the result cache...")
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(8 * 1024 * 1024), b''):
+                digest.update(block)
+
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO model_hashes VALUES (?, ?, ?, ?)",
+                (path, stat.st_size, stat.st_mtime, digest.hexdigest())
+            )
+        return digest.hexdigest()
+
+    @staticmethod
+    def make_key(**parts) -> str:
+        """Stable key for the inputs that determine a generation"""
+        return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Cached entry for a key, counting the hit or miss"""
+        with self._lock:
+            row = self._conn.execute("SELECT value, size FROM results WHERE key = ?", (key,)).fetchone()
+            if row:
+                with self._conn:
+                    self._conn.execute("UPDATE results SET last_used = ? WHERE key = ?", (time.time(), key))
+
+        if not row:
+            self.misses += 1
+            return None
+
+        entry = json.loads(row[0])
+        self.hits += 1
+        self.bytes_saved += row[1]
+        self.seconds_saved += entry.get('seconds', 0.0)
+        self.tokens_saved += (entry.get('usage') or {}).get('completion_tokens') or 0
+        return entry
+
+    def put(self, key: str, entry: Dict):
+        """Store an entry and evict the least recently used beyond max_bytes"""
+        value = json.dumps(entry)
+        size = len(value.encode('utf-8'))
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now, now)
+            )
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            for old_key, old_size in self._conn.execute(
+                "SELECT key, size FROM results ORDER BY last_used"
+            ).fetchall():
+                if total <= self.max_bytes:
+                    break
+                self._conn.execute("DELETE FROM results WHERE key = ?", (old_key,))
+                total -= old_size
+                self.evictions += 1
+
+    def stats(self) -> Dict:
+        """Hit rate, savings and size of the cache"""
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            'enabled': True,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+            'bytes_saved': self.bytes_saved,
+            'seconds_saved': round(self.seconds_saved, 1),
+            'tokens_saved': self.tokens_saved,
+            'entries': entries,
+            'bytes': size,
+            'max_bytes': self.max_bytes,
+            'evictions': self.evictions
+        }
@@ -0,0 +1,145 @@
+"""Load-test the backend with a fake LLM and stub upstream services.
+
+Run from the backend directory:
+
+    python load_test.py --rps 5 --duration 60
+    python load_test.py --rps 20 --mix plan=1,pdf=1,health=8 --llm-tps 30 --stub-error-rate 0.05
+
+Starts stub MediaWiki/Places/tip/image servers, launches the backend with
+a fake LLM pointed at them, drives mixed traffic at the target rate and
+reports throughput, tail latency and the backend's event-loop lag.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+def parse_mix(value: str):
+    mix = {}
+    for item in value.split(','):
+        name, weight = item.split('=')
+        if name not in ('plan', 'pdf', 'health'):
+            raise argparse.ArgumentTypeError(f"unknown request kind: {name}")
+        mix[name] = float(weight)
+    return mix
+
+def wait_for_backend(base_url: str, process: subprocess.Popen, timeout: float = 180):
+    """Block until /health reports the planner built"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("backend exited during startup (see the backend log)")
+        try:
+            with urllib.request.urlopen(f"{base_url}/health", timeout=2) as response:
+                if json.load(response)['services']['planner']:
+                    return
+        except Exception:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError("backend did not become ready")
+
+def get_json(url: str):
+    with urllib.request.urlopen(url, timeout=10) as response:
+        return json.load(response)
+
+def print_report(report: dict):
+    print(f"\nOffered {report['offered']} requests at {report['offered_rps']} rps "
+          f"(target {report['target_rps']}), dropped {report['dropped']} at the concurrency cap")
+    print(f"Completed {report['completed']} OK in {report['elapsed_s']}s -> {report['throughput_rps']} rps\n")
+
+    print(f"{'request':<8} {'ok':>6} {'rps':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}  errors")
+    for kind, stats in report['requests'].items():
+        errors = ', '.join(f"{k}: {v}" for k, v in stats['errors'].items()) or '-'
+        print(f"{kind:<8} {stats['ok']:>6} {stats['throughput_rps']:>7} {stats['p50_ms'] or '-':>9} "
+              f"{stats['p95_ms'] or '-':>9} {stats['p99_ms'] or '-':>9} {stats['max_ms'] or '-':>9}  {errors}")
+
+    lag = report.get('event_loop_lag')
+    if lag:
+        print(f"\nEvent-loop lag (probe every {lag['interval_ms']:g} ms): p50 {lag['p50_ms']} ms, "
+              f"p95 {lag['p95_ms']} ms, p99 {lag['p99_ms']} ms, max {lag['max_ms']} ms")
+    print(f"Upstream stub requests: {report.get('stub_requests')}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rps', type=float, default=5.0, help='target requests per second')
+    parser.add_argument('--duration', type=float, default=60.0, help='seconds of traffic')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix('plan=2,pdf=1,health=7'),
+                        help='request weights (default: plan=2,pdf=1,health=7)')
+    parser.add_argument('--concurrency', type=int, default=50, help='max requests in flight')
+    parser.add_argument('--fixed-rate', action='store_true', help='evenly spaced instead of Poisson arrivals')
+    parser.add_argument('--llm-tps', type=float, default=20.0, help='fake LLM tokens per second')
+    parser.add_argument('--llm-latency-ms', type=float, default=300.0, help='fake LLM median time to first token')
+    parser.add_argument('--llm-latency-sigma', type=float, default=0.5, help='log-normal spread of that latency')
+    parser.add_argument('--stub-latency-ms', type=float, default=80.0, help='median upstream latency')
+    parser.add_argument('--stub-latency-sigma', type=float, default=0.6, help='log-normal spread of upstream latency')
+    parser.add_argument('--stub-error-rate', type=float, default=0.0, help='share of upstream requests failing with 503')
+    parser.add_argument('--port', type=int, default=8765, help='backend port')
+    parser.add_argument('--stub-port', type=int, default=8766, help='stub upstream port')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args()
+
+    from loadtest.driver import LoadDriver
+    from loadtest.stats import LatencyDistribution
+    from loadtest.stubs import StubUpstreams
+
+    workdir = tempfile.mkdtemp(prefix='vb-loadtest-')
+    stubs = StubUpstreams(
+        args.stub_port,
+        LatencyDistribution(args.stub_latency_ms / 1000, args.stub_latency_sigma),
+        args.stub_error_rate
+    )
+    stubs.start()
+
+    env = {
+        **os.environ,
+        **stubs.env(),
+        'VB_CACHE_DIR': os.path.join(workdir, 'cache'),  # Start cold, leave the real caches alone
+        'VB_FAKE_LLM_TPS': str(args.llm_tps),
+        'VB_FAKE_LLM_LATENCY_MS': str(args.llm_latency_ms),
+        'VB_FAKE_LLM_LATENCY_SIGMA': str(args.llm_latency_sigma),
+        'VB_EAGER_WARMUP': '1',
+        'VB_WARM_INTERVAL_HOURS': '0',
+        'VB_RESULT_CACHE': '0',
+    }
+    base_url = f"http://127.0.0.1:{args.port}"
+    log_path = os.path.join(workdir, 'backend.log')
+    print(f"Starting backend on {base_url} (log: {log_path})")
+    with open(log_path, 'w') as log:
+        backend = subprocess.Popen(
+            [sys.executable, '-m', 'loadtest.serve', '--port', str(args.port)],
+            cwd=os.path.dirname(os.path.abspath(__file__)), env=env, stdout=log, stderr=subprocess.STDOUT
+        )
+
+    try:
+        wait_for_backend(base_url, backend)
+        get_json(f"{base_url}/_loadtest/loop-lag?reset=true")  # Ignore startup
+
+        print(f"Driving {args.rps} rps for {args.duration:g}s with mix {args.mix}...")
+        driver = LoadDriver(
+            base_url, args.rps, args.duration, args.mix, args.concurrency,
+            pdf_dir=workdir, poisson=not args.fixed_rate
+        )
+        report = asyncio.run(driver.run())
+        report['event_loop_lag'] = get_json(f"{base_url}/_loadtest/loop-lag")
+        report['stub_requests'] = dict(stubs.requests)
+        report['sources'] = get_json(f"{base_url}/health").get('sources')
+    finally:
+        backend.terminate()
+        try:
+            backend.wait(10)
+        except subprocess.TimeoutExpired:
+            backend.kill()
+        stubs.stop()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1 @@
+"""Load-testing harness: fake LLM, stub upstreams and a traffic driver (run load_test.py)"""
@@ -0,0 +1,145 @@
+import asyncio
+import os
+import random
+import time
+from typing import Dict, List, Optional
+import aiohttp
+from loadtest.stats import summarize
+
+# Sample itinerary for PDF requests until a /api/plan response is available
+SAMPLE_MARKDOWN = "# 10 Days in Lisbon\n\nGenerated for load testing\n\n---\n\n" + '\n'.join(
+    f"## Day {day} – Lisbon: Neighbourhood {day}\n\n"
+    + '\n'.join(f"- **{hour:02d}:00** — Visit sight {day}-{hour}: arrive early" for hour in (9, 11, 14, 17))
+    + "\n\n**Dining**\n\n- *Lunch*: Market hall — try the bifanas\n"
+    for day in range(1, 11)
+)
+
+DEFAULT_DESTINATIONS = [
+    "Lisbon", "Porto", "Seville", "Valencia", "Lyon", "Bordeaux", "Naples", "Bologna",
+    "Krakow", "Ljubljana", "Tallinn", "Riga", "Bruges", "Salzburg", "Zurich", "Oslo",
+    "Kyoto", "Osaka", "Hoi An", "Chiang Mai"
+]
+
+class LoadDriver:
+    """Open-loop traffic generator: requests start at the target rate whether
+    or not earlier ones have finished, so a stalled server shows up as
+    growing latency instead of a politely slower client.
+    """
+
+    def __init__(self, base_url: str, rps: float, duration: float, mix: Dict[str, float],
+                 concurrency: int = 50, destinations: Optional[List[str]] = None,
+                 pdf_dir: Optional[str] = None, poisson: bool = True):
+        self.base_url = base_url.rstrip('/')
+        self.rps = rps
+        self.duration = duration
+        self.mix = mix
+        self.concurrency = concurrency
+        self.destinations = destinations or DEFAULT_DESTINATIONS
+        self.pdf_dir = pdf_dir
+        self.poisson = poisson
+
+        self.results: List[Dict] = []
+        self.dropped = 0
+        self._in_flight = 0
+        self._markdown = SAMPLE_MARKDOWN
+
+    async def run(self) -> Dict:
+        """Drive traffic for `duration` seconds and return the report"""
+        timeout = aiohttp.ClientTimeout(total=600)
+        connector = aiohttp.TCPConnector(limit=self.concurrency)
+        async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+            tasks = []
+            started = time.monotonic()
+            next_at = started
+            sequence = 0
+
+            while next_at - started < self.duration:
+                await asyncio.sleep(max(0.0, next_at - time.monotonic()))
+                if self._in_flight >= self.concurrency:
+                    self.dropped += 1
+                else:
+                    kind = random.choices(list(self.mix), weights=list(self.mix.values()))[0]
+                    tasks.append(asyncio.create_task(self._request(session, kind, sequence)))
+                sequence += 1
+                next_at += random.expovariate(self.rps) if self.poisson else 1 / self.rps
+
+            offered_for = time.monotonic() - started
+            await asyncio.gather(*tasks)
+            elapsed = time.monotonic() - started
+
+        return self.report(sequence, offered_for, elapsed)
+
+    async def _request(self, session: aiohttp.ClientSession, kind: str, sequence: int):
+        self._in_flight += 1
+        started = time.monotonic()
+        status = None
+        try:
+            if kind == 'plan':
+                status = await self._plan(session, sequence)
+            elif kind == 'pdf':
+                status = await self._pdf(session, sequence)
+            else:
+                async with session.get(f"{self.base_url}/health") as response:
+                    await response.read()
+                    status = response.status
+        except Exception as e:
+            status = type(e).__name__
+        finally:
+            self._in_flight -= 1
+            self.results.append({'kind': kind, 'status': status, 'latency': time.monotonic() - started})
+
+    async def _plan(self, session: aiohttp.ClientSession, sequence: int):
+        count = random.choice((1, 1, 2))
+        payload = {
+            'destinations': [{'name': name} for name in random.sample(self.destinations, count)],
+            # Unique preferences so identical requests don't look cacheable
+            'preferences': f"food, museums, relaxed pace (load test {sequence})"
+        }
+        async with session.post(f"{self.base_url}/api/plan", json=payload) as response:
+            data = await response.json(content_type=None)
+            if response.status == 200 and data.get('markdown'):
+                self._markdown = data['markdown']
+            return response.status
+
+    async def _pdf(self, session: aiohttp.ClientSession, sequence: int):
+        payload = {'markdown': self._markdown}
+        path = None
+        if self.pdf_dir:
+            path = os.path.join(self.pdf_dir, f"load-{sequence}.pdf")
+            payload['output_path'] = path
+        try:
+            async with session.post(f"{self.base_url}/api/generate-pdf", json=payload) as response:
+                await response.read()
+                return response.status
+        finally:
+            if path and os.path.exists(path):
+                os.remove(path)
+
+    def report(self, offered: int, offered_for: float, elapsed: float) -> Dict:
+        """Throughput, latency percentiles and errors per request kind"""
+        by_kind: Dict[str, Dict] = {}
+        for kind in self.mix:
+            results = [r for r in self.results if r['kind'] == kind]
+            ok = [r['latency'] for r in results if r['status'] == 200]
+            errors: Dict[str, int] = {}
+            for r in results:
+                if r['status'] != 200:
+                    errors[str(r['status'])] = errors.get(str(r['status']), 0) + 1
+            by_kind[kind] = {
+                **summarize([r['latency'] for r in results]),
+                'ok': len(ok),
+                'throughput_rps': round(len(ok) / elapsed, 2) if elapsed else 0.0,
+                'errors': errors
+            }
+
+        completed = [r for r in self.results if r['status'] == 200]
+        return {
+            'target_rps': self.rps,
+            'offered': offered,
+            'offered_rps': round(offered / offered_for, 2) if offered_for else 0.0,
+            'dropped': self.dropped,
+            'completed': len(completed),
+            'throughput_rps': round(len(completed) / elapsed, 2) if elapsed else 0.0,
+            'elapsed_s': round(elapsed, 1),
+            'requests': by_kind
+        }
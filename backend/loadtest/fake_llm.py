@@ -0,0 +1,131 @@
+import json
+import os
+import re
+import threading
+import time
+from typing import Dict, Iterator, List, Optional
+from llm.model import LocalLLM
+from loadtest.stats import LatencyDistribution
+
+class FakeLlama:
+    """Stand-in for llama_cpp.Llama that "decodes" at a fixed token rate
+
+    Calls block the calling thread like the real model does, and one call
+    runs at a time (a single model instance). Structured calls return an
+    itinerary that fits the schema passed as the grammar; free-form calls
+    return day-by-day markdown that overruns the trip by one day, so early
+    stopping is exercised too.
+    """
+
+    CHARS_PER_TOKEN = 4
+
+    def __init__(self, tokens_per_second: float, first_token: LatencyDistribution):
+        self.tokens_per_second = tokens_per_second
+        self.first_token = first_token
+        self.cache = None
+        self._lock = threading.Lock()
+
+    def tokenize(self, data: bytes, add_bos: bool = True) -> List[int]:
+        return list(range(len(data) // self.CHARS_PER_TOKEN + int(add_bos)))
+
+    def set_cache(self, cache):
+        self.cache = cache
+
+    def __call__(self, prompt: str, max_tokens: int = 256, stream: bool = False,
+                 grammar: Optional[Dict] = None, **kwargs):
+        text = self._itinerary_json(prompt, grammar) if grammar else self._markdown(prompt)
+        tokens = self._tokens(text)[:max_tokens]
+        prompt_tokens = len(prompt) // self.CHARS_PER_TOKEN
+
+        if stream:
+            return self._stream(tokens)
+
+        with self._lock:
+            time.sleep(self.first_token.sample() + len(tokens) / self.tokens_per_second)
+        return {
+            'choices': [{'text': ''.join(tokens)}],
+            'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': len(tokens)}
+        }
+
+    def _stream(self, tokens: List[str]) -> Iterator[Dict]:
+        with self._lock:
+            time.sleep(self.first_token.sample())
+            for token in tokens:
+                time.sleep(1 / self.tokens_per_second)
+                yield {'choices': [{'text': token}]}
+
+    def _tokens(self, text: str) -> List[str]:
+        step = self.CHARS_PER_TOKEN
+        return [text[i:i + step] for i in range(0, len(text), step)]
+
+    def _destination(self, prompt: str) -> str:
+        match = re.search(r'^\s*1\. (.+?)(?: \(| - )', prompt, re.MULTILINE)
+        if not match:
+            match = re.search(r' in (.+?)\.\n', prompt)
+        return match.group(1).strip() if match else "Destination"
+
+    def _days(self, prompt: str) -> int:
+        match = re.search(r'Create a (\d+)-day', prompt)
+        return int(match.group(1)) if match else 3
+
+    def _itinerary_json(self, prompt: str, schema: Dict) -> str:
+        days_schema = schema['properties']['days']
+        num_days = days_schema.get('minItems') or self._days(prompt)
+        dest = self._destination(prompt)
+        days = [
+            {
+                'dest': dest,
+                'theme': f"Highlights of {dest}, part {day}",
+                'slots': [
+                    {'time': f"{hour:02d}:00", 'do': f"Visit {dest} sight {day}-{i}", 'note': "Go early to avoid queues"}
+                    for i, hour in enumerate((9, 11, 14, 17), 1)
+                ],
+                'dining': [
+                    {'meal': 'Lunch', 'place': f"{dest} market hall", 'note': "Try the local speciality"},
+                    {'meal': 'Dinner', 'place': f"Old town bistro {day}", 'note': "Book ahead"}
+                ]
+            }
+            for day in range(1, num_days + 1)
+        ]
+        itinerary = {'days': days}
+        if 'title' in schema['properties']:
+            itinerary = {'title': f"{num_days} Days in {dest}", 'days': days,
+                         'tips': ["Buy a transit pass", "Carry some cash", "Museums close on Mondays"]}
+        return json.dumps(itinerary)
+
+    def _markdown(self, prompt: str) -> str:
+        num_days = self._days(prompt)
+        dest = self._destination(prompt)
+        parts = [f"# {num_days} Days in {dest}\n"]
+        for day in range(1, num_days + 2):
+            parts.append(f"## Day {day}: Exploring {dest}\n")
+            parts += [f"- **{hour:02d}:00** - Visit sight {day}-{hour}" for hour in (9, 11, 14, 17)]
+            parts.append("")
+        return '\n'.join(parts)
+
+class FakeLLM(LocalLLM):
+    """LocalLLM backed by FakeLlama, configured from the environment
+
+    VB_FAKE_LLM_TPS            tokens per second (default 20)
+    VB_FAKE_LLM_LATENCY_MS     median time to first token (default 300)
+    VB_FAKE_LLM_LATENCY_SIGMA  log-normal spread of that latency (default 0.5)
+    """
+
+    def _load_model(self):
+        self.model_path = "fake-model"
+        self.llm = FakeLlama(
+            tokens_per_second=float(os.getenv("VB_FAKE_LLM_TPS", "20")),
+            first_token=LatencyDistribution(
+                float(os.getenv("VB_FAKE_LLM_LATENCY_MS", "300")) / 1000,
+                float(os.getenv("VB_FAKE_LLM_LATENCY_SIGMA", "0.5"))
+            )
+        )
+        print(f"Using fake LLM at {self.llm.tokens_per_second:g} tokens/s")
+
+    def _enable_result_cache(self):
+        # The result cache hashes the model file; there is none
+        self.result_cache = None
+
+    def _get_grammar(self, schema: Dict):
+        # FakeLlama reads the schema directly
+        return schema
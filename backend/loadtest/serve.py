@@ -0,0 +1,31 @@
+"""Run the backend with the fake LLM and an event-loop lag probe.
+
+Started by load_test.py as `python -m loadtest.serve --port N` from the
+backend directory; upstream URLs come from the environment it sets.
+"""
+import argparse
+import llm.model
+from loadtest.fake_llm import FakeLLM
+from loadtest.stats import LoopLagMonitor
+
+# Must happen before the planner module imports LocalLLM
+llm.model.LocalLLM = FakeLLM
+
+import main  # noqa: E402
+
+loop_lag = LoopLagMonitor()
+
+@main.app.on_event("startup")
+async def start_lag_probe():
+    loop_lag.start()
+
+@main.app.get("/_loadtest/loop-lag")
+async def get_loop_lag(reset: bool = False):
+    """Event-loop lag since start (or the last reset)"""
+    return loop_lag.snapshot(reset)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+    main.uvicorn.run(main.app, host="127.0.0.1", port=args.port, log_level="warning")
@@ -0,0 +1,67 @@
+import asyncio
+import math
+import random
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+def percentile(sorted_values: List[float], q: float) -> Optional[float]:
+    """q-th percentile (0-100) of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, math.ceil(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+def summarize(values: List[float]) -> Dict:
+    """Count, mean and tail percentiles, in milliseconds for values in seconds"""
+    ordered = sorted(values)
+    ms = lambda v: round(v * 1000, 1) if v is not None else None
+    return {
+        'count': len(ordered),
+        'mean_ms': ms(sum(ordered) / len(ordered)) if ordered else None,
+        'p50_ms': ms(percentile(ordered, 50)),
+        'p95_ms': ms(percentile(ordered, 95)),
+        'p99_ms': ms(percentile(ordered, 99)),
+        'max_ms': ms(ordered[-1]) if ordered else None
+    }
+
+class LatencyDistribution:
+    """Log-normal latency: `median` seconds, spread controlled by `sigma`"""
+
+    def __init__(self, median: float, sigma: float = 0.5):
+        self.median = median
+        self.sigma = sigma
+
+    def sample(self) -> float:
+        if self.median <= 0:
+            return 0.0
+        return self.median * math.exp(random.gauss(0, self.sigma))
+
+class LoopLagMonitor:
+    """Measure how late the event loop wakes up from a short sleep
+
+    Anything that blocks the loop (a synchronous LLM call, PDF layout, a
+    blocking HTTP request) shows up directly as lag.
+    """
+
+    def __init__(self, interval: float = 0.05, max_samples: int = 100_000):
+        self.interval = interval
+        self._samples = deque(maxlen=max_samples)
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            self._samples.append(max(0.0, time.monotonic() - expected))
+
+    def snapshot(self, reset: bool = False) -> Dict:
+        stats = summarize(list(self._samples))
+        stats['interval_ms'] = self.interval * 1000
+        if reset:
+            self._samples.clear()
+        return stats
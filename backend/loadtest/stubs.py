@@ -0,0 +1,209 @@
+import asyncio
+import hashlib
+import io
+import random
+import threading
+import urllib.parse
+from typing import Dict, Optional
+from aiohttp import web
+from loadtest.stats import LatencyDistribution
+
+class StubUpstreams:
+    """Local stand-ins for the MediaWiki, Google Places, tip-page and image hosts
+
+    Every response is delayed by a sample of `latency`, and a share of
+    `error_rate` requests fail with 503, so the fetchers' breakers, SLOs
+    and fallbacks see realistic trouble. Runs its own event loop in a
+    thread so it doesn't compete with the load generator.
+    """
+
+    IMAGES_PER_PAGE = 6
+    PLACES_PER_SEARCH = 12
+
+    def __init__(self, port: int, latency: LatencyDistribution, error_rate: float = 0.0):
+        self.port = port
+        self.latency = latency
+        self.error_rate = error_rate
+        self.base_url = f"http://127.0.0.1:{port}"
+        self.requests: Dict[str, int] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._runner: Optional[web.AppRunner] = None
+        self._image = self._make_image()
+
+    def env(self) -> Dict[str, str]:
+        """Environment that points the backend's fetchers at these stubs"""
+        return {
+            'VB_MEDIAWIKI_BASE_URL': self.base_url,
+            'VB_TIP_SOURCES': f"{self.base_url}/tips/{{title}}",
+            'GOOGLE_PLACES_BASE_URL': self.base_url,
+            'GOOGLE_PLACES_API_KEY': 'AIzaLoadTestStub',  # googlemaps checks the prefix
+            'GOOGLE_PLACES_QPS': '1000',
+            'GOOGLE_PLACES_BURST': '1000',
+            'GOOGLE_PLACES_DAILY_QUOTA': '100000000',
+        }
+
+    def start(self):
+        """Serve in a background thread; returns once the port is bound"""
+        ready = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(self._start_server())
+            ready.set()
+            self._loop.run_forever()
+
+        threading.Thread(target=run, name='stub-upstreams', daemon=True).start()
+        ready.wait(10)
+
+    def stop(self):
+        if self._loop and self._runner:
+            asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result(10)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+
+    async def _start_server(self):
+        app = web.Application(middlewares=[self._trouble])
+        app.router.add_get('/robots.txt', self._robots)
+        app.router.add_get('/tips/{title}', self._tips)
+        app.router.add_get('/upload/{name}', self._upload)
+        app.router.add_get('/maps/api/place/textsearch/json', self._places_search)
+        app.router.add_get('/maps/api/place/details/json', self._place_details)
+        app.router.add_get('/{host}/w/api.php', self._mediawiki)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, '127.0.0.1', self.port).start()
+
+    @web.middleware
+    async def _trouble(self, request: web.Request, handler):
+        """Injected latency and errors"""
+        route = request.path.split('/')[1] or 'root'
+        self.requests[route] = self.requests.get(route, 0) + 1
+        await asyncio.sleep(self.latency.sample())
+        if random.random() < self.error_rate:
+            return web.Response(status=503, text="injected failure")
+        return await handler(request)
+
+    # MediaWiki ----------------------------------------------------------
+
+    async def _mediawiki(self, request: web.Request) -> web.Response:
+        host = request.match_info['host']
+        q = request.query
+
+        if q.get('list') == 'search':
+            title = self._title(q.get('srsearch', 'Somewhere'))
+            return web.json_response({'query': {
+                'searchinfo': {'totalhits': 1},
+                'search': [{'ns': 0, 'title': title, 'pageid': self._page_id(title)}]
+            }})
+
+        if q.get('generator') == 'search':
+            # Commons search: the query is a long CirrusSearch expression
+            seed = self._page_id(q.get('gsrsearch', ''))
+            pages = [self._file_page(f"File:Commons {seed} {i}.jpg", i) for i in range(self.IMAGES_PER_PAGE)]
+        elif q.get('generator') == 'images':
+            title = q.get('titles', 'Somewhere')
+            pages = [self._file_page(f"File:{title} view {i}.jpg", i) for i in range(self.IMAGES_PER_PAGE)]
+        elif q.get('prop') == 'imageinfo':
+            pages = [self._file_page(t, i) for i, t in enumerate(q.get('titles', '').split('|')) if t]
+        else:
+            title = q.get('titles', 'Somewhere')
+            pages = [{
+                'pageid': self._page_id(title),
+                'ns': 0,
+                'title': title,
+                'fullurl': f"https://{host}/wiki/{urllib.parse.quote(title.replace(' ', '_'))}",
+                'extract': self._article(title),
+                'revisions': [{'revid': 1, 'parentid': 0}]
+            }]
+
+        if q.get('formatversion') != '2':
+            pages = {str(p['pageid']): p for p in pages}
+        return web.json_response({'query': {'pages': pages}})
+
+    def _file_page(self, title: str, index: int) -> Dict:
+        url = f"{self.base_url}/upload/{hashlib.sha1(title.encode()).hexdigest()[:16]}.jpg"
+        return {
+            'pageid': self._page_id(title),
+            'ns': 6,
+            'title': title,
+            'index': index + 1,
+            'imageinfo': [{
+                'url': url, 'thumburl': url, 'mime': 'image/jpeg',
+                'width': 1600, 'height': 1067, 'size': len(self._image)
+            }]
+        }
+
+    def _article(self, title: str) -> str:
+        sections = {
+            'Understand': f"{title} is a popular destination known for its history, food and architecture.",
+            'See': f"The old town of {title} has museums, cathedrals and viewpoints. The castle is a must-see.",
+            'Do': f"Take a walking tour, rent a bike along the river, or join a cooking class in {title}.",
+            'Eat': "Local markets sell street food. Try the regional speciality at a family-run tavern.",
+            'Sleep': "Stay near the centre to walk everywhere.",
+            'Stay safe': "Watch for pickpockets in crowded squares."
+        }
+        body = f"{title} is a city.\n\n" + '\n\n'.join(f"== {name} ==\n{text}" for name, text in sections.items())
+        return body * 3  # Enough text for chunking and retrieval
+
+    # Other hosts ---------------------------------------------------------
+
+    async def _robots(self, request: web.Request) -> web.Response:
+        return web.Response(text="User-agent: *\nAllow: /\n")
+
+    async def _tips(self, request: web.Request) -> web.Response:
+        title = request.match_info['title'].replace('_', ' ')
+        tips = ''.join(
+            f"<li>Tip: you should book {thing} in {title} in advance to avoid queues.</li>"
+            for thing in ('museum tickets', 'restaurants', 'train seats')
+        )
+        html = f"<html><body><nav>Menu</nav><p>Visiting {title}? Remember to carry cash.</p><ul>{tips}</ul></body></html>"
+        return web.Response(text=html, content_type='text/html')
+
+    async def _upload(self, request: web.Request) -> web.Response:
+        return web.Response(body=self._image, content_type='image/jpeg')
+
+    async def _places_search(self, request: web.Request) -> web.Response:
+        query = request.query.get('query', '')
+        city = query.replace('tourist attractions in ', '').strip() or 'City'
+        rng = random.Random(self._page_id(city))
+        lat, lng = rng.uniform(-50, 60), rng.uniform(-120, 140)
+        results = [
+            {
+                'name': f"{city} Sight {i}",
+                'formatted_address': f"{i} Main Street, {city}",
+                'rating': round(rng.uniform(3.8, 4.9), 1),
+                'types': ['tourist_attraction'],
+                'place_id': f"stub-{self._page_id(city)}-{i}",
+                'geometry': {'location': {'lat': lat + rng.uniform(-0.05, 0.05), 'lng': lng + rng.uniform(-0.05, 0.05)}}
+            }
+            for i in range(1, self.PLACES_PER_SEARCH + 1)
+        ]
+        return web.json_response({'status': 'OK', 'results': results})
+
+    async def _place_details(self, request: web.Request) -> web.Response:
+        place_id = request.query.get('place_id', 'stub')
+        return web.json_response({'status': 'OK', 'result': {
+            'place_id': place_id,
+            'name': f"Place {place_id}",
+            'rating': 4.5,
+            'formatted_address': "1 Main Street",
+            'opening_hours': {'weekday_text': ["Monday: 9:00 AM – 5:00 PM"]},
+            'reviews': [{'author_name': 'Visitor', 'rating': 5, 'text': 'Worth the visit.'}]
+        }})
+
+    # Helpers ---------------------------------------------------------------
+
+    def _title(self, search: str) -> str:
+        return search.strip().split(',')[0].title() or 'Somewhere'
+
+    def _page_id(self, title: str) -> int:
+        return int(hashlib.sha1(title.encode()).hexdigest()[:8], 16)
+
+    def _make_image(self) -> bytes:
+        """A real JPEG so resizing and hashing do real work"""
+        from PIL import Image
+
+        image = Image.radial_gradient('L').resize((1600, 1067)).convert('RGB')
+        buffer = io.BytesIO()
+        image.save(buffer, 'JPEG', quality=85)
+        return buffer.getvalue()
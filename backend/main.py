@@ -1,5 +1,8 @@
+import time
+_BOOT_STARTED = time.perf_counter()
+
 import os
-import certifi
+import sys
 import ssl
 import urllib3
 import requests
@@ -31,17 +34,19 @@ class PatchedSession(original_session):
 
 requests.Session = PatchedSession
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import FileResponse, ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Optional
+import asyncio
 import uvicorn
-from datetime import datetime
 
-from services.itinerary_planner import ItineraryPlanner
-from pdf.generator import PDFGenerator
+from lazy_services import LazyService
+import profiling
 
-app = FastAPI(title="Vacation Builder API")
+# orjson encodes the large itinerary payloads several times faster than json
+app = FastAPI(title="Vacation Builder API", default_response_class=ORJSONResponse)
 
 # CORS middleware for Electron
 app.add_middleware(
@@ -50,11 +55,50 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Trace-Id"],
 )
 
-# Initialize services
-itinerary_planner = ItineraryPlanner()
-pdf_generator = PDFGenerator()
+# Per-request profiling: send "X-Profile: 1" (or ?profile=1) to record
+# spans, "stack" to also sample Python stacks; the response's X-Trace-Id
+# names a Chrome trace / Perfetto file served by /api/traces/{id}
+PROFILING_ENABLED = os.getenv("VB_PROFILING", "1") != "0"
+trace_store = profiling.TraceStore()
+
+@app.middleware("http")
+async def profile_request(request: Request, call_next):
+    mode = request.headers.get("x-profile") or request.query_params.get("profile")
+    if not PROFILING_ENABLED or mode not in ("1", "true", "stack"):
+        return await call_next(request)
+
+    with profiling.tracing(f"{request.method} {request.url.path}", stacks=mode == "stack") as trace:
+        response = await call_next(request)
+    await asyncio.to_thread(trace_store.save, trace)
+    response.headers["X-Trace-Id"] = trace.id
+    return response
+
+# Services are built on first use so the port binds before llama.cpp,
+# WeasyPrint and the fetcher libraries are imported
+def _build_itinerary_planner():
+    from services.itinerary_planner import ItineraryPlanner
+    return ItineraryPlanner()
+
+def _build_pdf_generator():
+    from pdf.generator import PDFGenerator
+    return PDFGenerator()
+
+def _build_image_proxy():
+    from services.image_proxy import ImageProxy
+    return ImageProxy()
+
+itinerary_planner = LazyService("itinerary planner", _build_itinerary_planner)
+pdf_generator = LazyService("PDF generator", _build_pdf_generator)
+image_proxy = LazyService("image proxy", _build_image_proxy)
+
+async def _get_service(service: LazyService):
+    """Get a service without blocking the event loop while it builds"""
+    if service.is_built():
+        return service.get()
+    return await asyncio.get_running_loop().run_in_executor(None, service.get)
 
 class Destination(BaseModel):
     name: str
@@ -64,34 +108,216 @@ class Destination(BaseModel):
 class VacationRequest(BaseModel):
     destinations: List[Destination]
     preferences: str
+    force_regenerate: bool = False  # Bypass the result cache
+    # Answer with a quick draft from the small model; fetch the main
+    # model's refined plan from /api/plan/refined/{id}
+    progressive: bool = False
 
 class VacationResponse(BaseModel):
     markdown: str
     itinerary: dict
 
+class SectionRequest(BaseModel):
+    markdown: str
+    itinerary: dict
+    destinations: List[Destination]
+    preferences: str = ""
+    instructions: str = ""
+    day: Optional[int] = None  # Regenerate this day...
+    destination: Optional[str] = None  # ...or every day spent here
+
+class PrefetchRequest(BaseModel):
+    destinations: List[Destination]
+
 class PDFRequest(BaseModel):
     markdown: str
     output_path: Optional[str] = None
 
+class ModelDownloadRequest(BaseModel):
+    model: str  # Catalog name or URL of a .gguf file
+    name: Optional[str] = None  # File name in models/ (default: from the URL)
+    sha256: Optional[str] = None  # Expected hash; Hugging Face publishes one
+
+# Keep references to background tasks so they aren't garbage collected
+_background_tasks = set()
+
+@app.on_event("startup")
+async def startup():
+    """Load the model and PDF engine in the background after boot"""
+    print(f"Backend booted in {time.perf_counter() - _BOOT_STARTED:.2f}s")
+    if os.getenv("VB_EAGER_WARMUP", "1") != "0":
+        itinerary_planner.warm()
+        pdf_generator.warm()
+
+    interval = float(os.getenv("VB_WARM_INTERVAL_HOURS", "0"))
+    if interval > 0:
+        _background_tasks.add(asyncio.create_task(_warm_caches_periodically(interval)))
+
+async def _warm_caches_periodically(interval_hours: float):
+    """Re-warm popular destinations while the app is idle in the background"""
+    from services.cache_warmer import CacheWarmer, load_destinations
+
+    planner = await _get_service(itinerary_planner)
+    warmer = CacheWarmer(
+        planner,
+        host_rate=float(os.getenv("VB_WARM_HOST_RATE", "1")),
+        max_age_hours=interval_hours
+    )
+    while True:
+        try:
+            await warmer.run(load_destinations(), warm_prompts=planner.llm.has_prompt_cache())
+        except Exception as e:
+            print(f"Error warming caches: {e}")
+        await asyncio.sleep(interval_hours * 3600)
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Release HTTP sessions held by async fetchers and PDF worker processes"""
+    planner = itinerary_planner.peek()
+    if planner:
+        await planner.scraper.close()
+    generator = pdf_generator.peek()
+    if generator:
+        generator.close()
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "llm_loaded": itinerary_planner.is_llm_ready()}
+    planner = itinerary_planner.peek()
+    llm = planner.llm if planner else None
+    # Importing fetchers pulls in bs4/lxml/aiohttp; until something else has
+    # loaded it there are no breakers to report
+    resilience = sys.modules.get('fetchers.resilience')
+    return {
+        "status": "healthy",
+        "llm_loaded": bool(planner and planner.is_llm_ready()),
+        "model": os.path.basename(llm.model_path) if llm else None,
+        # Lets the app offer a download instead of waiting for a model that isn't there
+        "model_missing": bool(llm and not llm.server_socket and not os.path.exists(llm.model_path)),
+        "progressive": bool(planner and planner.has_draft_model()),
+        "services": {
+            "planner": itinerary_planner.is_built(),
+            "pdf": pdf_generator.is_built()
+        },
+        "sources": resilience.breaker_states() if resilience else {}
+    }
+
+@app.get("/api/metrics")
+async def metrics():
+    """Result cache hit rate and savings"""
+    planner = itinerary_planner.peek()
+    result_cache = planner.llm.result_cache if planner else None
+    return {
+        "result_cache": result_cache.stats() if result_cache else {"enabled": False}
+    }
+
+@app.get("/api/cache/status")
+async def cache_status():
+    """Coverage and freshness of the warmed caches for popular destinations"""
+    from services.cache_warmer import cache_report, load_destinations
+    from services.enrichment_cache import EnrichmentCache
+
+    planner = itinerary_planner.peek()
+    cache = planner.enrichment_cache if planner else EnrichmentCache()
+    max_age = float(os.getenv("VB_ENRICHMENT_TTL_HOURS", "24"))
+    try:
+        return await asyncio.to_thread(cache_report, cache, load_destinations(), max_age)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@app.get("/api/traces")
+async def list_traces():
+    """Recorded request traces, newest first"""
+    return {"traces": await asyncio.to_thread(trace_store.list)}
+
+@app.get("/api/traces/{trace_id}")
+async def download_trace(trace_id: str):
+    """Chrome trace JSON for a profiled request (open in Perfetto or chrome://tracing)"""
+    path = trace_store.path(trace_id)
+    if not path:
+        raise HTTPException(status_code=404, detail="Trace not found")
+    return FileResponse(path, media_type="application/json", filename=f"trace-{trace_id}.json")
+
+def _use_downloaded_model(path: str):
+    """Load a finished download if the backend started without a model"""
+    planner = itinerary_planner.peek()
+    if planner and planner.llm.use_downloaded(path):
+        print(f"Loaded downloaded model {os.path.basename(path)}")
+
+_download_manager = None
+
+def _downloads():
+    global _download_manager
+    if _download_manager is None:
+        from llm.download import DownloadManager
+        _download_manager = DownloadManager(on_complete=_use_downloaded_model)
+    return _download_manager
+
+@app.get("/api/models")
+async def list_models():
+    """Installed GGUF models and the download catalog"""
+    from llm.benchmark import find_models
+    from llm.download import CATALOG
+    installed = [{"name": os.path.basename(path), "size_bytes": os.path.getsize(path)} for path in find_models()]
+    return {"installed": installed, "catalog": CATALOG, "downloads": _downloads().list()}
+
+@app.post("/api/models/download", status_code=202)
+async def download_model(request: ModelDownloadRequest):
+    """Download (or resume) a model into models/ in the background"""
+    try:
+        download = _downloads().start(request.model, request.name, request.sha256)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return download.status()
+
+@app.get("/api/models/downloads")
+async def model_downloads():
+    """Progress of model downloads started since the backend booted"""
+    return {"downloads": _downloads().list()}
+
+@app.delete("/api/models/downloads/{name}")
+async def cancel_model_download(name: str):
+    """Stop a download; starting it again resumes from the chunks on disk"""
+    if not _downloads().cancel(name):
+        raise HTTPException(status_code=404, detail="Download not found")
+    return {"status": "cancelling", "name": name}
+
+# Keep references to scheduled prefetches so they aren't garbage collected
+_prefetch_tasks = set()
+
+@app.post("/api/prefetch", status_code=202)
+async def prefetch(request: PrefetchRequest):
+    """Start enriching destinations in the background while the user types"""
+    names = [d.name.strip() for d in request.destinations if d.name.strip()]
+
+    async def run():
+        planner = await _get_service(itinerary_planner)
+        for name in names:
+            planner.prefetch(name)
+
+    task = asyncio.create_task(run())
+    _prefetch_tasks.add(task)
+    task.add_done_callback(_prefetch_tasks.discard)
+    return {"status": "scheduled", "destinations": names}
 
 @app.post("/api/plan", response_model=VacationResponse)
 async def plan_vacation(request: VacationRequest):
     """Generate vacation itinerary based on destinations and preferences"""
     try:
+        planner = await _get_service(itinerary_planner)
+
         # Check if LLM is loaded
-        if not itinerary_planner.is_llm_ready():
+        if not planner.is_llm_ready():
             raise HTTPException(
                 status_code=503,
                 detail="LLM model not loaded. Please download a GGUF model file and place it in backend/models/ directory. See README for instructions."
             )
 
-        result = await itinerary_planner.generate_itinerary(
+        generate = planner.generate_progressive if request.progressive else planner.generate_itinerary
+        result = await generate(
             destinations=request.destinations,
-            preferences=request.preferences
+            preferences=request.preferences,
+            force_regenerate=request.force_regenerate
         )
         return VacationResponse(
             markdown=result["markdown"],
@@ -105,12 +331,77 @@ async def plan_vacation(request: VacationRequest):
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/plan/refined/{refinement_id}", response_model=VacationResponse,
+         responses={202: {"description": "Still refining"}})
+async def refined_plan(refinement_id: str):
+    """The main model's version of a progressive plan, once it is ready"""
+    planner = itinerary_planner.peek()
+    task = planner.refinement(refinement_id) if planner else None
+    if task is None:
+        raise HTTPException(status_code=404, detail="Refinement not found or expired")
+    if not task.done():
+        return ORJSONResponse({"status": "refining"}, status_code=202)
+    if task.cancelled() or task.exception():
+        error = "cancelled" if task.cancelled() else str(task.exception())
+        raise HTTPException(status_code=500, detail=f"Refinement failed: {error}")
+    result = task.result()
+    return VacationResponse(markdown=result["markdown"], itinerary=result["itinerary"])
+
+@app.get("/api/images/{key}")
+async def proxied_image(key: str, request: Request, w: Optional[int] = None):
+    """Resized WebP variant of a gallery image, cacheable forever"""
+    proxy = await _get_service(image_proxy)
+    width = proxy.snap_width(w)
+    headers = {
+        "ETag": proxy.etag(key, width),
+        "Cache-Control": "public, max-age=31536000, immutable"
+    }
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+
+    path = await asyncio.to_thread(proxy.variant, key, width)
+    if not path:
+        raise HTTPException(status_code=404, detail="Image not available")
+    return FileResponse(path, media_type="image/webp", headers=headers)
+
+@app.post("/api/plan/section", response_model=VacationResponse)
+async def regenerate_section(request: SectionRequest):
+    """Regenerate one day or destination of an existing itinerary"""
+    if request.day is None and not request.destination:
+        raise HTTPException(status_code=400, detail="Give either a day or a destination to regenerate")
+
+    try:
+        planner = await _get_service(itinerary_planner)
+        if not planner.is_llm_ready():
+            raise HTTPException(status_code=503, detail="LLM model not loaded")
+
+        result = await planner.regenerate_section(
+            markdown=request.markdown,
+            itinerary=request.itinerary,
+            destinations=request.destinations,
+            preferences=request.preferences,
+            instructions=request.instructions,
+            day=request.day,
+            destination=request.destination
+        )
+        return VacationResponse(markdown=result["markdown"], itinerary=result["itinerary"])
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"Error in regenerate_section: {e}")
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.post("/api/generate-pdf")
 async def generate_pdf(request: PDFRequest):
     """Generate PDF from markdown itinerary"""
     try:
         print(f"Generating PDF...")
-        pdf_path = await pdf_generator.generate(request.markdown, request.output_path)
+        generator = await _get_service(pdf_generator)
+        pdf_path = await generator.generate(request.markdown, request.output_path)
         print(f"PDF saved to: {pdf_path}")
         return {"pdf_path": pdf_path, "success": True}
     except Exception as e:
@@ -119,7 +410,28 @@ async def generate_pdf(request: PDFRequest):
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
+def _start_inference_server(port: int):
+    """Load the model once in its own process for all HTTP workers to share"""
+    import atexit
+    import subprocess
+    import sys
+    import tempfile
+
+    socket_path = os.path.join(tempfile.gettempdir(), f"vacation-builder-llm-{port}.sock")
+    server = subprocess.Popen([sys.executable, "-m", "llm.inference_server", "--socket", socket_path])
+    atexit.register(server.terminate)
+    # Inherited by the workers uvicorn spawns
+    os.environ["LLM_SERVER_SOCKET"] = socket_path
+
 if __name__ == "__main__":
+    port = int(os.getenv("VB_PORT", "8000"))
+    workers = int(os.getenv("VB_WORKERS", "1"))
     print("Starting Vacation Builder Backend...")
-    print("Loading LLM model (this may take a moment)...")
-    uvicorn.run(app, host="127.0.0.1", port=8000)
+    print("The LLM model loads in the background once the server is up")
+    if workers > 1:
+        if not os.getenv("LLM_SERVER_SOCKET"):
+            _start_inference_server(port)
+        print(f"{workers} workers sharing the model via {os.environ['LLM_SERVER_SOCKET']}")
+        uvicorn.run("main:app", host="127.0.0.1", port=port, workers=workers)
+    else:
+        uvicorn.run(app, host="127.0.0.1", port=port)
@@ -1,23 +1,45 @@
-import markdown
-from weasyprint import HTML, CSS
 from datetime import datetime
+import asyncio
+import html as html_lib
+import importlib.util
+import io
+import multiprocessing
 import os
+import re
+import time
+import urllib.parse
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from profiling import async_span, span
+
+H2_START = re.compile(r'(?=<h2[\s>])')
+H2_TITLE = re.compile(r'<h2[^>]*>(.*?)</h2>', re.DOTALL)
+PROXY_IMAGE = re.compile(r'/api/images/([0-9a-f]{32})')
 
 class PDFGenerator:
     """Generate beautiful PDFs from markdown itineraries"""
 
+    # Relative links in the markdown (the gallery's /api/images/... URLs)
+    # resolve against this; _fetch_url serves those from disk
+    BASE_URL = "http://vacation-builder.local/"
+
+    # Documents with this many h2 sections (days, galleries, ...) get a
+    # table of contents, and are laid out in parallel worker processes
+    TOC_MIN_SECTIONS = 6
+    PARALLEL_MIN_SECTIONS = int(os.getenv("VB_PDF_PARALLEL_MIN_SECTIONS", "8"))
+
     def __init__(self):
         # Use ~/Downloads as default output directory
         self.output_dir = os.path.join(str(Path.home()), "Downloads")
         os.makedirs(self.output_dir, exist_ok=True)
+        self._image_proxy = None
+        self.workers = int(os.getenv("VB_PDF_WORKERS", "0")) or (os.cpu_count() or 1)
+        self._pool: Optional[ProcessPoolExecutor] = None
 
     async def generate(self, markdown_text: str, output_path: str = None) -> str:
         """Generate PDF from markdown text"""
 
-        # Convert markdown to HTML
-        html_content = self._markdown_to_html(markdown_text)
-
         # Determine output path
         if output_path:
             pdf_path = output_path
@@ -30,22 +52,237 @@ class PDFGenerator:
         # Ensure directory exists
         os.makedirs(os.path.dirname(pdf_path) if os.path.dirname(pdf_path) else self.output_dir, exist_ok=True)
 
-        # Create PDF with custom styling
-        HTML(string=html_content).write_pdf(
-            pdf_path,
-            stylesheets=[CSS(string=self._get_pdf_styles())]
-        )
+        started = time.perf_counter()
+        with async_span("pdf.render", 'pdf') as info:
+            with span("pdf.markdown", 'pdf'):
+                sections = self._split_sections(self._markdown_body(markdown_text))
+
+            # Download/resize gallery images once, before any layout needs them
+            await asyncio.to_thread(self._prepare_images, ''.join(s['html'] for s in sections))
 
+            if len(sections) - 1 >= self.PARALLEL_MIN_SECTIONS and self.workers > 1 and self._can_merge():
+                pages = await self._generate_parallel(sections, pdf_path)
+                mode = f"{self.workers} workers"
+            else:
+                pages = await asyncio.to_thread(self._generate_single, sections, pdf_path)
+                mode = "single pass"
+            info.update(pages=pages, sections=len(sections) - 1, mode=mode)
+
+        print(f"PDF: {pages} pages, {len(sections) - 1} sections in "
+              f"{time.perf_counter() - started:.1f}s ({mode})")
         return os.path.abspath(pdf_path)
 
+    def close(self):
+        """Stop the layout worker processes"""
+        if self._pool:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    def _generate_single(self, sections: List[Dict], pdf_path: str) -> int:
+        """Lay out the whole document in one WeasyPrint pass"""
+        # WeasyPrint pulls in Pango/cairo bindings; import on first render
+        from weasyprint import HTML, CSS
+
+        body = sections[0]['html']
+        if len(sections) - 1 >= self.TOC_MIN_SECTIONS:
+            # Page numbers are filled in by WeasyPrint via target-counter()
+            body += self._toc_html([(s['title'], s['anchor'], None) for s in sections[1:]])
+        body += ''.join(s['html'] for s in sections[1:])
+
+        # Create PDF with custom styling
+        with span("pdf.layout", 'pdf'):
+            document = HTML(string=self._wrap_html(body), base_url=self.BASE_URL, url_fetcher=self._fetch_url).render(
+                stylesheets=[CSS(string=self._get_pdf_styles())]
+            )
+        with span("pdf.write", 'pdf', pages=len(document.pages)):
+            document.write_pdf(pdf_path)
+        return len(document.pages)
+
+    async def _generate_parallel(self, sections: List[Dict], pdf_path: str) -> int:
+        """Lay out chunks of sections in worker processes and merge the pages
+
+        Each chunk is its own document, so page numbers are stamped onto
+        the merged PDF afterwards and the table of contents is built from
+        the pages each worker reports for its section anchors.
+        """
+        loop = asyncio.get_running_loop()
+        pool = self._get_pool()
+        stylesheet = self._get_pdf_styles() + self.SECTION_STYLES
+
+        chunks = [sections[0]['html']] if sections[0]['html'].strip() else []
+        chunks += [''.join(s['html'] for s in group) for group in self._pack(sections[1:], self.workers)]
+
+        async def render(i: int, chunk: str):
+            # Worker processes can't record spans; time each chunk from here
+            with async_span(f"pdf.layout chunk {i}", 'pdf'):
+                return await loop.run_in_executor(pool, _render_chunk, self._wrap_html(chunk), stylesheet)
+
+        results = await asyncio.gather(*[render(i, chunk) for i, chunk in enumerate(chunks)])
+
+        intro_pages = results[0][1] if sections[0]['html'].strip() else 0
+        body_results = results[1:] if intro_pages else results
+        toc_pdf = await asyncio.to_thread(self._render_toc, sections, intro_pages, body_results, stylesheet)
+
+        parts = [results[0][0]] if intro_pages else []
+        parts.append(toc_pdf)
+        parts += [pdf for pdf, _, _ in body_results]
+        return await asyncio.to_thread(self._merge, parts, pdf_path)
+
+    def _render_toc(self, sections: List[Dict], intro_pages: int,
+                    body_results: List[Tuple[bytes, int, Dict]], stylesheet: str) -> bytes:
+        """Table of contents for the merged PDF, numbered from the workers' page counts
+
+        It goes after the title page(s) and shifts every page after it, so
+        it is re-rendered until its own length is stable.
+        """
+        from weasyprint import HTML, CSS
+
+        toc_pages = 1
+        with span("pdf.toc", 'pdf'):
+            for _ in range(3):
+                offset = intro_pages + toc_pages
+                section_pages = {}
+                for pdf, pages, anchors in body_results:
+                    for anchor, page in anchors.items():
+                        section_pages[anchor] = offset + page + 1
+                    offset += pages
+
+                entries = [(s['title'], s['anchor'], section_pages.get(s['anchor'])) for s in sections[1:]]
+                toc_document = HTML(string=self._wrap_html(self._toc_html(entries)), base_url=self.BASE_URL).render(
+                    stylesheets=[CSS(string=stylesheet)]
+                )
+                if len(toc_document.pages) == toc_pages:
+                    break
+                toc_pages = len(toc_document.pages)
+            return toc_document.write_pdf()
+
+    def _merge(self, parts: List[bytes], pdf_path: str) -> int:
+        """Concatenate PDFs and stamp continuous "page / pages" footers"""
+        from pypdf import PdfReader, PdfWriter
+        from weasyprint import HTML, CSS
+
+        with span("pdf.merge", 'pdf', parts=len(parts)):
+            writer = PdfWriter()
+            for part in parts:
+                for page in PdfReader(io.BytesIO(part)).pages:
+                    writer.add_page(page)
+
+            total = len(writer.pages)
+            blank_pages = '<div class="blank">&nbsp;</div>' * total
+            numbers = HTML(string=blank_pages).write_pdf(stylesheets=[CSS(string=self.NUMBER_STYLES)])
+            for page, overlay in zip(writer.pages, PdfReader(io.BytesIO(numbers)).pages):
+                page.merge_page(overlay)
+
+            with open(pdf_path, 'wb') as f:
+                writer.write(f)
+        return total
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn, not fork: the server process runs threads (hedging, aiohttp)
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context('spawn')
+            )
+        return self._pool
+
+    def _can_merge(self) -> bool:
+        if importlib.util.find_spec('pypdf') is not None:
+            return True
+        print("pypdf not installed; rendering the PDF in a single pass")
+        return False
+
+    def _pack(self, sections: List[Dict], groups: int) -> List[List[Dict]]:
+        """Split sections into at most `groups` contiguous runs of similar size"""
+        total = sum(len(s['html']) for s in sections)
+        target = total / max(1, min(groups, len(sections)))
+        packed, current, size = [], [], 0
+        for section in sections:
+            current.append(section)
+            size += len(section['html'])
+            if size >= target and len(packed) < groups - 1:
+                packed.append(current)
+                current, size = [], 0
+        if current:
+            packed.append(current)
+        return packed
+
+    def _split_sections(self, body_html: str) -> List[Dict]:
+        """Split body HTML at h2 boundaries; the first entry is everything before the first h2
+
+        Each h2 gets an id so the table of contents can point at it.
+        """
+        parts = H2_START.split(body_html)
+        sections = [{'title': None, 'anchor': None, 'html': parts[0]}]
+        for i, part in enumerate(parts[1:], 1):
+            anchor = f"section-{i}"
+            title_match = H2_TITLE.match(part)
+            title = re.sub(r'<[^>]+>', '', title_match.group(1)).strip() if title_match else f"Section {i}"
+            sections.append({
+                'title': html_lib.unescape(title),
+                'anchor': anchor,
+                'html': part.replace('<h2', f'<h2 id="{anchor}"', 1)
+            })
+        return sections
+
+    def _toc_html(self, entries: List[Tuple[str, str, Optional[int]]]) -> str:
+        """Table of contents; entries without a page number use target-counter()"""
+        items = []
+        for title, anchor, page in entries:
+            label = html_lib.escape(title)
+            if page is None:
+                items.append(f'<li><a class="toc-link" href="#{anchor}">{label}</a></li>')
+            else:
+                items.append(f'<li><span class="toc-label">{label}</span><span class="toc-page">{page}</span></li>')
+        return f'<nav class="toc"><p class="toc-title">Contents</p><ul>{"".join(items)}</ul></nav>'
+
+    def _prepare_images(self, body_html: str):
+        """Build the print-size variant of every proxied image in parallel"""
+        keys = set(PROXY_IMAGE.findall(body_html))
+        if not keys:
+            return
+        proxy = self._get_image_proxy()
+        with span("pdf.images", 'pdf', images=len(keys)):
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                list(pool.map(lambda key: proxy.variant(key, proxy.PRINT_WIDTH), keys))
+
+    def _get_image_proxy(self):
+        if self._image_proxy is None:
+            from services.image_proxy import ImageProxy
+            self._image_proxy = ImageProxy()
+        return self._image_proxy
+
+    def _fetch_url(self, url: str) -> dict:
+        """Load proxied gallery images from the local cache at print size"""
+        from weasyprint import default_url_fetcher
+
+        proxy = self._get_image_proxy()
+        parsed = urllib.parse.urlparse(url)
+        prefix = f"{proxy.ROUTE}/"
+        if url.startswith(self.BASE_URL) and parsed.path.startswith(prefix):
+            key = parsed.path[len(prefix):]
+            path = proxy.variant(key, proxy.PRINT_WIDTH)
+            if not path:
+                raise ValueError(f"Image {key} not available")
+            with open(path, 'rb') as f:
+                return {'string': f.read(), 'mime_type': 'image/webp', 'redirected_url': url}
+
+        return default_url_fetcher(url)
+
     def _markdown_to_html(self, markdown_text: str) -> str:
         """Convert markdown to styled HTML"""
+        return self._wrap_html(self._markdown_body(markdown_text))
+
+    def _markdown_body(self, markdown_text: str) -> str:
+        """Convert markdown to the HTML that goes inside the page container"""
+
+        import markdown
 
         # Convert markdown to HTML
         md = markdown.Markdown(extensions=['extra', 'nl2br', 'sane_lists'])
-        body_html = md.convert(markdown_text)
+        return md.convert(markdown_text)
 
-        # Wrap in complete HTML document
+    def _wrap_html(self, body_html: str) -> str:
+        """Wrap body HTML in the complete document"""
         html = f"""
 <!DOCTYPE html>
 <html lang="en">
@@ -67,6 +304,35 @@ class PDFGenerator:
 
         return html
 
+    # Chunks rendered separately get their page numbers stamped after merging
+    SECTION_STYLES = """
+@page {
+    @bottom-center {
+        content: none;
+    }
+}
+"""
+
+    # Blank pages carrying only the footer numbers, overlaid onto the merged PDF
+    NUMBER_STYLES = """
+@page {
+    size: A4;
+    margin: 2cm;
+    @bottom-center {
+        content: counter(page) " / " counter(pages);
+    }
+}
+
+.blank {
+    color: transparent;
+    page-break-after: always;
+}
+
+.blank:last-child {
+    page-break-after: auto;
+}
+"""
+
     def _get_pdf_styles(self) -> str:
         """Get CSS styles for PDF"""
         return """
@@ -158,6 +424,11 @@ hr {
     padding: 10px 0;
 }
 
+img {
+    max-width: 100%;
+    height: auto;
+}
+
 blockquote {
     background: #f9f9f9;
     border-left: 4px solid #3498db;
@@ -195,4 +466,56 @@ th {
 tr:nth-child(even) {
     background-color: #f9f9f9;
 }
+
+.toc {
+    page-break-after: always;
+}
+
+.toc-title {
+    color: #2980b9;
+    font-size: 20pt;
+    margin-bottom: 15px;
+}
+
+.toc ul {
+    list-style: none;
+    padding-left: 0;
+}
+
+.toc li {
+    margin-bottom: 6px;
+}
+
+.toc a.toc-link {
+    color: #333;
+}
+
+.toc a.toc-link::after {
+    content: leader('.') target-counter(attr(href), page);
+}
+
+.toc-page {
+    float: right;
+}
         """
+
+# Worker-process side of parallel rendering; one generator per process
+_worker_generator: Optional[PDFGenerator] = None
+
+def _render_chunk(html: str, stylesheet: str) -> Tuple[bytes, int, Dict[str, int]]:
+    """Lay out one chunk; returns its PDF, page count and the page index of each anchor"""
+    global _worker_generator
+    from weasyprint import HTML, CSS
+
+    if _worker_generator is None:
+        _worker_generator = PDFGenerator()
+
+    document = HTML(
+        string=html, base_url=PDFGenerator.BASE_URL, url_fetcher=_worker_generator._fetch_url
+    ).render(stylesheets=[CSS(string=stylesheet)])
+
+    anchors: Dict[str, int] = {}
+    for index, page in enumerate(document.pages):
+        for name in page.anchors:
+            anchors.setdefault(name, index)
+    return document.write_pdf(), len(document.pages), anchors
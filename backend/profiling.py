@@ -0,0 +1,248 @@
+import contextvars
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+_trace: contextvars.ContextVar = contextvars.ContextVar('profiling_trace', default=None)
+
+TRACE_ID = re.compile(r'^[0-9]{8}-[0-9]{6}-[0-9a-f]{8}$')
+MAX_STACK_DEPTH = 64
+
+class StackSampler:
+    """Samples every thread's Python stack on a background thread
+
+    Only used for traces that ask for stacks; the cost is one
+    sys._current_frames() walk per interval while the request runs.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.samples: List[tuple] = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def start(self, clock):
+        self._clock = clock
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            now = self._clock()
+            for tid, frame in sys._current_frames().items():
+                if tid == own:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.reverse()
+                self.samples.append((now, tid, stack))
+
+    def events(self, pid: int, tids) -> List[Dict]:
+        """Merge consecutive samples into nested slices, one flame chart per thread"""
+        events = []
+        by_thread: Dict[int, List[tuple]] = {}
+        for ts, tid, stack in self.samples:
+            if tid in tids:
+                by_thread.setdefault(tid, []).append((ts, stack))
+
+        step = self.interval * 1e6
+        for tid, samples in by_thread.items():
+            open_frames: List[tuple] = []  # (name, start)
+
+            def close(depth, ts):
+                while len(open_frames) > depth:
+                    name, start = open_frames.pop()
+                    events.append({'name': name, 'cat': 'sample', 'ph': 'X', 'ts': start,
+                                   'dur': max(ts - start, 1.0), 'pid': pid, 'tid': tid})
+
+            for ts, stack in samples:
+                common = 0
+                while (common < len(open_frames) and common < len(stack)
+                       and open_frames[common][0] == stack[common]):
+                    common += 1
+                close(common, ts)
+                open_frames.extend((name, ts) for name in stack[common:])
+            close(0, samples[-1][0] + step)
+        return events
+
+class Trace:
+    """Spans (and optionally sampled stacks) recorded for one request"""
+
+    def __init__(self, name: str, sample_interval: Optional[float] = None):
+        self.id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self.name = name
+        self.started_at = time.time()
+        self.events: List[Dict] = []
+        self.sampler = StackSampler(sample_interval) if sample_interval else None
+        self._origin = time.perf_counter()
+        self._threads: Dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    def now(self) -> float:
+        """Microseconds since the trace started"""
+        return (time.perf_counter() - self._origin) * 1e6
+
+    def add(self, name: str, category: str, start: float, end: float, args: Optional[Dict] = None):
+        """Record a completed span on the calling thread"""
+        thread = threading.current_thread()
+        event = {'name': name, 'cat': category, 'ph': 'X', 'ts': start, 'dur': end - start,
+                 'pid': os.getpid(), 'tid': thread.ident}
+        if args:
+            event['args'] = args
+        with self._lock:
+            self._threads.setdefault(thread.ident, thread.name)
+            self.events.append(event)
+
+    def add_async(self, name: str, category: str, start: float, end: float, args: Optional[Dict] = None):
+        """Record a span that may overlap others on the same thread (coroutines)"""
+        thread = threading.current_thread()
+        event_id = uuid.uuid4().hex[:16]
+        begin = {'name': name, 'cat': category, 'ph': 'b', 'id': event_id, 'ts': start,
+                 'pid': os.getpid(), 'tid': thread.ident}
+        if args:
+            begin['args'] = args
+        with self._lock:
+            self._threads.setdefault(thread.ident, thread.name)
+            self.events.append(begin)
+            self.events.append({**begin, 'ph': 'e', 'ts': end, 'args': {}})
+
+    def to_chrome(self) -> Dict:
+        """Chrome trace / Perfetto JSON"""
+        pid = os.getpid()
+        with self._lock:
+            events = list(self.events)
+            threads = dict(self._threads)
+        if self.sampler:
+            # Only threads that did work for this request; others are idle
+            # pool workers or concurrent requests
+            events.extend(self.sampler.events(pid, threads))
+
+        metadata = [{'name': 'process_name', 'ph': 'M', 'pid': pid, 'args': {'name': 'vacation-builder'}}]
+        metadata.extend(
+            {'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}}
+            for tid, name in threads.items()
+        )
+        return {
+            'traceEvents': metadata + sorted(events, key=lambda e: e['ts']),
+            'displayTimeUnit': 'ms',
+            'metadata': {'trace_id': self.id, 'name': self.name, 'started_at': self.started_at}
+        }
+
+class TraceStore:
+    """Finished traces as JSON files, keeping the most recent `keep`"""
+
+    def __init__(self, directory: Optional[str] = None, keep: Optional[int] = None):
+        self.directory = directory or os.path.join(os.getenv("VB_CACHE_DIR", "cache"), "traces")
+        self.keep = keep or int(os.getenv("VB_PROFILE_KEEP", "50"))
+        self._lock = threading.Lock()
+
+    def path(self, trace_id: str) -> Optional[str]:
+        """File for a trace id, or None if the id is malformed or unknown"""
+        if not TRACE_ID.match(trace_id):
+            return None
+        path = os.path.join(self.directory, f"{trace_id}.json")
+        return path if os.path.exists(path) else None
+
+    def save(self, trace: Trace) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{trace.id}.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(trace.to_chrome(), f)
+        self._prune()
+        return path
+
+    def list(self) -> List[Dict]:
+        """Stored traces, newest first"""
+        traces = []
+        for name in sorted(os.listdir(self.directory), reverse=True) if os.path.isdir(self.directory) else []:
+            if name.endswith('.json'):
+                path = os.path.join(self.directory, name)
+                traces.append({'id': name[:-5], 'bytes': os.path.getsize(path), 'created_at': os.path.getmtime(path)})
+        return traces
+
+    def _prune(self):
+        with self._lock:
+            for old in self.list()[self.keep:]:
+                try:
+                    os.remove(os.path.join(self.directory, f"{old['id']}.json"))
+                except OSError:
+                    pass
+
+def active() -> bool:
+    """True inside a traced request"""
+    return _trace.get() is not None
+
+def untraced(fn, *args):
+    """Call fn (e.g. create_task) in a copy of the context without the trace
+
+    For background work that can outlive the request: a task copies the
+    context it was created in and would keep adding spans to a trace that
+    has already been saved.
+    """
+    context = contextvars.copy_context()
+    context.run(_trace.set, None)
+    return context.run(fn, *args)
+
+@contextmanager
+def span(name: str, category: str = 'app', **args):
+    """Record a nested span if the current request is traced
+
+    Outside a trace this costs one contextvar lookup. Work handed to
+    asyncio.to_thread (or a copied context) lands in the same trace, on
+    its own thread track.
+    """
+    trace = _trace.get()
+    if trace is None:
+        yield args
+        return
+    start = trace.now()
+    try:
+        yield args
+    finally:
+        trace.add(name, category, start, trace.now(), args)
+
+@contextmanager
+def async_span(name: str, category: str = 'app', **args):
+    """Like span(), for coroutines that run concurrently on the event loop
+
+    Recorded as an async slice so overlapping work doesn't have to nest.
+    """
+    trace = _trace.get()
+    if trace is None:
+        yield args
+        return
+    start = trace.now()
+    try:
+        yield args
+    finally:
+        trace.add_async(name, category, start, trace.now(), args)
+
+@contextmanager
+def tracing(name: str, stacks: bool = False, sample_interval: Optional[float] = None):
+    """Scope that records a trace; yields it so the caller can save it"""
+    if stacks:
+        sample_interval = sample_interval or float(os.getenv("VB_PROFILE_SAMPLE_MS", "5")) / 1000
+    trace = Trace(name, sample_interval if stacks else None)
+    token = _trace.set(trace)
+    if trace.sampler:
+        trace.sampler.start(trace.now)
+    try:
+        with span(name, 'request'):
+            yield trace
+    finally:
+        if trace.sampler:
+            trace.sampler.stop()
+        _trace.reset(token)
@@ -0,0 +1,110 @@
+import asyncio
+import os
+import time
+from typing import Dict, List, Optional
+from fetchers.resilience import host_rate_limits
+from services.image_proxy import ImageProxy
+from services.thumbnail_cache import ThumbnailCache
+
+DEFAULT_DESTINATIONS_FILE = os.path.join(os.path.dirname(__file__), '..', 'popular_destinations.txt')
+
+def load_destinations(path: Optional[str] = None) -> List[str]:
+    """Read one destination per line, ignoring blanks and # comments"""
+    path = path or os.getenv("VB_WARM_DESTINATIONS_FILE", DEFAULT_DESTINATIONS_FILE)
+    with open(path, encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith('#')]
+
+class CacheWarmer:
+    """Pre-run enrichment, image downloads and prompt prefixes for popular destinations
+
+    Work already done within `max_age` is skipped, so an interrupted run
+    picks up where it stopped. Every upstream host is rate limited for the
+    whole run.
+    """
+
+    def __init__(self, planner, thumbnails: Optional[ThumbnailCache] = None,
+                 host_rate: float = 1.0, max_age_hours: float = 20.0):
+        self.planner = planner
+        self.cache = planner.enrichment_cache
+        self.thumbnails = thumbnails or ThumbnailCache()
+        self.image_proxy = ImageProxy(self.thumbnails)
+        self.host_rate = host_rate
+        self.max_age = max_age_hours * 3600
+
+    async def run(self, destinations: List[str], warm_prompts: bool = False) -> Dict:
+        """Warm every destination; returns counts of what was done"""
+        if warm_prompts and self.planner.llm is None:
+            raise ValueError("Warming prompts needs a planner with its models loaded")
+        done = {'enriched': 0, 'skipped': 0, 'thumbnails': 0, 'prompts': 0, 'failed': 0}
+        started = time.monotonic()
+
+        with host_rate_limits(self.host_rate):
+            for i, name in enumerate(destinations, 1):
+                print(f"[warm {i}/{len(destinations)}] {name}")
+                try:
+                    await self._warm_one(name, warm_prompts, done)
+                except Exception as e:
+                    done['failed'] += 1
+                    print(f"   ✗ Failed to warm {name}: {e}")
+
+        print(f"Cache warming finished in {time.monotonic() - started:.0f}s: {done}")
+        return done
+
+    async def _warm_one(self, name: str, warm_prompts: bool, done: Dict):
+        info = await asyncio.to_thread(self.cache.get, name, self.max_age)
+        if info is None:
+            # No per-source SLO here: a background job can afford to wait
+            info = await self.planner._gather_destination_info(name)
+            await asyncio.to_thread(self.planner.store_enrichment, name, info)
+            done['enriched'] += 1
+        else:
+            done['skipped'] += 1
+
+        images = info.images
+        cached = 0
+        for url in images:
+            # Downloads the original and builds the variant the gallery shows
+            key = self.thumbnails.remember(url)
+            if await asyncio.to_thread(self.image_proxy.variant, key, ImageProxy.DEFAULT_WIDTH):
+                cached += 1
+        await asyncio.to_thread(self.cache.mark_thumbnails, name, len(images), cached)
+        done['thumbnails'] += cached
+
+        if warm_prompts and self._prompt_stale(name):
+            prefix = self.planner.prompt_prefix(name, info)
+            if await self.planner.warm_prompt(prefix):
+                await asyncio.to_thread(self.cache.mark_prompt, name)
+                done['prompts'] += 1
+
+    def _prompt_stale(self, name: str) -> bool:
+        status = self.cache.status([name])[0]
+        age = status['prompt_age_hours']
+        return age is None or age * 3600 > self.max_age
+
+    def report(self, destinations: List[str]) -> Dict:
+        """Coverage and freshness of the cache for a destination list"""
+        return cache_report(self.cache, destinations, self.max_age / 3600)
+
+def cache_report(cache, destinations: List[str], max_age_hours: float = 20.0) -> Dict:
+    """Coverage and freshness of an EnrichmentCache for a destination list"""
+    rows = cache.status(destinations)
+
+    def fraction(count: int) -> float:
+        return round(count / len(rows), 3) if rows else 0.0
+
+    enriched = [r for r in rows if r['enriched_age_hours'] is not None]
+    fresh = [r for r in enriched if r['enriched_age_hours'] <= max_age_hours]
+    thumbs_total = sum(r['thumbs_total'] for r in rows)
+    thumbs_cached = sum(r['thumbs_cached'] for r in rows)
+    ages = sorted(r['enriched_age_hours'] for r in enriched)
+
+    return {
+        'destinations': len(rows),
+        'enriched': fraction(len(enriched)),
+        'fresh': fraction(len(fresh)),
+        'thumbnails': round(thumbs_cached / thumbs_total, 3) if thumbs_total else 0.0,
+        'prompts': fraction(sum(1 for r in rows if r['prompt_age_hours'] is not None)),
+        'median_age_hours': ages[len(ages) // 2] if ages else None,
+        'oldest_age_hours': ages[-1] if ages else None,
+        'rows': rows
+    }
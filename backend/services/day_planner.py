@@ -0,0 +1,121 @@
+import math
+from typing import List
+import numpy as np
+from services.records import Attraction
+
+EARTH_RADIUS_KM = 6371.0
+
+def haversine_matrix(lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+    """Pairwise great-circle distances in km, computed in one vectorized pass"""
+    lat = np.radians(lats)[:, None]
+    lng = np.radians(lngs)[:, None]
+    dlat = lat - lat.T
+    dlng = lng - lng.T
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat) * np.cos(lat.T) * np.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+class DayPlanner:
+    """Group attractions into nearby per-day clusters and order each day's route"""
+
+    ITERATIONS = 10
+
+    def plan(self, attractions: List[Attraction], num_days: int) -> List[List[Attraction]]:
+        """Split attractions with coordinates into `num_days` ordered routes
+
+        Attractions without coordinates are left out; days may be empty when
+        there are fewer attractions than days.
+        """
+        located = [a for a in attractions if a.lat is not None and a.lng is not None]
+        if not located or num_days < 1:
+            return []
+
+        dist = haversine_matrix(
+            np.array([a.lat for a in located], dtype=np.float64),
+            np.array([a.lng for a in located], dtype=np.float64)
+        )
+
+        clusters = self._cluster(dist, min(num_days, len(located)))
+        days = [[located[i] for i in self._order_route(dist, members)] for members in clusters]
+        # Days with the most to see first; travellers have most energy early on
+        days.sort(key=len, reverse=True)
+        return days + [[] for _ in range(num_days - len(days))]
+
+    def _cluster(self, dist: np.ndarray, k: int) -> List[List[int]]:
+        """Capacity-balanced k-medoids so no day gets all the attractions"""
+        n = len(dist)
+        capacity = math.ceil(n / k)
+        medoids = self._init_medoids(dist, k)
+
+        assignment = np.zeros(n, dtype=int)
+        for _ in range(self.ITERATIONS):
+            assignment = self._assign(dist, medoids, capacity)
+
+            new_medoids = []
+            for c in range(k):
+                members = np.flatnonzero(assignment == c)
+                if not len(members):
+                    new_medoids.append(medoids[c])
+                    continue
+                within = dist[np.ix_(members, members)].sum(axis=1)
+                new_medoids.append(int(members[np.argmin(within)]))
+
+            if new_medoids == medoids:
+                break
+            medoids = new_medoids
+
+        return [np.flatnonzero(assignment == c).tolist() for c in range(k)]
+
+    def _init_medoids(self, dist: np.ndarray, k: int) -> List[int]:
+        """Deterministic farthest-point seeding, starting from the most central point"""
+        medoids = [int(np.argmin(dist.sum(axis=1)))]
+        while len(medoids) < k:
+            medoids.append(int(np.argmax(dist[:, medoids].min(axis=1))))
+        return medoids
+
+    def _assign(self, dist: np.ndarray, medoids: List[int], capacity: int) -> np.ndarray:
+        """Assign points to medoids, most 'decided' points first, respecting capacity"""
+        to_medoid = dist[:, medoids]  # (n, k)
+        sorted_d = np.sort(to_medoid, axis=1)
+        # Points with a big gap between their best and second-best medoid go first
+        regret = sorted_d[:, 1] - sorted_d[:, 0] if len(medoids) > 1 else -sorted_d[:, 0]
+
+        assignment = np.full(len(dist), -1, dtype=int)
+        load = [0] * len(medoids)
+        for point in np.argsort(-regret):
+            for c in np.argsort(to_medoid[point]):
+                if load[c] < capacity:
+                    assignment[point] = c
+                    load[c] += 1
+                    break
+        return assignment
+
+    def _order_route(self, dist: np.ndarray, members: List[int]) -> List[int]:
+        """Open-path TSP: nearest-neighbour tour improved with 2-opt"""
+        if len(members) <= 2:
+            return list(members)
+
+        sub = dist[np.ix_(members, members)]
+        # Start at the point farthest from the cluster centre: a route end
+        route = [int(np.argmax(sub.sum(axis=1)))]
+        remaining = set(range(len(members))) - set(route)
+        while remaining:
+            last = route[-1]
+            nxt = min(remaining, key=lambda j: sub[last, j])
+            route.append(nxt)
+            remaining.remove(nxt)
+
+        improved = True
+        while improved:
+            improved = False
+            for i in range(len(route) - 2):
+                for j in range(i + 2, len(route)):
+                    a, b = route[i], route[i + 1]
+                    c = route[j]
+                    d = route[j + 1] if j + 1 < len(route) else None
+                    before = sub[a, b] + (sub[c, d] if d is not None else 0.0)
+                    after = sub[a, c] + (sub[b, d] if d is not None else 0.0)
+                    if after < before - 1e-9:
+                        route[i + 1:j + 1] = reversed(route[i + 1:j + 1])
+                        improved = True
+
+        return [members[i] for i in route]
@@ -0,0 +1,107 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+import orjson
+from services.records import DestinationInfo
+
+def normalize_destination(name: str) -> str:
+    """Cache key for a destination name: lowercase, single spaces"""
+    return ' '.join(name.lower().split())
+
+class EnrichmentCache:
+    """Persistent SQLite store of gathered destination info plus warming status"""
+
+    def __init__(self, path: Optional[str] = None):
+        cache_dir = os.getenv("VB_CACHE_DIR", "cache")
+        self.path = path or os.path.join(cache_dir, "enrichment.sqlite")
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS enrichment (
+                name TEXT PRIMARY KEY,
+                data TEXT NOT NULL,
+                fetched_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS warm_status (
+                name TEXT PRIMARY KEY,
+                thumbs_total INTEGER NOT NULL DEFAULT 0,
+                thumbs_cached INTEGER NOT NULL DEFAULT 0,
+                thumbs_at REAL,
+                prompt_at REAL
+            );
+        """)
+
+    def get(self, name: str, max_age: float) -> Optional[DestinationInfo]:
+        """Cached info for a destination if younger than max_age seconds"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, fetched_at FROM enrichment WHERE name = ?",
+                (normalize_destination(name),)
+            ).fetchone()
+        if not row or time.time() - row[1] > max_age:
+            return None
+        return DestinationInfo.from_dict(orjson.loads(row[0]))
+
+    def put(self, name: str, info: DestinationInfo):
+        """Store gathered info for a destination"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO enrichment VALUES (?, ?, ?)",
+                (normalize_destination(name), orjson.dumps(info.to_dict()).decode(), time.time())
+            )
+
+    def age(self, name: str) -> Optional[float]:
+        """Seconds since the destination was last enriched (None if never)"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT fetched_at FROM enrichment WHERE name = ?",
+                (normalize_destination(name),)
+            ).fetchone()
+        return time.time() - row[0] if row else None
+
+    def mark_thumbnails(self, name: str, total: int, cached: int):
+        """Record how many of a destination's gallery thumbnails are on disk"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                """INSERT INTO warm_status (name, thumbs_total, thumbs_cached, thumbs_at)
+                   VALUES (?, ?, ?, ?)
+                   ON CONFLICT(name) DO UPDATE SET thumbs_total = excluded.thumbs_total,
+                       thumbs_cached = excluded.thumbs_cached, thumbs_at = excluded.thumbs_at""",
+                (normalize_destination(name), total, cached, time.time())
+            )
+
+    def mark_prompt(self, name: str):
+        """Record that a destination's prompt prefix was evaluated"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                """INSERT INTO warm_status (name, prompt_at) VALUES (?, ?)
+                   ON CONFLICT(name) DO UPDATE SET prompt_at = excluded.prompt_at""",
+                (normalize_destination(name), time.time())
+            )
+
+    def status(self, names: List[str]) -> List[Dict]:
+        """Per-destination warmth: enrichment age, thumbnails and prompt prefix"""
+        now = time.time()
+        rows = []
+        for name in names:
+            key = normalize_destination(name)
+            with self._lock:
+                enriched = self._conn.execute(
+                    "SELECT fetched_at FROM enrichment WHERE name = ?", (key,)
+                ).fetchone()
+                warm = self._conn.execute(
+                    "SELECT thumbs_total, thumbs_cached, thumbs_at, prompt_at FROM warm_status WHERE name = ?",
+                    (key,)
+                ).fetchone()
+            rows.append({
+                'name': name,
+                'enriched_age_hours': round((now - enriched[0]) / 3600, 1) if enriched else None,
+                'thumbs_total': warm[0] if warm else 0,
+                'thumbs_cached': warm[1] if warm else 0,
+                'prompt_age_hours': round((now - warm[3]) / 3600, 1) if warm and warm[3] else None,
+            })
+        return rows
@@ -0,0 +1,92 @@
+import os
+import re
+import threading
+from typing import Dict, Optional
+from services.thumbnail_cache import ThumbnailCache
+
+class ImageProxy:
+    """Resized WebP variants of gallery images, built once and served from disk
+
+    Gallery markdown points at /api/images/<key>?w=<width> instead of the
+    upstream URL. The first request downloads the original (via
+    ThumbnailCache) and writes the variant next to it; later requests,
+    re-renders and offline views read the file. A variant's bytes never
+    change for a key and width, so they can be cached forever.
+    """
+
+    ROUTE = "/api/images"
+    WIDTHS = (400, 800, 1600)
+    DEFAULT_WIDTH = 800
+    PRINT_WIDTH = 1600
+    QUALITY = 80
+
+    _KEY_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+    def __init__(self, thumbnails: Optional[ThumbnailCache] = None):
+        self.thumbnails = thumbnails or ThumbnailCache()
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+
+    def proxy_path(self, url: str, width: int = DEFAULT_WIDTH) -> str:
+        """Relative proxy URL for an upstream image"""
+        return f"{self.ROUTE}/{self.thumbnails.remember(url)}?w={width}"
+
+    def snap_width(self, width: Optional[int]) -> int:
+        """Nearest supported width at or above the requested one"""
+        if not width:
+            return self.DEFAULT_WIDTH
+        return next((w for w in self.WIDTHS if w >= width), self.WIDTHS[-1])
+
+    def etag(self, key: str, width: int) -> str:
+        return f'"{key}-w{width}"'
+
+    def variant(self, key: str, width: int) -> Optional[str]:
+        """Path of the WebP variant, building it if needed (None if unavailable)"""
+        if not self._KEY_PATTERN.match(key):
+            return None
+
+        path = os.path.join(self.thumbnails.directory, key[:2], key, f"w{width}.webp")
+        if os.path.exists(path):
+            return path
+
+        # One builder per variant; concurrent requests wait for it
+        with self._lock_for(f"{key}-{width}"):
+            if os.path.exists(path):
+                return path
+
+            url = self.thumbnails.url_for(key)
+            original = self.thumbnails.ensure(url) if url else None
+            if not original:
+                return None
+
+            try:
+                self._resize(original, path, width)
+                return path
+            except Exception as e:
+                print(f"Error resizing image {key}: {e}")
+                tmp_path = f"{path}.{os.getpid()}-{threading.get_ident()}.part"
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                return None
+
+    def _resize(self, original: str, path: str, width: int):
+        from PIL import Image, ImageOps
+
+        with Image.open(original) as img:
+            # JPEG can decode at 1/2, 1/4 or 1/8 scale directly, which is
+            # far cheaper than decoding a multi-megapixel original
+            img.draft('RGB', (width, width * 4))
+            img = ImageOps.exif_transpose(img)
+            if img.mode not in ('RGB', 'RGBA'):
+                img = img.convert('RGBA' if 'transparency' in img.info else 'RGB')
+            if img.width > width:
+                height = max(1, round(img.height * width / img.width))
+                img = img.resize((width, height), Image.LANCZOS)
+
+            tmp_path = f"{path}.{os.getpid()}-{threading.get_ident()}.part"
+            img.save(tmp_path, 'WEBP', quality=self.QUALITY, method=4)
+        os.replace(tmp_path, path)
+
+    def _lock_for(self, name: str) -> threading.Lock:
+        with self._locks_lock:
+            return self._locks.setdefault(name, threading.Lock())
@@ -0,0 +1,240 @@
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import Dict, List, Optional, Tuple
+import urllib.parse
+from PIL import Image
+from fetchers.endpoints import mediawiki_api
+from fetchers.resilience import ResilientSession
+
+class ImageSelector:
+    """Rank destination image candidates and drop near-duplicates"""
+
+    UPLOAD_HOST = "upload.wikimedia.org"
+
+    # upload.wikimedia.org path prefix -> API that owns the file page
+    API_BY_PROJECT = {
+        'wikipedia/commons': mediawiki_api("commons.wikimedia.org"),
+        'wikipedia/en': mediawiki_api("en.wikipedia.org"),
+        'wikivoyage/en': mediawiki_api("en.wikivoyage.org"),
+    }
+
+    ALLOWED_MIME_TYPES = ('image/jpeg', 'image/png', 'image/webp')
+    MIN_WIDTH = 500
+    MIN_HEIGHT = 300
+    THUMB_WIDTH = 800
+    HASH_THUMB_WIDTH = 120
+
+    # Source preference (Wikivoyage pictures are chosen for travellers)
+    SOURCE_WEIGHTS = {'wikivoyage': 1.0, 'wikipedia': 0.8, 'commons': 0.6}
+
+    # Title keywords that almost always mean "not a photo of the place"
+    PENALTY_KEYWORDS = [
+        'map', 'locator', 'logo', 'flag', 'coat', 'seal', 'symbol', 'icon',
+        'diagram', 'chart', 'banner', 'button', 'plan', 'wikivoyage'
+    ]
+
+    # Max Hamming distance between 64-bit dHashes to count as the same shot
+    DUPLICATE_DISTANCE = 10
+
+    def __init__(self, max_workers: int = 6):
+        self.session = ResilientSession('images')
+        self.max_workers = max_workers
+
+    def select(self, candidates: List[Tuple[str, str]], limit: int = 5) -> List[str]:
+        """Pick the best `limit` image URLs from (source, url) candidates"""
+        try:
+            records = self._dedupe_by_file(candidates)
+            self._fetch_metadata(records)
+            if not any('mime' in r for r in records):
+                # Metadata source unavailable: don't throw every image away
+                return [r['url'] for r in records][:limit]
+
+            ranked = [r for r in records if self._is_usable(r)]
+            ranked.sort(key=self._score, reverse=True)
+
+            chosen = self._drop_near_duplicates(ranked[:limit * 3], limit)
+            return [r.get('thumburl') or r['url'] for r in chosen]
+        except Exception as e:
+            print(f"Error selecting images: {e}")
+            # Fall back to the old behaviour: first unique URLs
+            return list(dict.fromkeys(url for _, url in candidates))[:limit]
+
+    def _dedupe_by_file(self, candidates: List[Tuple[str, str]]) -> List[Dict]:
+        """Collapse thumbnails and originals of the same file into one record"""
+        records = {}
+        for source, url in candidates:
+            key = self._file_key(url) or url
+            if key not in records:
+                records[key] = {'source': source, 'url': url, 'key': key}
+        return list(records.values())
+
+    def _file_key(self, url: str) -> Optional[Tuple[str, str]]:
+        """Return (project, file name) for an upload.wikimedia.org URL"""
+        parsed = urllib.parse.urlparse(url)
+        if parsed.netloc != self.UPLOAD_HOST:
+            return None
+
+        parts = parsed.path.strip('/').split('/')
+        if len(parts) < 5:
+            return None
+
+        project = '/'.join(parts[:2])
+        if parts[2] == 'thumb':
+            # /<project>/thumb/a/ab/<name>/<width>px-<name>
+            name = parts[5] if len(parts) > 5 else None
+        else:
+            # /<project>/a/ab/<name>
+            name = parts[4]
+
+        if not name:
+            return None
+        return project, urllib.parse.unquote(name)
+
+    def _fetch_metadata(self, records: List[Dict]):
+        """Fill in mime, size and thumbnail URLs with batched imageinfo calls"""
+        by_api: Dict[str, List[Dict]] = {}
+        for record in records:
+            if not isinstance(record['key'], tuple):
+                continue
+            api = self.API_BY_PROJECT.get(record['key'][0])
+            if api:
+                by_api.setdefault(api, []).append(record)
+
+        for api, api_records in by_api.items():
+            for start in range(0, len(api_records), 50):  # imageinfo title limit
+                self._fetch_batch(api, api_records[start:start + 50])
+
+    def _fetch_batch(self, api: str, records: List[Dict]):
+        """Run one imageinfo query for up to 50 files"""
+        by_title = {f"File:{r['key'][1]}": r for r in records}
+        params = {
+            'action': 'query',
+            'format': 'json',
+            'formatversion': 2,
+            'titles': '|'.join(by_title),
+            'prop': 'imageinfo',
+            'iiprop': 'url|size|mime',
+            # The hash thumbnail must really be small; the gallery size is
+            # derived from it in _gallery_url
+            'iiurlwidth': self.HASH_THUMB_WIDTH
+        }
+
+        try:
+            response = self.session.get(api, params=params, timeout=10)
+            data = response.json()
+        except Exception as e:
+            print(f"Error fetching image metadata from {api}: {e}")
+            return
+
+        query = data.get('query', {})
+        # The API normalises titles (underscores, first letter case)
+        aliases = {n['to']: n['from'] for n in query.get('normalized', [])}
+
+        for page in query.get('pages', []):
+            record = by_title.get(aliases.get(page.get('title'), page.get('title')))
+            imageinfo = page.get('imageinfo', [])
+            if record is None or not imageinfo:
+                continue
+
+            info = imageinfo[0]
+            record.update({
+                'title': page['title'],
+                'mime': info.get('mime'),
+                'width': info.get('width', 0),
+                'height': info.get('height', 0),
+                'size': info.get('size', 0),
+                'thumburl': self._gallery_url(info),
+                'hash_url': info.get('thumburl'),
+            })
+
+    def _gallery_url(self, info: Dict) -> Optional[str]:
+        """THUMB_WIDTH rendition of a file, from the small thumbnail the API returned
+
+        Files no wider than that are used as they are, since the thumbnail
+        server doesn't upscale.
+        """
+        thumb = info.get('thumburl')
+        small = f"/{self.HASH_THUMB_WIDTH}px-"
+        if not thumb or small not in thumb or info.get('width', 0) <= self.THUMB_WIDTH:
+            return info.get('url')
+        return thumb.replace(small, f"/{self.THUMB_WIDTH}px-")
+
+    def _is_usable(self, record: Dict) -> bool:
+        """Reject SVGs, animations and thumbnails too small for the gallery"""
+        if 'mime' not in record:
+            return False
+        if record['mime'] not in self.ALLOWED_MIME_TYPES:
+            return False
+        return record['width'] >= self.MIN_WIDTH and record['height'] >= self.MIN_HEIGHT
+
+    def _score(self, record: Dict) -> float:
+        """Higher is better: source, resolution, landscape framing, title hints"""
+        score = self.SOURCE_WEIGHTS.get(record['source'], 0.5)
+
+        megapixels = record['width'] * record['height'] / 1_000_000
+        score += min(megapixels, 4.0) / 4.0
+
+        aspect = record['width'] / record['height']
+        if 1.2 <= aspect <= 2.0:
+            score += 0.5
+        elif aspect < 0.9:
+            score -= 0.3  # Portrait shots crop badly in the gallery
+
+        title = record.get('title', '').lower()
+        if any(keyword in title for keyword in self.PENALTY_KEYWORDS):
+            score -= 1.5
+
+        if record['mime'] == 'image/png':
+            score -= 0.2  # PNGs are more often screenshots or renders
+
+        return score
+
+    def _drop_near_duplicates(self, ranked: List[Dict], limit: int) -> List[Dict]:
+        """Walk candidates in rank order, skipping ones that look like a chosen image"""
+        # Workers run in the caller's context so the source deadline applies
+        context = contextvars.copy_context()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = [pool.submit(context.copy().run, self._perceptual_hash, r) for r in ranked]
+            hashes = [f.result() for f in futures]
+
+        chosen = []
+        chosen_hashes = []
+        for record, image_hash in zip(ranked, hashes):
+            if image_hash is not None and any(
+                bin(image_hash ^ other).count('1') <= self.DUPLICATE_DISTANCE
+                for other in chosen_hashes
+            ):
+                continue
+
+            chosen.append(record)
+            if image_hash is not None:
+                chosen_hashes.append(image_hash)
+            if len(chosen) >= limit:
+                break
+
+        return chosen
+
+    def _perceptual_hash(self, record: Dict) -> Optional[int]:
+        """64-bit difference hash of a small thumbnail"""
+        url = record.get('hash_url')
+        if not url:
+            return None
+
+        try:
+            response = self.session.get(url, timeout=10)
+            response.raise_for_status()
+
+            image = Image.open(BytesIO(response.content)).convert('L').resize((9, 8))
+            pixels = list(image.getdata())
+
+            value = 0
+            for row in range(8):
+                for col in range(8):
+                    left = pixels[row * 9 + col]
+                    right = pixels[row * 9 + col + 1]
+                    value = (value << 1) | (left > right)
+            return value
+        except Exception as e:
+            print(f"Error hashing image {url[:80]}: {e}")
+            return None
@@ -1,49 +1,147 @@
-from typing import List, Dict
+from typing import Callable, List, Dict, Optional, Tuple
+import asyncio
+import contextvars
+import functools
 import json
+import os
+import re
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
 from datetime import datetime, timedelta
+from llm.benchmark import find_draft_model
 from llm.model import LocalLLM
 from fetchers.google_places import GooglePlacesFetcher
 from fetchers.wikipedia import WikipediaFetcher
 from fetchers.wikivoyage import WikivoyageFetcher
 from fetchers.wikimedia_commons import WikimediaCommonsFetcher
 from fetchers.web_scraper import WebScraper
+from fetchers.resilience import fetch_deadlines
+from profiling import async_span, span, untraced
+from services.image_selector import ImageSelector
+from services.image_proxy import ImageProxy
+from services.itinerary_renderer import ItineraryRenderer
+from services.retrieval import PreferenceRetriever
+from services.day_planner import DayPlanner
+from services.itinerary_schema import (
+    DAYS_SCHEMA_HINT, DRAFT_SCHEMA_HINT, SCHEMA_HINT, build_days_schema, build_draft_schema,
+    build_itinerary_schema, normalize_itinerary
+)
+from services.itinerary_sections import heading_date, splice_days, split_days, summarize_day
+from services.enrichment_cache import EnrichmentCache, normalize_destination
+from services.records import Attraction, DestinationInfo, TripDestination
 
 class ItineraryPlanner:
     """Main service for planning vacation itineraries using local LLM"""
 
-    def __init__(self):
-        self.llm = LocalLLM()
+    # Structured generation: the grammar guarantees valid JSON, and all
+    # markdown boilerplate comes from the template renderer instead
+    STRUCTURED_SYSTEM_PROMPT = """You are a professional travel planner. Plan detailed, engaging day-by-day vacation itineraries based on the provided destination information and user preferences. Give each day specific timed activities, dining suggestions and practical advice, and add local insights as tips.
+
+Be specific, practical, and enthusiastic. Make the itinerary feel personalized. The title must be creative and destination-specific (e.g., "5-Day Adventure in Tokyo"), never generic."""
+
+    # Generation budget: tokens per planned day plus title/tips overhead.
+    # Free-form markdown spends more tokens per day than structured JSON.
+    TOKENS_PER_DAY = 250
+    FREEFORM_TOKENS_PER_DAY = 350
+    BASE_TOKENS = 250
+    MIN_TOKENS = 500
+    # What every request used to ask for, to report savings against
+    LEGACY_MAX_TOKENS = 3000
+
+    # Destination text chunks put in the prompt per destination
+    RETRIEVAL_TOP_K = 4
+    # Smaller context for regenerating a single section
+    SECTION_RETRIEVAL_TOP_K = 2
+    SECTION_ATTRACTIONS = 8
+    # Best-ranked attractions whose opening hours are looked up (0 = none)
+    PLACE_DETAILS_TOP_N = int(os.getenv("GOOGLE_PLACES_DETAILS_TOP_N", "5"))
+
+    # How long prefetched or previously gathered enrichment is reused in
+    # memory, and how long the persistent copy (e.g. from the cache
+    # warmer) is trusted
+    ENRICHMENT_TTL = 15 * 60
+    ENRICHMENT_CACHE_TTL = float(os.getenv("VB_ENRICHMENT_TTL_HOURS", "24")) * 3600
+
+    DEFAULT_DAYS_PER_DESTINATION = 3
+    MAX_DAYS_PER_DESTINATION = 30
+
+    # Progressive mode: the draft model only writes each day's theme and
+    # timed activities; refined plans are kept this long for the app to fetch
+    DRAFT_TOKENS_PER_DAY = 90
+    REFINEMENT_TTL = 15 * 60
+
+    def __init__(self, load_models: bool = True):
+        # Without models (fetch-only cache warming) only enrichment works
+        self.llm = LocalLLM() if load_models else None
+        self.draft_llm = self._load_draft_model() if load_models else None
+        # One thread per model: a llama.cpp context serves one call at a
+        # time, and a draft should not queue behind a refinement
+        self._llm_thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix='llm')
+        self._draft_thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix='draft-llm')
+        # Refinement id -> (refinement task, started_at)
+        self._refinements: Dict[str, Tuple[asyncio.Task, float]] = {}
         self.google_places = GooglePlacesFetcher()
         self.wikipedia = WikipediaFetcher()
         self.wikivoyage = WikivoyageFetcher()
         self.wikimedia = WikimediaCommonsFetcher()
         self.scraper = WebScraper()
+        self.image_selector = ImageSelector()
+        self.image_proxy = ImageProxy()
+        self.renderer = ItineraryRenderer()
+        self.retriever = PreferenceRetriever()
+        self.day_planner = DayPlanner()
+        self.enrichment_cache = EnrichmentCache()
+        # Normalized destination name -> (enrichment task, started_at)
+        self._enrichment: Dict[str, Tuple[asyncio.Task, float]] = {}
 
     def is_llm_ready(self) -> bool:
         """Check if LLM is loaded"""
-        return self.llm.is_ready()
+        return self.llm is not None and self.llm.is_ready()
+
+    def has_draft_model(self) -> bool:
+        """Whether progressive generation is available"""
+        return self.draft_llm is not None
+
+    def _load_draft_model(self) -> Optional[LocalLLM]:
+        """Small model for progressive drafts: VB_DRAFT_MODEL_PATH, or the
+        smallest draft-tier GGUF in models/ besides the main model
+
+        Not used with a shared inference server (VB_WORKERS > 1): each
+        worker would load its own copy, and refinements are tracked per
+        process.
+        """
+        if os.getenv("VB_PROGRESSIVE", "1") == "0" or self.llm.server_socket:
+            return None
+        path = os.getenv("VB_DRAFT_MODEL_PATH") or find_draft_model(exclude=self.llm.model_path)
+        if not path:
+            return None
+
+        print(f"Loading draft model {os.path.basename(path)} for progressive generation...")
+        draft = LocalLLM(path, draft=True)
+        return draft if draft.is_ready() else None
+
+    async def _on_model_thread(self, executor: ThreadPoolExecutor, fn: Callable, *args, **kwargs):
+        """Run a blocking generation on a model's thread, keeping the profiling context"""
+        context = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(
+            executor, functools.partial(context.run, fn, *args, **kwargs)
+        )
+
+    async def generate_itinerary(self, destinations: List[Dict], preferences: str,
+                                 force_regenerate: bool = False) -> Dict:
+        """Generate a complete vacation itinerary
 
-    async def generate_itinerary(self, destinations: List[Dict], preferences: str) -> Dict:
-        """Generate a complete vacation itinerary"""
+        With the result cache on, an identical request reuses the earlier
+        generation unless `force_regenerate` is set.
+        """
 
         print(f"\n{'='*60}")
         print(f"Starting itinerary generation for {len(destinations)} destination(s)")
         print(f"{'='*60}\n")
 
-        # Gather information about each destination
-        enriched_destinations = []
-        for i, dest in enumerate(destinations, 1):
-            # Handle both dict and Pydantic objects
-            dest_name = dest.name if hasattr(dest, 'name') else dest['name']
-            dest_dict = dest.dict() if hasattr(dest, 'dict') else dest
-
-            print(f"[{i}/{len(destinations)}] Gathering information for {dest_name}...")
-            dest_info = await self._gather_destination_info(dest_name)
-            enriched_destinations.append({
-                **dest_dict,
-                **dest_info
-            })
-            print(f"    ✓ Found {len(dest_info.get('attractions', []))} attractions")
+        enriched_destinations = await self._enrich_destinations(destinations)
 
         # Generate itinerary using LLM
         print(f"\n{'='*60}")
@@ -51,85 +149,565 @@ class ItineraryPlanner:
         print("This may take 30-60 seconds...")
         print(f"{'='*60}\n")
 
-        markdown = self._generate_markdown_itinerary(
+        markdown, structured, stats = await self._on_model_thread(
+            self._llm_thread, self._generate_markdown_itinerary,
             enriched_destinations,
             preferences,
-            enriched_destinations  # Pass for image gallery
+            enriched_destinations,  # Pass for image gallery
+            use_cache=not force_regenerate
         )
 
         print(f"\n{'='*60}")
         print("✓ Itinerary generation complete!")
         print(f"{'='*60}\n")
 
+        # Memory held by this request's enrichment records
+        stats['enrichment_bytes'] = sum(d.info.nbytes() for d in enriched_destinations)
+
         # Structure the itinerary data
-        itinerary = self._structure_itinerary(enriched_destinations, markdown)
+        itinerary = self._structure_itinerary(enriched_destinations, structured, stats)
 
         return {
             "markdown": markdown,
             "itinerary": itinerary
         }
 
-    async def _gather_destination_info(self, destination: str) -> Dict:
-        """Gather information from multiple sources"""
+    async def generate_progressive(self, destinations: List[Dict], preferences: str,
+                                   force_regenerate: bool = False) -> Dict:
+        """Return a quick draft from the small model and refine it in the background
+
+        The draft is built from the same enriched context as the full plan.
+        The main model then gets the draft as an outline to improve and
+        complete; fetch its result with `refinement(id)`. Falls back to
+        `generate_itinerary` when there is no draft model or the draft fails.
+        """
+        if self.draft_llm is None:
+            return await self.generate_itinerary(destinations, preferences, force_regenerate)
+
+        started = time.monotonic()
+        enriched_destinations = await self._enrich_destinations(destinations)
+
+        print(f"📝 Drafting with {os.path.basename(self.draft_llm.model_path)}...")
+        with async_span("draft", 'planner'):
+            draft = await self._on_model_thread(
+                self._draft_thread, self._generate_draft, enriched_destinations, preferences,
+                use_cache=not force_regenerate
+            )
+        if draft is None:
+            print("⚠️  Draft generation failed, generating the full itinerary directly")
+            return await self.generate_itinerary(destinations, preferences, force_regenerate)
+
+        markdown, structured, stats = draft
+        draft_seconds = round(time.monotonic() - started, 2)
+        print(f"✓ Draft ready in {draft_seconds}s; refining with the main model in the background")
+
+        refinement_id = uuid.uuid4().hex
+        progressive = {
+            'id': refinement_id,
+            'status': 'refining',
+            'draft_model': os.path.basename(self.draft_llm.model_path),
+            'draft_seconds': draft_seconds
+        }
+        stats['enrichment_bytes'] = sum(d.info.nbytes() for d in enriched_destinations)
+        stats['progressive'] = progressive
+
+        self._prune_refinements()
+        # Outlives the request, so it runs outside the request's trace
+        task = untraced(asyncio.create_task, self._refine(
+            enriched_destinations, preferences, structured, dict(progressive), started, force_regenerate
+        ))
+        self._refinements[refinement_id] = (task, time.monotonic())
+
+        itinerary = self._structure_itinerary(enriched_destinations, structured, stats)
+        itinerary['draft'] = True
+        return {
+            "markdown": markdown,
+            "itinerary": itinerary
+        }
 
-        # Wikivoyage info (preferred for travel)
-        wikivoyage_info = self.wikivoyage.get_destination_info(destination)
+    async def _refine(self, destinations: List[TripDestination], preferences: str, draft: Dict,
+                      progressive: Dict, started: float, force_regenerate: bool) -> Dict:
+        """Full plan from the main model, with the draft as its outline"""
+        try:
+            with async_span("refine", 'planner'):
+                markdown, structured, stats = await self._on_model_thread(
+                    self._llm_thread, self._generate_markdown_itinerary,
+                    destinations, preferences, destinations,
+                    use_cache=not force_regenerate, outline=self._draft_outline(draft)
+                )
+        except Exception as e:
+            print(f"❌ Refinement failed: {e}")
+            raise
+        progressive.update(status='done', refined_seconds=round(time.monotonic() - started, 2))
+        print(f"✓ Refined itinerary ready {progressive['refined_seconds']}s after the request "
+              f"(draft after {progressive['draft_seconds']}s)")
+
+        stats['enrichment_bytes'] = sum(d.info.nbytes() for d in destinations)
+        stats['progressive'] = progressive
+        return {
+            "markdown": markdown,
+            "itinerary": self._structure_itinerary(destinations, structured, stats)
+        }
+
+    def refinement(self, refinement_id: str) -> Optional[asyncio.Task]:
+        """The background refinement started by generate_progressive, if still kept"""
+        self._prune_refinements()
+        entry = self._refinements.get(refinement_id)
+        return entry[0] if entry else None
+
+    def _prune_refinements(self):
+        now = time.monotonic()
+        for key, (task, started) in list(self._refinements.items()):
+            if task.done() and now - started > self.REFINEMENT_TTL:
+                del self._refinements[key]
+
+    async def _enrich_destinations(self, destinations: List[Dict]) -> List[TripDestination]:
+        """Requested destinations with their gathered info"""
+        destinations = [TripDestination.from_request(dest) for dest in destinations]
+
+        # Start every destination before waiting on any; each picks up work
+        # started by /api/prefetch if there is any
+        tasks = []
+        for i, dest in enumerate(destinations, 1):
+            print(f"[{i}/{len(destinations)}] Gathering information for {dest.name}...")
+            tasks.append(self.prefetch(dest.name))
+
+        async def enriched(dest: TripDestination, task: asyncio.Task) -> TripDestination:
+            # Shielded so a cancelled request doesn't cancel the shared task
+            with async_span(f"enrich {dest.name}", 'planner'):
+                dest.info = await asyncio.shield(task)
+            print(f"    ✓ Found {len(dest.info.attractions)} attractions for {dest.name}")
+            return dest
+
+        return list(await asyncio.gather(*(enriched(d, t) for d, t in zip(destinations, tasks))))
+
+    async def regenerate_section(self, markdown: str, itinerary: Dict, destinations: List[Dict],
+                                 preferences: str, instructions: str, day: Optional[int] = None,
+                                 destination: Optional[str] = None) -> Dict:
+        """Regenerate one day, or every day of one destination, and splice it in
+
+        Only the targeted days are decoded, from a compact prompt holding the
+        neighbouring days' summaries and the destination's cached enrichment.
+        Everything else in the markdown is kept as is.
+        """
+        destinations = [TripDestination.from_request(d) for d in destinations]
+        sections = split_days(markdown)
+        if not sections:
+            raise ValueError("No day sections found in the itinerary")
+
+        structured_days = {d['day']: d for d in itinerary.get('days') or []}
+        day_dests = self._section_destinations(sections, structured_days, destinations)
+
+        if day is not None:
+            targets = [s for s in sections if s['number'] == day]
+            label = f"day {day}"
+        else:
+            # No single-destination fallback here: a name that isn't in the
+            # trip must not select every day
+            wanted = next(
+                (d for d in destinations if self._same_destination(d.name, destination or '')), None
+            ) or TripDestination(destination or '')
+            targets = [
+                s for s in sections
+                if self._same_destination(day_dests.get(s['number']) or '', wanted.name)
+            ]
+            label = f"the {wanted.name} days"
+        if not targets:
+            raise ValueError(f"The itinerary has no section for {label}")
+
+        dest_name = day_dests.get(targets[0]['number']) or destination or destinations[0].name
+        print(f"✏️  Regenerating {label} ({len(targets)} day(s)) for {dest_name}")
+
+        info = await asyncio.shield(self.prefetch(dest_name))
+        requested = self._match_destination(dest_name, destinations)
+        dest = replace(requested, name=dest_name, info=info) if requested else TripDestination(dest_name, info=info)
+
+        # Days just before and after the targeted block, for continuity
+        numbers = [t['number'] for t in targets]
+        neighbours = [
+            summarize_day(s, structured_days.get(s['number']))
+            for s in sections
+            if s['number'] in (min(numbers) - 1, max(numbers) + 1)
+        ]
+
+        def generate():
+            # Retrieval embeds and the budget tokenizes with the model's
+            # context, so the prompt is built on its thread too
+            with span("prompt.build", 'planner'):
+                user_prompt = self._section_prompt(
+                    label, len(sections), len(targets), dest, preferences, instructions, neighbours
+                )
+                full_prompt = self.llm.create_prompt(
+                    self.STRUCTURED_SYSTEM_PROMPT, f"{user_prompt}\n\n{DAYS_SCHEMA_HINT}"
+                )
+                max_tokens = self._token_budget(full_prompt, len(targets), self.TOKENS_PER_DAY)
+
+            result = normalize_itinerary(
+                self.llm.generate_structured(
+                    full_prompt, build_days_schema(len(targets)),
+                    max_tokens=max_tokens, temperature=0.7
+                )
+            )
+            # Read on the model's thread, before another call replaces the usage
+            return result, self._generation_stats(len(targets), max_tokens, True)
+
+        result, stats = await self._on_model_thread(self._llm_thread, generate)
+        if not result:
+            raise RuntimeError(f"The model could not regenerate {label}")
+
+        # Keep each replaced day's number, date and destination
+        replacements = {}
+        new_days = {}
+        for section, new_day in zip(targets, result['days']):
+            number = section['number']
+            new_day.update(
+                number=number,
+                date=(structured_days.get(number) or {}).get('date') or heading_date(section['heading']),
+                dest=dest_name
+            )
+            replacements[number] = self.renderer.render_day(new_day)
+            new_days[number] = new_day
+
+        stats['target'] = label
+        stats['prompt_days'] = len(targets)
+
+        updated = dict(itinerary)
+        if structured_days:
+            updated['days'] = [
+                self._structured_day(new_days[d['day']]) if d['day'] in new_days else d
+                for d in itinerary['days']
+            ]
+        updated['generation'] = {**(itinerary.get('generation') or {}), 'last_edit': stats}
+        updated['edited_at'] = datetime.now().isoformat()
+
+        return {
+            "markdown": splice_days(markdown, sections, replacements),
+            "itinerary": updated
+        }
+
+    def _section_destinations(self, sections: List[Dict], structured_days: Dict[int, Dict],
+                              destinations: List[TripDestination]) -> Dict[int, Optional[str]]:
+        """Destination of each day: from the structured itinerary, the heading or the day counts"""
+        by_order = []
+        for dest in destinations:
+            by_order += [dest.name] * self._destination_days(dest)
+
+        result = {}
+        for section in sections:
+            number = section['number']
+            known = (structured_days.get(number) or {}).get('destination')
+            named = next((d.name for d in destinations
+                          if d.name.split(',')[0].strip().lower() in section['heading'].lower()), None)
+            result[number] = known or named or (by_order[number - 1] if 0 < number <= len(by_order) else None)
+        return result
+
+    def _attraction_text(self, attr: Attraction) -> str:
+        """Prompt line for an attraction: name, rating and hours if known"""
+        hours = f"; {attr.hours}" if attr.hours else ''
+        return f"{attr.name} (Rating: {attr.rating or 'N/A'}{hours})"
+
+    def _section_prompt(self, label: str, total_days: int, num_days: int, dest: TripDestination,
+                        preferences: str, instructions: str, neighbours: List[str]) -> str:
+        """Compact prompt for regenerating part of an existing itinerary"""
+        info = ""
+        if dest.info.attractions:
+            info += "\nAttractions:"
+            for attr in dest.info.attractions[:self.SECTION_ATTRACTIONS]:
+                info += f"\n- {self._attraction_text(attr)}"
+
+        query = f"{instructions} {preferences}".strip()
+        relevant = self.retriever.retrieve(dest.info, query, k=self.SECTION_RETRIEVAL_TOP_K) if query else []
+        if relevant:
+            info += "\nRelevant local info:"
+            for chunk in relevant:
+                info += f"\n- ({chunk['section']}) {chunk['text']}"
+
+        if dest.info.tips:
+            info += "\nTravel tips:"
+            for tip in dest.info.tips[:2]:
+                info += f"\n- {tip}"
+
+        context = '\n'.join(f"- {line}" for line in neighbours) or "- (none)"
+        return f"""Rewrite {label} of an existing {total_days}-day itinerary. Plan exactly {num_days} day{'s' if num_days != 1 else ''} in {dest.name}.
+
+CHANGE REQUESTED:
+{instructions or 'Suggest a different plan.'}
+
+USER PREFERENCES:
+{preferences or 'None given'}
+
+NEIGHBOURING DAYS (stay consistent and don't repeat their activities):
+{context}
+
+{dest.name.upper()} INFO:{info or ' (none)'}"""
+
+    def prefetch(self, destination: str) -> asyncio.Task:
+        """Start enrichment for a destination in the background, or reuse it
+
+        Returns the task; awaiting it yields the DestinationInfo from
+        _gather_destination_info. Finished work is reused for ENRICHMENT_TTL.
+        """
+        key = normalize_destination(destination)
+        entry = self._enrichment.get(key)
+        if entry and self._is_fresh(entry):
+            state = 'ready' if entry[0].done() else 'in flight'
+            print(f"   ♻️  Reusing {state} enrichment for {destination}")
+            return entry[0]
+
+        # Shared with later requests and may outlive this one, so it stays
+        # out of the current request's trace
+        task = untraced(asyncio.get_running_loop().create_task, self._enrich(destination))
+        self._enrichment[key] = (task, time.monotonic())
+
+        # Drop expired entries so the map doesn't grow without bound
+        for stale in [k for k, e in self._enrichment.items() if not self._is_fresh(e)]:
+            del self._enrichment[stale]
+
+        return task
+
+    def _is_fresh(self, entry: Tuple[asyncio.Task, float]) -> bool:
+        """Reusable: not expired, and not finished with an error"""
+        task, started = entry
+        if time.monotonic() - started > self.ENRICHMENT_TTL:
+            return False
+        return not (task.done() and (task.cancelled() or task.exception()))
+
+    async def _enrich(self, destination: str) -> DestinationInfo:
+        """Return cached destination info, or gather it under per-source SLO deadlines"""
+        cached = await asyncio.to_thread(self.enrichment_cache.get, destination, self.ENRICHMENT_CACHE_TTL)
+        if cached is not None:
+            print(f"   ♻️  Using cached enrichment for {destination}")
+            return cached
+
+        # Each source gets its SLO budget per destination; slow or
+        # unhealthy sources are skipped instead of waited on
+        with fetch_deadlines():
+            info = await self._gather_destination_info(destination)
+
+        await asyncio.to_thread(self.store_enrichment, destination, info)
+        return info
+
+    def store_enrichment(self, destination: str, info: DestinationInfo):
+        """Persist gathered info unless every source came back empty"""
+        if not info.is_empty():
+            self.enrichment_cache.put(destination, info)
+
+    async def warm_prompt(self, prefix: str) -> bool:
+        """Evaluate a prompt prefix on the main model's thread (cache warming)"""
+        return await self._on_model_thread(self._llm_thread, self.llm.warm_prefix, prefix)
+
+    def prompt_prefix(self, name: str, info: DestinationInfo) -> str:
+        """Opening of the structured prompt for a one-destination, undated trip
+
+        It is identical for every such request, so evaluating it ahead of
+        time (cache warming) lets llama.cpp reuse the KV state.
+        """
+        dest = TripDestination(name, info=info)
+        marker = '\x00'
+        prompt = self.llm.create_prompt(
+            self.STRUCTURED_SYSTEM_PROMPT,
+            self._user_prompt(self._destination_days(dest), self._destinations_text([dest]), marker, '')
+        )
+        return prompt[:prompt.index(marker)]
 
-        # Wikipedia info (backup)
-        wiki_info = self.wikipedia.get_destination_info(destination)
+    async def _gather_destination_info(self, destination: str) -> DestinationInfo:
+        """Gather information from multiple sources"""
 
-        # Google Places attractions
-        attractions = self.google_places.search_attractions(destination, limit=8)
+        # The fetchers are blocking, so run them concurrently on worker
+        # threads (to_thread carries over the SLO deadline context):
+        # Wikivoyage (preferred for travel), Wikipedia (backup), Google
+        # Places attractions and travel tips
+        wikivoyage_info, wiki_info, attractions, scraper_info = await asyncio.gather(
+            asyncio.to_thread(self._fetch, 'wikivoyage', self.wikivoyage.get_destination_info, destination),
+            asyncio.to_thread(self._fetch, 'wikipedia', self.wikipedia.get_destination_info, destination),
+            asyncio.to_thread(self._fetch, 'places', self.google_places.search_attractions, destination, 12),
+            self._scrape_tips(destination)
+        )
 
-        # Travel tips
-        scraper_info = self.scraper.search_destination_info(destination)
+        # Opening hours of the best-ranked attractions, looked up while the
+        # images are collected and ranked
+        details = asyncio.ensure_future(asyncio.to_thread(
+            self._fetch, 'places details', self.google_places.get_top_place_details,
+            attractions, self.PLACE_DETAILS_TOP_N, GooglePlacesFetcher.HOURS_FIELDS
+        ))
 
-        # Combine images from multiple sources
-        all_images = []
+        # Collect image candidates from multiple sources, tagged by origin
+        candidates = []
 
         # 1. Wikivoyage images (best for travel)
         if wikivoyage_info.get('images'):
-            all_images.extend(wikivoyage_info['images'][:5])
+            candidates.extend(('wikivoyage', url) for url in wikivoyage_info['images'])
             print(f"   ✓ Found {len(wikivoyage_info['images'])} images from Wikivoyage")
 
         # 2. Wikipedia images
         if wiki_info.get('images'):
-            all_images.extend(wiki_info['images'][:3])
+            candidates.extend(('wikipedia', url) for url in wiki_info['images'])
             print(f"   ✓ Found {len(wiki_info['images'])} images from Wikipedia")
 
         # 3. If we still don't have enough images, search Wikimedia Commons
-        if len(all_images) < 5:
+        if len(candidates) < 8:
             print(f"   🔍 Searching Wikimedia Commons for more images...")
-            commons_images = self.wikimedia.get_destination_images(destination, limit=8)
-            all_images.extend(commons_images)
+            commons_images = await asyncio.to_thread(
+                self._fetch, 'commons', self.wikimedia.get_destination_images, destination, 8
+            )
+            candidates.extend(('commons', url) for url in commons_images)
             print(f"   ✓ Found {len(commons_images)} images from Wikimedia Commons")
 
+        # Rank by metadata and drop near-duplicates; only the winners are
+        # rendered in the gallery and downloaded by the PDF generator
+        images = await asyncio.to_thread(self._fetch, 'image selection', self.image_selector.select, candidates, 5)
+
         # Use Wikivoyage summary if available, fallback to Wikipedia
         summary = wikivoyage_info.get('summary') or wiki_info.get('summary', '')
         url = wikivoyage_info.get('url') or wiki_info.get('url', '')
 
-        print(f"   📸 Total images collected: {len(all_images)}")
+        print(f"   📸 Selected {len(images)} of {len(candidates)} candidate images")
 
-        return {
-            'wiki_summary': summary,
-            'wiki_url': url,
-            'attractions': attractions,
-            'tips': scraper_info.get('tips', []),
-            'images': all_images[:10],  # Keep up to 10 images
-            'wikivoyage_sections': {
-                'see': wikivoyage_info.get('see', ''),
-                'do': wikivoyage_info.get('do', ''),
-                'eat': wikivoyage_info.get('eat', ''),
-            }
+        hours = {
+            place_id: GooglePlacesFetcher.summarize_hours(place.get('opening_hours'))
+            for place_id, place in (await details).items()
+        }
+
+        # Keep only what prompt building, retrieval and the gallery read
+        sections = {
+            'see': wikivoyage_info.get('see', ''),
+            'do': wikivoyage_info.get('do', ''),
+            'eat': wikivoyage_info.get('eat', ''),
+            'overview': wiki_info.get('content', ''),
         }
+        return DestinationInfo(
+            summary=summary,
+            url=url,
+            attractions=[Attraction.from_dict({**a, 'hours': hours.get(a.get('place_id'))}) for a in attractions],
+            tips=scraper_info.get('tips', []),
+            images=images,
+            sections={name: text for name, text in sections.items() if text}
+        )
+
+    def _fetch(self, source: str, fetch: Callable, *args):
+        """Run one blocking fetcher call inside a trace span"""
+        with span(f"fetch {source}", 'fetcher'):
+            return fetch(*args)
 
-    def _generate_markdown_itinerary(self, destinations: List[Dict], preferences: str, enriched_destinations: List[Dict]) -> str:
-        """Use LLM to generate markdown itinerary"""
+    async def _scrape_tips(self, destination: str) -> Dict:
+        with async_span("fetch tips", 'fetcher', destination=destination):
+            return await self.scraper.search_destination_info(destination)
+
+    def _generate_markdown_itinerary(self, destinations: List[TripDestination], preferences: str,
+                                     enriched_destinations: List[TripDestination],
+                                     use_cache: bool = True,
+                                     outline: Optional[str] = None) -> Tuple[str, Optional[Dict], Dict]:
+        """Use LLM to generate the itinerary and render it as markdown
+
+        Returns the markdown, the structured itinerary (None if the model
+        could not produce one and the free-form fallback was used) and
+        generation stats. `outline` is a draft for the model to improve.
+        """
 
         # Prepare context for LLM
-        context = self._prepare_llm_context(destinations, preferences)
+        with span("prompt.build", 'planner') as info:
+            context = self._prepare_llm_context(destinations, preferences)
+            num_days = sum(self._destination_days(d) for d in destinations)
+
+            user_prompt = self._user_prompt(
+                num_days, context['destinations_text'], preferences, context['attractions_text']
+            )
+            if outline:
+                user_prompt += (f"\n\nDRAFT OUTLINE (keep what works, fix what doesn't, and add "
+                                f"the details, dining and tips it lacks):\n{outline}")
+
+            full_prompt = self.llm.create_prompt(self.STRUCTURED_SYSTEM_PROMPT, f"{user_prompt}\n\n{SCHEMA_HINT}")
+            max_tokens = self._token_budget(full_prompt, num_days, self.TOKENS_PER_DAY)
+            info['chars'] = len(full_prompt)
+
+        with span("llm.generate_structured", 'llm', days=num_days, max_tokens=max_tokens):
+            structured = normalize_itinerary(
+                self.llm.generate_structured(
+                    full_prompt, build_itinerary_schema(num_days),
+                    max_tokens=max_tokens, temperature=0.7, use_cache=use_cache
+                )
+            )
+
+        if structured:
+            self._number_days(structured, destinations)
+            with span("render.markdown", 'planner'):
+                markdown = self.renderer.render(structured, destinations)
+            print(f"✓ Structured itinerary with {len(structured['days'])} day(s)")
+        else:
+            print("⚠️  Structured generation failed, falling back to free-form markdown")
+            markdown, max_tokens = self._generate_freeform_markdown(user_prompt, num_days, use_cache)
+
+        stats = self._generation_stats(num_days, max_tokens, structured is not None)
+        return self._add_resources(markdown, enriched_destinations), structured, stats
+
+    def _generate_draft(self, destinations: List[TripDestination], preferences: str,
+                        use_cache: bool = True) -> Optional[Tuple[str, Dict, Dict]]:
+        """Skeleton itinerary from the draft model, from the same context as the full plan
+
+        None if the draft model could not produce one.
+        """
+        with span("prompt.build", 'planner', draft=True):
+            context = self._prepare_llm_context(destinations, preferences)
+            num_days = sum(self._destination_days(d) for d in destinations)
+            user_prompt = self._user_prompt(
+                num_days, context['destinations_text'], preferences, context['attractions_text']
+            )
+            full_prompt = self.draft_llm.create_prompt(
+                self.STRUCTURED_SYSTEM_PROMPT, f"{user_prompt}\n\n{DRAFT_SCHEMA_HINT}"
+            )
+            max_tokens = self._token_budget(full_prompt, num_days, self.DRAFT_TOKENS_PER_DAY, self.draft_llm)
+
+        with span("llm.generate_draft", 'llm', days=num_days, max_tokens=max_tokens):
+            structured = normalize_itinerary(
+                self.draft_llm.generate_structured(
+                    full_prompt, build_draft_schema(num_days),
+                    max_tokens=max_tokens, temperature=0.7, use_cache=use_cache
+                )
+            )
+        if not structured:
+            return None
+
+        self._number_days(structured, destinations)
+        with span("render.markdown", 'planner'):
+            markdown = self.renderer.render(structured, destinations)
+        stats = self._generation_stats(num_days, max_tokens, True, self.draft_llm)
+        return self._add_resources(markdown, destinations), structured, stats
+
+    def _draft_outline(self, draft: Dict) -> str:
+        """One line per draft day: destination, theme and activities in order"""
+        lines = []
+        for day in draft['days']:
+            activities = '; '.join(
+                f"{slot['time']} {slot['do']}".strip() for slot in day['slots']
+            )
+            lines.append(f"Day {day['number']} ({day['dest']}): {day['theme']} - {activities}")
+        return '\n'.join(lines)
+
+    def _add_resources(self, markdown: str, destinations: List[TripDestination]) -> str:
+        """Append the photo gallery and destination links"""
+        # Add image gallery if available
+        image_gallery = self._create_image_gallery(destinations)
+        if image_gallery:
+            markdown += f"\n\n{image_gallery}\n\n"
+
+        markdown += f"\n\n---\n\n## Additional Resources\n\n"
+
+        # Add destination links
+        for dest in destinations:
+            if dest.info.url:
+                markdown += f"\n- [{dest.name}]({dest.info.url})"
+
+        markdown += "\n\n*Happy travels!*"
+
+        return markdown
+
+    def _generate_freeform_markdown(self, user_prompt: str, num_days: int,
+                                    use_cache: bool = True) -> Tuple[str, int]:
+        """Fallback: let the model write markdown directly
+
+        Returns the markdown and the token budget that was used.
+        """
 
-        # Create prompt
         system_prompt = """You are a professional travel planner. Create detailed, engaging vacation itineraries based on the provided destination information and user preferences. Format your response in clean markdown with:
 - Clear day-by-day schedule
 - Activity recommendations with timing
@@ -141,103 +719,214 @@ Be specific, practical, and enthusiastic. Make the itinerary feel personalized.
 
 IMPORTANT: Start with a creative, destination-specific title (e.g., "5-Day Adventure in Tokyo"). Do NOT use generic titles like "Your Dream Vacation Itinerary" or "Vacation Itinerary"."""
 
-        user_prompt = f"""Create a vacation itinerary with the following information:
-
-DESTINATIONS:
-{context['destinations_text']}
-
-USER PREFERENCES:
-{preferences}
-
-AVAILABLE ATTRACTIONS AND INFO:
-{context['attractions_text']}
-
-Generate a complete, day-by-day itinerary in markdown format. Include specific times, practical advice, and make it exciting!"""
+        user_prompt += "\n\nGenerate a complete, day-by-day itinerary in markdown format. Include specific times, practical advice, and make it exciting!"
 
         # Generate with LLM
         full_prompt = self.llm.create_prompt(system_prompt, user_prompt)
-        itinerary_text = self.llm.generate(full_prompt, max_tokens=3000, temperature=0.7)
+        max_tokens = self._token_budget(full_prompt, num_days, self.FREEFORM_TOKENS_PER_DAY)
+        with span("llm.generate", 'llm', days=num_days, max_tokens=max_tokens):
+            itinerary_text = self.llm.generate(
+                full_prompt, max_tokens=max_tokens, temperature=0.7,
+                stop_when=self._past_last_day(num_days), use_cache=use_cache
+            )
+        # Drop the partial header of the day that triggered the stop
+        itinerary_text = self._trim_extra_day(itinerary_text, num_days)
 
-        # Debug: Print first 200 chars of LLM output
-        print(f"\n{'='*60}")
-        print(f"LLM OUTPUT (first 200 chars):")
-        print(f"{itinerary_text[:200]}")
-        print(f"{'='*60}\n")
-
-        # Create final markdown
         # Remove generic headers if LLM generated them (despite instructions)
         lines = itinerary_text.strip().split('\n')
-
-        print(f"First line from LLM: {lines[0] if lines else 'NO LINES'}")
-
-        # Remove any leading generic headers
-        while lines and any(header.lower() in lines[0].lower() for header in ['your dream vacation', 'vacation itinerary']):
+        while lines and any(header in lines[0].lower() for header in ItineraryRenderer.GENERIC_TITLES):
             print(f"🗑️  REMOVING GENERIC HEADER: {lines[0]}")
             lines.pop(0)
             # Also remove any empty lines after the header
             while lines and not lines[0].strip():
                 lines.pop(0)
 
-        # Rejoin the text
-        itinerary_text = '\n'.join(lines)
-
-        # Split into first line (title) and rest
-        lines = itinerary_text.split('\n', 1)
-
         # Add date after the first line (which should be the actual trip title)
         generated_date = f"\nGenerated on {datetime.now().strftime('%B %d, %Y')}\n\n---\n\n"
 
         if len(lines) > 1:
-            markdown = f"{lines[0]}\n{generated_date}{lines[1]}"
-        else:
-            markdown = f"{itinerary_text}\n{generated_date}"
-
-        # Add image gallery if available
-        image_gallery = self._create_image_gallery(enriched_destinations)
-        if image_gallery:
-            markdown += f"\n\n{image_gallery}\n\n"
-
-        markdown += f"\n\n---\n\n## Additional Resources\n\n"
-
-        # Add destination links
+            rest = '\n'.join(lines[1:])
+            return f"{lines[0]}\n{generated_date}{rest}", max_tokens
+        return '\n'.join(lines) + f"\n{generated_date}", max_tokens
+
+    def _destination_days(self, dest: TripDestination) -> int:
+        """Days planned for a destination from its dates (inclusive)"""
+        start = self._parse_date(dest.start_date)
+        end = self._parse_date(dest.end_date)
+        if not start:
+            return self.DEFAULT_DAYS_PER_DESTINATION
+        if not end or end < start:
+            return 1
+        return min((end - start).days + 1, self.MAX_DAYS_PER_DESTINATION)
+
+    def _token_budget(self, prompt: str, num_days: int, tokens_per_day: int,
+                      llm: Optional[LocalLLM] = None) -> int:
+        """Max tokens for a trip of `num_days`, capped by the free context"""
+        llm = llm or self.llm
+        wanted = max(self.MIN_TOKENS, self.BASE_TOKENS + tokens_per_day * num_days)
+        available = llm.n_ctx - llm.count_tokens(prompt) - 8
+        if wanted > available:
+            print(f"⚠️  {num_days}-day trip wants {wanted} tokens but only {available} fit "
+                  f"in the context window (raise LLM_N_CTX for long trips)")
+        return max(1, min(wanted, available))
+
+    def _day_header_pattern(self, day: int) -> re.Pattern:
+        """Matches a line that starts the given day, e.g. '## Day 4' or '**Day 4:**'"""
+        return re.compile(rf'^[#*\s]*day\s+{day}\b', re.IGNORECASE | re.MULTILINE)
+
+    def _past_last_day(self, num_days: int) -> Callable[[str], bool]:
+        """Stop condition: the model started a day beyond the trip length"""
+        pattern = self._day_header_pattern(num_days + 1)
+
+        def check(text: str) -> bool:
+            # Only the tail can contain a new header; avoid rescanning everything
+            return pattern.search(text, max(0, len(text) - 200)) is not None
+
+        return check
+
+    def _trim_extra_day(self, text: str, num_days: int) -> str:
+        """Cut the output at the first header past the last expected day"""
+        match = self._day_header_pattern(num_days + 1).search(text)
+        return text[:match.start()].rstrip() if match else text
+
+    def _generation_stats(self, num_days: int, max_tokens: int, structured: bool,
+                          llm: Optional[LocalLLM] = None) -> Dict:
+        """Per-request token stats for the API response"""
+        usage = (llm or self.llm).last_usage
+        generated = usage.get('completion_tokens', 0) or 0
+        stats = {
+            'days': num_days,
+            'structured': structured,
+            'max_tokens': max_tokens,
+            'prompt_tokens': usage.get('prompt_tokens'),
+            'completion_tokens': generated,
+            'stopped_early': usage.get('stopped_early', False),
+            'cached': usage.get('cached', False),
+            'tokens_saved_vs_legacy': max(0, self.LEGACY_MAX_TOKENS - generated),
+        }
+        print(f"📊 {generated}/{max_tokens} tokens for {num_days} day(s)"
+              f"{' (stopped early)' if stats['stopped_early'] else ''}"
+              f"{' (from result cache)' if stats['cached'] else ''}")
+        return stats
+
+    def _number_days(self, itinerary: Dict, destinations: List[TripDestination]):
+        """Number days and attach calendar dates from each destination's start date"""
+        days_seen: Dict[str, int] = {}
+
+        for number, day in enumerate(itinerary['days'], 1):
+            day['number'] = number
+
+            dest = self._match_destination(day['dest'], destinations)
+            if not dest:
+                continue
+            day['dest'] = dest.name
+
+            offset = days_seen.get(dest.name, 0)
+            days_seen[dest.name] = offset + 1
+
+            start = self._parse_date(dest.start_date)
+            if start:
+                day['date'] = (start + timedelta(days=offset)).strftime('%a, %b %d')
+
+    def _match_destination(self, name: str,
+                           destinations: List[TripDestination]) -> Optional[TripDestination]:
+        """Find the requested destination the model meant by `name`"""
+        name = name.lower()
         for dest in destinations:
-            if dest.get('wiki_url'):
-                markdown += f"\n- [{dest['name']}]({dest['wiki_url']})"
+            city = dest.name.split(',')[0].strip().lower()
+            if city and (city in name or name in dest.name.lower()):
+                return dest
+        return destinations[0] if len(destinations) == 1 else None
+
+    def _same_destination(self, a: str, b: str) -> bool:
+        """Whether two names are the same place: equal, or equal up to the
+        first comma ("Rome" and "Rome, Italy"), ignoring case and spacing"""
+        a, b = ' '.join(a.casefold().split()), ' '.join(b.casefold().split())
+        if not a or not b:
+            return False
+        return a == b or a.split(',')[0].strip() == b.split(',')[0].strip()
+
+    def _parse_date(self, value: Optional[str]) -> Optional[datetime]:
+        """Parse a YYYY-MM-DD date from the request, if present"""
+        try:
+            return datetime.strptime(value, '%Y-%m-%d') if value else None
+        except ValueError:
+            return None
+
+    def _user_prompt(self, num_days: int, destinations_text: str, preferences: str,
+                     attractions_text: str) -> str:
+        """Assemble the user prompt; destination text comes first so it forms a reusable prefix"""
+        return f"""Create a {num_days}-day vacation itinerary with the following information:
 
-        markdown += "\n\n*Happy travels!*"
+DESTINATIONS:
+{destinations_text}
 
-        return markdown
+USER PREFERENCES:
+{preferences}
 
-    def _prepare_llm_context(self, destinations: List[Dict], preferences: str) -> Dict:
-        """Prepare context information for LLM"""
+AVAILABLE ATTRACTIONS AND INFO:
+{attractions_text}"""
 
+    def _destinations_text(self, destinations: List[TripDestination]) -> str:
+        """Numbered destinations with dates, day counts and overviews"""
         destinations_text = ""
-        attractions_text = ""
 
         for i, dest in enumerate(destinations, 1):
-            name = dest['name']
+            name = dest.name
             dates = ""
-            if dest.get('start_date'):
-                dates = f" ({dest['start_date']} to {dest.get('end_date', 'TBD')})"
+            if dest.start_date:
+                dates = f" ({dest.start_date} to {dest.end_date or 'TBD'})"
 
-            destinations_text += f"\n{i}. {name}{dates}"
+            days = self._destination_days(dest)
+            destinations_text += f"\n{i}. {name}{dates} - {days} day{'s' if days != 1 else ''}"
 
             # Add wiki summary
-            if dest.get('wiki_summary'):
-                summary = dest['wiki_summary'][:500]  # Limit length
+            if dest.info.summary:
+                summary = dest.info.summary[:500]  # Limit length
                 destinations_text += f"\n   Overview: {summary}..."
 
-            # Add attractions
-            if dest.get('attractions'):
+        return destinations_text
+
+    def _prepare_llm_context(self, destinations: List[TripDestination], preferences: str) -> Dict:
+        """Prepare context information for LLM"""
+
+        destinations_text = self._destinations_text(destinations)
+        attractions_text = ""
+
+        for dest in destinations:
+            name = dest.name
+            days = self._destination_days(dest)
+
+            # Add attractions, pre-grouped into nearby per-day routes when
+            # coordinates are known so the model only writes the narrative
+            with span(f"day plan {name}", 'planner'):
+                day_plan = self.day_planner.plan(dest.info.attractions, days)
+            if any(day_plan):
+                attractions_text += f"\n\nSuggested day plan for {name} (visit in this order):"
+                for day_number, stops in enumerate(day_plan, 1):
+                    if stops:
+                        route = ' -> '.join(stop.name for stop in stops)
+                        attractions_text += f"\n- {name} day {day_number}: {route}"
+                timed = [stop for stops in day_plan for stop in stops if stop.hours]
+                if timed:
+                    attractions_text += "\nOpening hours: " + '; '.join(f"{s.name}: {s.hours}" for s in timed)
+            elif dest.info.attractions:
                 attractions_text += f"\n\nAttractions in {name}:"
-                for attr in dest['attractions'][:6]:
-                    rating = attr.get('rating', 'N/A')
-                    attractions_text += f"\n- {attr['name']} (Rating: {rating})"
+                for attr in dest.info.attractions[:6]:
+                    attractions_text += f"\n- {self._attraction_text(attr)}"
+
+            # Add only the fetched text relevant to the user's preferences
+            with span(f"retrieval {name}", 'planner'):
+                relevant = self.retriever.retrieve(dest.info, preferences, k=self.RETRIEVAL_TOP_K)
+            if relevant:
+                attractions_text += f"\n\nRelevant local info for {name}:"
+                for chunk in relevant:
+                    attractions_text += f"\n- ({chunk['section']}) {chunk['text']}"
 
             # Add tips
-            if dest.get('tips'):
+            if dest.info.tips:
                 attractions_text += f"\n\nTravel Tips for {name}:"
-                for tip in dest['tips'][:3]:
+                for tip in dest.info.tips[:3]:
                     attractions_text += f"\n- {tip}"
 
         return {
@@ -245,20 +934,21 @@ Generate a complete, day-by-day itinerary in markdown format. Include specific t
             'attractions_text': attractions_text
         }
 
-    def _create_image_gallery(self, destinations: List[Dict]) -> str:
+    def _create_image_gallery(self, destinations: List[TripDestination]) -> str:
         """Create an image gallery from destination images"""
         gallery_md = "## Photo Gallery\n\n"
         has_images = False
 
         for dest in destinations:
-            images = dest.get('images', [])
-            print(f"📸 Destination: {dest['name']} - Found {len(images)} images")
+            images = dest.info.images
+            print(f"📸 Destination: {dest.name} - Found {len(images)} images")
             if images:
                 has_images = True
-                gallery_md += f"### {dest['name']}\n\n"
+                gallery_md += f"### {dest.name}\n\n"
                 for img_url in images[:5]:  # Show up to 5 images per destination
                     print(f"   Adding image: {img_url[:80]}...")
-                    gallery_md += f"![{dest['name']}]({img_url})\n\n"
+                    # Served resized and cached by the backend's image proxy
+                    gallery_md += f"![{dest.name}]({self.image_proxy.proxy_path(img_url)})\n\n"
 
         if has_images:
             print(f"✅ Created photo gallery with images!")
@@ -267,18 +957,34 @@ Generate a complete, day-by-day itinerary in markdown format. Include specific t
 
         return gallery_md if has_images else ""
 
-    def _structure_itinerary(self, destinations: List[Dict], markdown: str) -> Dict:
+    def _structure_itinerary(self, destinations: List[TripDestination], structured: Optional[Dict],
+                             stats: Dict) -> Dict:
         """Structure itinerary data for API response"""
         return {
+            'title': structured['title'] if structured else None,
             'total_destinations': len(destinations),
             'destinations': [
                 {
-                    'name': d['name'],
-                    'start_date': d.get('start_date'),
-                    'end_date': d.get('end_date'),
-                    'attractions_count': len(d.get('attractions', []))
+                    'name': d.name,
+                    'start_date': d.start_date,
+                    'end_date': d.end_date,
+                    'attractions_count': len(d.info.attractions)
                 }
                 for d in destinations
             ],
+            'days': [self._structured_day(day) for day in structured['days']] if structured else [],
+            'tips': structured['tips'] if structured else [],
+            'generation': stats,
             'generated_at': datetime.now().isoformat()
         }
+
+    def _structured_day(self, day: Dict) -> Dict:
+        """API shape of one structured day"""
+        return {
+            'day': day['number'],
+            'date': day.get('date'),
+            'destination': day['dest'],
+            'theme': day['theme'],
+            'activities': day['slots'],
+            'dining': day['dining']
+        }
@@ -0,0 +1,61 @@
+from datetime import datetime
+from typing import Dict, List
+from services.records import TripDestination
+
+class ItineraryRenderer:
+    """Render a structured itinerary into the markdown shown in the app and PDF"""
+
+    GENERIC_TITLES = ('your dream vacation', 'vacation itinerary')
+
+    def render(self, itinerary: Dict, destinations: List[TripDestination]) -> str:
+        """Render title, per-day schedule and tips"""
+        parts = [
+            f"# {self._title(itinerary, destinations)}\n",
+            f"Generated on {datetime.now().strftime('%B %d, %Y')}\n",
+            "---\n",
+        ]
+
+        for day in itinerary['days']:
+            parts.append(self.render_day(day))
+
+        if itinerary.get('tips'):
+            parts.append("## Travel Tips\n")
+            parts.append('\n'.join(f"- {tip}" for tip in itinerary['tips']) + '\n')
+
+        return '\n'.join(parts)
+
+    def _title(self, itinerary: Dict, destinations: List[TripDestination]) -> str:
+        """Use the model's title unless it is missing or generic"""
+        title = itinerary.get('title', '')
+        if title and not any(g in title.lower() for g in self.GENERIC_TITLES):
+            return title
+
+        names = ' & '.join(d.name for d in destinations)
+        return f"{len(itinerary['days'])}-Day Trip to {names}"
+
+    def render_day(self, day: Dict) -> str:
+        """Render one day section (also used to splice in a regenerated day)"""
+        heading = f"## Day {day['number']}"
+        if day.get('date'):
+            heading += f" ({day['date']})"
+        if day.get('dest'):
+            heading += f" – {day['dest']}"
+        if day.get('theme'):
+            heading += f": {day['theme']}"
+
+        lines = [heading, ""]
+        for slot in day['slots']:
+            line = f"- **{slot['time']}** — {slot['do']}" if slot['time'] else f"- {slot['do']}"
+            if slot['note']:
+                line += f": {slot['note']}"
+            lines.append(line)
+
+        if day['dining']:
+            lines += ["", "**Dining**", ""]
+            for meal in day['dining']:
+                line = f"- *{meal['meal']}*: {meal['place']}" if meal['meal'] else f"- {meal['place']}"
+                if meal['note']:
+                    line += f" — {meal['note']}"
+                lines.append(line)
+
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,155 @@
+import copy
+from typing import Dict, List, Optional
+
+# Compact itinerary structure the model fills in instead of writing markdown.
+# Keys are short on purpose: every key is decoded once per object.
+ITINERARY_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "title": {"type": "string"},
+        "days": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "dest": {"type": "string"},
+                    "theme": {"type": "string"},
+                    "slots": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "time": {"type": "string"},
+                                "do": {"type": "string"},
+                                "note": {"type": "string"}
+                            },
+                            "required": ["time", "do", "note"]
+                        }
+                    },
+                    "dining": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "meal": {"type": "string"},
+                                "place": {"type": "string"},
+                                "note": {"type": "string"}
+                            },
+                            "required": ["meal", "place", "note"]
+                        }
+                    }
+                },
+                "required": ["dest", "theme", "slots", "dining"]
+            }
+        },
+        "tips": {"type": "array", "items": {"type": "string"}}
+    },
+    "required": ["title", "days", "tips"]
+}
+
+# Upper bounds that keep each day (and the tail of the answer) from rambling
+MAX_SLOTS_PER_DAY = 6
+MAX_MEALS_PER_DAY = 3
+MAX_TIPS = 5
+
+def build_itinerary_schema(num_days: Optional[int] = None) -> Dict:
+    """Itinerary schema with array bounds; exactly `num_days` days when known
+
+    The grammar then cannot emit a day beyond the last expected one, so
+    decoding ends right after it (plus a bounded list of tips).
+    """
+    schema = copy.deepcopy(ITINERARY_SCHEMA)
+    props = schema['properties']
+    day_props = props['days']['items']['properties']
+
+    day_props['slots'].update(minItems=1, maxItems=MAX_SLOTS_PER_DAY)
+    day_props['dining'].update(maxItems=MAX_MEALS_PER_DAY)
+    props['tips'].update(maxItems=MAX_TIPS)
+    if num_days:
+        props['days'].update(minItems=num_days, maxItems=num_days)
+
+    return schema
+
+def build_days_schema(num_days: int) -> Dict:
+    """Schema for exactly `num_days` days and nothing else (partial regeneration)"""
+    days = build_itinerary_schema(num_days)['properties']['days']
+    return {"type": "object", "properties": {"days": days}, "required": ["days"]}
+
+# Progressive mode: a small model first writes only the skeleton of each
+# day, which the main model then fills in
+MAX_DRAFT_SLOTS_PER_DAY = 4
+
+def build_draft_schema(num_days: int) -> Dict:
+    """Title, themes and timed activities only: no notes, dining or tips"""
+    slot = {
+        "type": "object",
+        "properties": {"time": {"type": "string"}, "do": {"type": "string"}},
+        "required": ["time", "do"]
+    }
+    day = {
+        "type": "object",
+        "properties": {
+            "dest": {"type": "string"},
+            "theme": {"type": "string"},
+            "slots": {"type": "array", "items": slot, "minItems": 1, "maxItems": MAX_DRAFT_SLOTS_PER_DAY}
+        },
+        "required": ["dest", "theme", "slots"]
+    }
+    return {
+        "type": "object",
+        "properties": {
+            "title": {"type": "string"},
+            "days": {"type": "array", "items": day, "minItems": num_days, "maxItems": num_days}
+        },
+        "required": ["title", "days"]
+    }
+
+# Shown to the model so it knows what each short key means
+SCHEMA_HINT = """Reply with JSON only, in this shape:
+{"title": "creative destination-specific trip title",
+ "days": [{"dest": "destination name", "theme": "short theme of the day",
+           "slots": [{"time": "09:00", "do": "activity or attraction", "note": "practical detail"}],
+           "dining": [{"meal": "Lunch", "place": "restaurant or food area", "note": "what to order or why"}]}],
+ "tips": ["local insight or travel tip"]}"""
+
+DAYS_SCHEMA_HINT = """Reply with JSON only, in this shape:
+{"days": [{"dest": "destination name", "theme": "short theme of the day",
+           "slots": [{"time": "09:00", "do": "activity or attraction", "note": "practical detail"}],
+           "dining": [{"meal": "Lunch", "place": "restaurant or food area", "note": "what to order or why"}]}]}"""
+
+DRAFT_SCHEMA_HINT = """Reply with JSON only, in this shape, keeping every value short:
+{"title": "creative destination-specific trip title",
+ "days": [{"dest": "destination name", "theme": "short theme of the day",
+           "slots": [{"time": "09:00", "do": "activity or attraction"}]}]}"""
+
+def normalize_itinerary(data: Optional[Dict]) -> Optional[Dict]:
+    """Drop empty entries and trim whitespace; None if there is nothing usable"""
+    if not isinstance(data, dict):
+        return None
+
+    days: List[Dict] = []
+    for day in data.get('days') or []:
+        slots = [
+            {k: str(slot.get(k, '')).strip() for k in ('time', 'do', 'note')}
+            for slot in day.get('slots') or [] if str(slot.get('do', '')).strip()
+        ]
+        dining = [
+            {k: str(meal.get(k, '')).strip() for k in ('meal', 'place', 'note')}
+            for meal in day.get('dining') or [] if str(meal.get('place', '')).strip()
+        ]
+        if slots or dining:
+            days.append({
+                'dest': str(day.get('dest', '')).strip(),
+                'theme': str(day.get('theme', '')).strip(),
+                'slots': slots,
+                'dining': dining
+            })
+
+    if not days:
+        return None
+
+    return {
+        'title': str(data.get('title', '')).strip(),
+        'days': days,
+        'tips': [str(t).strip() for t in data.get('tips') or [] if str(t).strip()]
+    }
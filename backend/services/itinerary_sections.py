@@ -0,0 +1,76 @@
+import re
+from typing import Dict, List, Optional
+
+# "## Day 3 (2025-06-03) – Rome: Ancient city", "### Day 3", "**Day 3:** ..."
+DAY_HEADER = re.compile(r'^(?P<marks>#{1,6}\s+|\*\*)?\s*day\s+(?P<number>\d+)\b.*$', re.IGNORECASE | re.MULTILINE)
+HEADING = re.compile(r'^(#{1,6})\s+\S', re.MULTILINE)
+BULLET = re.compile(r'^\s*[-*•]\s')
+RULE = re.compile(r'^\s*(?:---+|\*\*\*+)\s*$', re.MULTILINE)
+
+def split_days(markdown: str) -> List[Dict]:
+    """Find the day sections of an itinerary's markdown
+
+    Works for renderer output and free-form model markdown. Each section is
+    {'number', 'heading', 'start', 'end', 'text'} with character offsets; a
+    day ends at the next day, at a non-day heading of the same or higher
+    level (e.g. "## Travel Tips"), or at a horizontal rule.
+    """
+    headers = list(DAY_HEADER.finditer(markdown))
+    days = []
+
+    for i, header in enumerate(headers):
+        marks = (header.group('marks') or '').strip()
+        level = len(marks) if marks.startswith('#') else 2
+        end = headers[i + 1].start() if i + 1 < len(headers) else len(markdown)
+
+        # Stop early at a closing heading or rule between this day and the next
+        body_start = header.end()
+        for match in HEADING.finditer(markdown, body_start, end):
+            if len(match.group(1)) <= level:
+                end = match.start()
+                break
+        rule = RULE.search(markdown, body_start, end)
+        if rule:
+            end = rule.start()
+
+        days.append({
+            'number': int(header.group('number')),
+            'heading': header.group(0).strip(),
+            'start': header.start(),
+            'end': end,
+            'text': markdown[header.start():end].rstrip()
+        })
+
+    return days
+
+def heading_date(heading: str) -> Optional[str]:
+    """The "(date)" right after "Day N" in a heading, if any"""
+    match = re.search(r'day\s+\d+\s*\(([^)]+)\)', heading, re.IGNORECASE)
+    return match.group(1).strip() if match else None
+
+def summarize_day(day: Dict, structured: Optional[Dict] = None, max_chars: int = 240) -> str:
+    """One line describing a day, for context in a partial regeneration prompt"""
+    if structured:
+        activities = ', '.join(a['do'] for a in structured.get('activities', [])[:4] if a.get('do'))
+        summary = f"Day {day['number']} ({structured.get('destination', '')}): {structured.get('theme', '')}"
+        if activities:
+            summary += f" - {activities}"
+    else:
+        heading = day['heading'].strip('#* ')
+        items = [
+            re.sub(r'[*_`]', '', line.lstrip('-*• ').strip())
+            for line in day['text'].splitlines()[1:]
+            if BULLET.match(line)
+        ]
+        summary = heading + (f" - {'; '.join(items[:3])}" if items else '')
+    return summary if len(summary) <= max_chars else summary[:max_chars - 3].rstrip() + '...'
+
+def splice_days(markdown: str, days: List[Dict], replacements: Dict[int, str]) -> str:
+    """Replace the text of the given day numbers, keeping everything else verbatim"""
+    result = markdown
+    # Work from the end so earlier offsets stay valid
+    for day in sorted(days, key=lambda d: d['start'], reverse=True):
+        if day['number'] in replacements:
+            new_text = replacements[day['number']].rstrip() + '\n\n'
+            result = result[:day['start']] + new_text + result[day['end']:].lstrip('\n')
+    return result
@@ -0,0 +1,102 @@
+import sys
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+@dataclass(slots=True)
+class Attraction:
+    """A place to visit: what the prompt, day planner and section prompts read"""
+    name: str
+    rating: float = 0.0
+    lat: Optional[float] = None
+    lng: Optional[float] = None
+    hours: str = ''  # Opening hours summary, top-ranked places only
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Attraction':
+        return cls(
+            name=data.get('name', ''),
+            rating=data.get('rating') or 0.0,
+            lat=data.get('lat'),
+            lng=data.get('lng'),
+            hours=data.get('hours') or ''
+        )
+
+    def to_dict(self) -> Dict:
+        return {'name': self.name, 'rating': self.rating, 'lat': self.lat, 'lng': self.lng,
+                'hours': self.hours}
+
+@dataclass(slots=True)
+class DestinationInfo:
+    """Enrichment gathered for one destination
+
+    `sections` holds the text the preference retriever chunks (non-empty
+    Wikivoyage sections and the encyclopedia overview); `images` are the
+    selected gallery URLs.
+    """
+    summary: str = ''
+    url: str = ''
+    attractions: List[Attraction] = field(default_factory=list)
+    tips: List[str] = field(default_factory=list)
+    images: List[str] = field(default_factory=list)
+    sections: Dict[str, str] = field(default_factory=dict)
+
+    def is_empty(self) -> bool:
+        """True if every source came back empty"""
+        return not (self.summary or self.attractions or self.images)
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'DestinationInfo':
+        sections = data.get('sections')
+        if sections is None:
+            # Cached before the record format
+            sections = {**(data.get('wikivoyage_sections') or {}), 'overview': data.get('wiki_content', '')}
+        return cls(
+            summary=data.get('summary', data.get('wiki_summary')) or '',
+            url=data.get('url', data.get('wiki_url')) or '',
+            attractions=[Attraction.from_dict(a) for a in data.get('attractions') or []],
+            tips=list(data.get('tips') or []),
+            images=list(data.get('images') or []),
+            sections={name: text for name, text in sections.items() if text}
+        )
+
+    def to_dict(self) -> Dict:
+        return {
+            'summary': self.summary,
+            'url': self.url,
+            'attractions': [a.to_dict() for a in self.attractions],
+            'tips': self.tips,
+            'images': self.images,
+            'sections': self.sections
+        }
+
+    def nbytes(self) -> int:
+        """Approximate memory held by the record and everything it references"""
+        size = sys.getsizeof(self) + sys.getsizeof(self.summary) + sys.getsizeof(self.url)
+        size += sys.getsizeof(self.attractions) + sum(
+            sys.getsizeof(a) + sys.getsizeof(a.name) + sys.getsizeof(a.hours) for a in self.attractions
+        )
+        for strings in (self.tips, self.images):
+            size += sys.getsizeof(strings) + sum(sys.getsizeof(s) for s in strings)
+        size += sys.getsizeof(self.sections) + sum(
+            sys.getsizeof(k) + sys.getsizeof(v) for k, v in self.sections.items()
+        )
+        return size
+
+@dataclass(slots=True)
+class TripDestination:
+    """A requested destination with its dates and enrichment"""
+    name: str
+    start_date: Optional[str] = None
+    end_date: Optional[str] = None
+    info: DestinationInfo = field(default_factory=DestinationInfo)
+
+    @classmethod
+    def from_request(cls, dest, info: Optional[DestinationInfo] = None) -> 'TripDestination':
+        """From a request model or dict"""
+        data = dest.model_dump() if hasattr(dest, 'model_dump') else dest
+        return cls(
+            name=data['name'],
+            start_date=data.get('start_date'),
+            end_date=data.get('end_date'),
+            info=info or DestinationInfo()
+        )
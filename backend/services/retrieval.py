@@ -0,0 +1,90 @@
+import re
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from llm.embeddings import LocalEmbedder
+from services.records import DestinationInfo
+
+def chunk_text(text: str, max_chars: int = 400) -> List[str]:
+    """Split text into chunks of whole sentences, at most ~max_chars each"""
+    chunks = []
+    for paragraph in re.split(r'\n\s*\n', text):
+        current = ''
+        for sentence in re.split(r'(?<=[.!?])\s+', ' '.join(paragraph.split())):
+            if current and len(current) + len(sentence) + 1 > max_chars:
+                chunks.append(current)
+                current = ''
+            current = f"{current} {sentence}".strip()
+        if current:
+            chunks.append(current)
+
+    # Headings and stubs carry no useful detail on their own
+    return [c for c in chunks if len(c) >= 60]
+
+class VectorIndex:
+    """In-memory index of L2-normalized vectors with batched cosine scoring"""
+
+    def __init__(self, dim: int):
+        self.vectors = np.zeros((0, dim), dtype=np.float32)
+        self.items: List[Dict] = []
+
+    def add(self, vectors: np.ndarray, items: List[Dict]):
+        """Append vectors (already normalized) with their payloads"""
+        self.vectors = np.vstack([self.vectors, vectors.astype(np.float32)])
+        self.items.extend(items)
+
+    def scores(self, queries: np.ndarray) -> np.ndarray:
+        """Cosine similarity of every query (rows) against every item (cols)"""
+        return queries @ self.vectors.T
+
+    def top_k(self, scores: np.ndarray, k: int) -> List[Tuple[Dict, float]]:
+        """Best k items for a 1-D score vector, highest first"""
+        if not len(self.items):
+            return []
+        k = min(k, len(self.items))
+        idx = np.argpartition(-scores, k - 1)[:k]
+        idx = idx[np.argsort(-scores[idx])]
+        return [(self.items[i], float(scores[i])) for i in idx]
+
+class PreferenceRetriever:
+    """Pick the destination text most relevant to the user's preferences"""
+
+    # "no hiking", "avoid crowds", "not interested in nightlife", ...
+    NEGATION_PATTERN = re.compile(
+        r"\b(?:not interested in|don't like|dislike|without|avoid|skip|hate|not|no)\s+([a-z][a-z\s-]{2,40}?)(?=[,.;!]|\band\b|$)",
+        re.IGNORECASE
+    )
+    NEGATIVE_WEIGHT = 0.6
+
+    def __init__(self, embedder: Optional[LocalEmbedder] = None):
+        self.embedder = embedder or LocalEmbedder()
+
+    def build_index(self, info: DestinationInfo) -> VectorIndex:
+        """Chunk and embed all fetched text for one destination"""
+        index = VectorIndex(self.embedder.dim)
+
+        chunks = []
+        for section, text in info.sections.items():
+            for chunk in chunk_text(text or ''):
+                chunks.append({'section': section, 'text': chunk})
+
+        if chunks:
+            index.add(self.embedder.embed([c['text'] for c in chunks]), chunks)
+        return index
+
+    def retrieve(self, info: DestinationInfo, preferences: str, k: int = 4) -> List[Dict]:
+        """Top-k chunks for the preferences, penalising anything they rule out"""
+        index = self.build_index(info)
+        if not index.items:
+            return []
+
+        negatives = [m.strip() for m in self.NEGATION_PATTERN.findall(preferences)]
+        positive = self.NEGATION_PATTERN.sub(' ', preferences).strip() or preferences
+
+        # Score positive and negative queries in one matrix product
+        queries = self.embedder.embed([positive] + negatives)
+        scores = index.scores(queries)
+        combined = scores[0]
+        if negatives:
+            combined = combined - self.NEGATIVE_WEIGHT * scores[1:].max(axis=0)
+
+        return [item for item, _ in index.top_k(combined, k)]
@@ -0,0 +1,75 @@
+import hashlib
+import os
+import threading
+from typing import Optional
+from fetchers.resilience import ResilientSession
+
+class ThumbnailCache:
+    """Gallery images downloaded once and kept on disk, keyed by URL hash"""
+
+    MAX_BYTES = 8 * 1024 * 1024
+
+    def __init__(self, directory: Optional[str] = None):
+        cache_dir = os.getenv("VB_CACHE_DIR", "cache")
+        self.directory = directory or os.path.join(cache_dir, "images")
+        os.makedirs(self.directory, exist_ok=True)
+        self.session = ResilientSession('images')
+
+    @staticmethod
+    def key(url: str) -> str:
+        """Stable identifier for an image URL"""
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()[:32]
+
+    def path(self, url: str) -> str:
+        """Where the original bytes for a URL live"""
+        key = self.key(url)
+        return os.path.join(self.directory, key[:2], key, "original")
+
+    def has(self, url: str) -> bool:
+        return os.path.exists(self.path(url))
+
+    def remember(self, url: str) -> str:
+        """Record which URL a key stands for (so it can be fetched by key later)"""
+        key = self.key(url)
+        source = os.path.join(self.directory, key[:2], key, "source")
+        if not os.path.exists(source):
+            os.makedirs(os.path.dirname(source), exist_ok=True)
+            with open(source, 'w', encoding='utf-8') as f:
+                f.write(url)
+        return key
+
+    def url_for(self, key: str) -> Optional[str]:
+        """The URL remembered for a key, if any"""
+        source = os.path.join(self.directory, key[:2], key, "source")
+        if not os.path.exists(source):
+            return None
+        with open(source, encoding='utf-8') as f:
+            return f.read().strip()
+
+    def ensure(self, url: str) -> Optional[str]:
+        """Download the image if needed; returns its path or None on failure"""
+        path = self.path(url)
+        if os.path.exists(path):
+            return path
+
+        try:
+            response = self.session.get(url, timeout=15, stream=True)
+            response.raise_for_status()
+
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}-{threading.get_ident()}.part"
+            size = 0
+            with open(tmp_path, 'wb') as f:
+                for chunk in response.iter_content(64 * 1024):
+                    size += len(chunk)
+                    if size > self.MAX_BYTES:
+                        raise ValueError(f"image larger than {self.MAX_BYTES} bytes")
+                    f.write(chunk)
+            os.replace(tmp_path, path)  # Never expose half-written files
+            return path
+        except Exception as e:
+            print(f"Error downloading image {url[:80]}: {e}")
+            tmp_path = f"{path}.{os.getpid()}-{threading.get_ident()}.part"
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return None
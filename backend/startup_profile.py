@@ -0,0 +1,92 @@
+"""Report how long each backend module takes to import.
+
+Every module is imported in a fresh interpreter so the numbers are cold
+and independent of each other. Run from the backend directory:
+
+    python startup_profile.py
+    python startup_profile.py --boot   # also time until /health answers
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+
+# Third-party libraries first, then our own modules
+MODULES = [
+    'requests',
+    'fastapi',
+    'uvicorn',
+    'pydantic',
+    'aiohttp',
+    'lxml.etree',
+    'PIL.Image',
+    'wikipedia',
+    'googlemaps',
+    'markdown',
+    'weasyprint',
+    'llama_cpp',
+    'lazy_services',
+    'fetchers',
+    'llm.model',
+    'pdf.generator',
+    'services.itinerary_planner',
+    'main',
+]
+
+TIMER = (
+    "import time, sys; t = time.perf_counter(); import {module}; "
+    "sys.stdout.write(str(time.perf_counter() - t))"
+)
+
+def time_import(module: str) -> str:
+    """Import a module in a fresh interpreter and return seconds (or an error)"""
+    result = subprocess.run(
+        [sys.executable, '-c', TIMER.format(module=module)],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    if result.returncode != 0:
+        return f"failed ({result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'error'})"
+    return f"{float(result.stdout):8.3f}s"
+
+def time_boot(port: int, timeout: float = 30.0) -> str:
+    """Start main.py and measure until the port accepts connections"""
+    env = dict(os.environ, VB_EAGER_WARMUP='0', VB_PORT=str(port))
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, 'main.py'], env=env,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            if process.poll() is not None:
+                return "failed (backend exited)"
+            try:
+                with socket.create_connection(('127.0.0.1', port), timeout=0.2):
+                    return f"{time.perf_counter() - started:8.3f}s"
+            except OSError:
+                time.sleep(0.02)
+        return "timed out"
+    finally:
+        process.terminate()
+        process.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--boot', action='store_true', help='also time backend boot to port bind')
+    parser.add_argument('--port', type=int, default=8765, help='port used for --boot')
+    args = parser.parse_args()
+
+    print(f"{'module':<30} import time")
+    print('-' * 45)
+    for module in MODULES:
+        print(f"{module:<30} {time_import(module)}")
+
+    if args.boot:
+        print('-' * 45)
+        print(f"{'main.py -> port open':<30} {time_boot(args.port)}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+"""ModelDownload against a local range-capable HTTP server"""
+import hashlib
+import os
+import re
+import threading
+import time
+import types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from llm import download as download_module
+from llm.download import DownloadError, ModelDownload
+
+CHUNK = 1024
+BODY = os.urandom(10 * CHUNK + 100)  # Ten full chunks and a short last one
+
+class FileServer(ThreadingHTTPServer):
+    """Serves one file with optional Range/If-Range support and injected faults"""
+
+    daemon_threads = True
+
+    def __init__(self, body: bytes):
+        super().__init__(('127.0.0.1', 0), _FileHandler)
+        self.url = f"http://127.0.0.1:{self.server_address[1]}/model.gguf"
+        self.body = body
+        self.etag = '"v1"'
+        self.ranges = True
+        self.linked_sha256 = None
+        self.fail_from = None  # Ranges starting at or after this offset get a 404
+        self.drop_once = False  # Close the next range response halfway through
+        self.change_after_probe = False  # New ETag once the probe has been answered
+        self.requests = []  # (start, end) of every range request, None without a Range header
+
+class _FileHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        match = re.match(r'bytes=(\d+)-(\d+)', self.headers.get('Range', ''))
+        span = (int(match.group(1)), int(match.group(2))) if match else None
+        server.requests.append(span)
+
+        if_range = self.headers.get('If-Range')
+        if not server.ranges or span is None or (if_range and if_range != server.etag):
+            self._send(200, server.body)
+            return
+
+        start, end = span
+        if server.fail_from is not None and start >= server.fail_from:
+            self.send_error(404)
+            return
+        body = server.body[start:end + 1]
+        if server.drop_once and span != (0, 0):
+            server.drop_once = False
+            self._send(206, body, span, drop=True)
+            return
+        self._send(206, body, span)
+        if span == (0, 0) and server.change_after_probe:
+            server.etag = '"v2"'
+
+    def _send(self, status, body, span=None, drop=False):
+        server = self.server
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', server.etag)
+        if span:
+            self.send_header('Content-Range', f"bytes {span[0]}-{span[0] + len(body) - 1}/{len(server.body)}")
+        if server.linked_sha256:
+            self.send_header('X-Linked-Etag', f'"{server.linked_sha256}"')
+        self.end_headers()
+        self.wfile.write(body[:len(body) // 2] if drop else body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server():
+    server = FileServer(BODY)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture(autouse=True)
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(ModelDownload, 'CHUNK_SIZE', CHUNK)
+    monkeypatch.setattr(ModelDownload, 'STALL_TIMEOUT', 5.0)
+    # Retry back-off would otherwise sleep for seconds
+    monkeypatch.setattr(download_module, 'time', types.SimpleNamespace(sleep=lambda s: None, monotonic=time.monotonic))
+
+def make(server, tmp_path, **kwargs):
+    kwargs.setdefault('connections', 1)
+    return ModelDownload(server.url, directory=str(tmp_path), **kwargs)
+
+def sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+def test_download_verifies_and_installs(server, tmp_path):
+    download = make(server, tmp_path, sha256=sha256(BODY), connections=4)
+    path = download.run()
+
+    assert open(path, 'rb').read() == BODY
+    assert download.status()['checksum_verified']
+    assert not os.path.exists(download.part_path) and not os.path.exists(download.state_path)
+
+def test_resumes_from_the_chunks_on_disk(server, tmp_path):
+    server.fail_from = 5 * CHUNK
+    with pytest.raises(DownloadError, match='HTTP 404'):
+        make(server, tmp_path).run()
+    assert os.path.exists(tmp_path / 'model.gguf.part.json')
+
+    server.fail_from = None
+    server.requests.clear()
+    download = make(server, tmp_path, sha256=sha256(BODY))
+    path = download.run()
+
+    assert open(path, 'rb').read() == BODY
+    fetched = [span for span in server.requests if span != (0, 0)]
+    assert min(start for start, _ in fetched) == 5 * CHUNK
+    assert download.status()['downloaded_bytes'] == len(BODY)
+
+def test_starts_over_when_the_remote_file_changed(server, tmp_path):
+    server.fail_from = 5 * CHUNK
+    with pytest.raises(DownloadError):
+        make(server, tmp_path).run()
+
+    server.fail_from = None
+    server.body = new_body = os.urandom(len(BODY))
+    server.etag = '"v2"'
+    path = make(server, tmp_path, sha256=sha256(new_body)).run()
+    assert open(path, 'rb').read() == new_body
+
+def test_if_range_mismatch_stops_the_download(server, tmp_path):
+    # The file changes between the probe and the first chunk: the server
+    # answers the If-Range request with the whole file (200)
+    server.change_after_probe = True
+    with pytest.raises(DownloadError, match='changed on the server'):
+        make(server, tmp_path).run()
+    assert not os.path.exists(tmp_path / 'model.gguf')
+
+def test_retries_from_the_last_byte_after_a_disconnect(server, tmp_path):
+    server.drop_once = True
+    path = make(server, tmp_path, sha256=sha256(BODY)).run()
+
+    assert open(path, 'rb').read() == BODY
+    # The retry asked only for the rest of the interrupted chunk
+    assert (CHUNK // 2, CHUNK - 1) in server.requests
+
+def test_checksum_mismatch_discards_the_download(server, tmp_path):
+    download = make(server, tmp_path, sha256='0' * 64)
+    with pytest.raises(DownloadError, match='SHA-256 mismatch'):
+        download.run()
+
+    assert os.listdir(tmp_path) == []
+
+def test_streams_when_ranges_are_not_supported(server, tmp_path):
+    server.ranges = False
+    server.linked_sha256 = sha256(BODY)  # Picked up like Hugging Face's header
+    download = make(server, tmp_path)
+    path = download.run()
+
+    assert open(path, 'rb').read() == BODY
+    assert download.status()['checksum_verified']
+    assert all(span in (None, (0, 0)) for span in server.requests)
@@ -0,0 +1,167 @@
+"""GooglePlacesFetcher against a local stub of the Places endpoints"""
+import json
+import threading
+import time
+import urllib.parse
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from fetchers.google_places import GooglePlacesFetcher
+from fetchers.rate_limiter import TokenBucket
+
+WEEKDAY_TEXT = [
+    "Monday: Closed",
+    "Tuesday: 9:00 AM – 7:00 PM",
+    "Wednesday: 9:00 AM – 7:00 PM",
+    "Thursday: 9:00 AM – 9:00 PM",
+    "Friday: 9:00 AM – 7:00 PM",
+    "Saturday: 9:00 AM – 7:00 PM",
+    "Sunday: 9:00 AM – 7:00 PM",
+]
+
+class PlacesStub(ThreadingHTTPServer):
+    """Text search and Place Details, counting the requests it serves"""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), _PlacesHandler)
+        self.base_url = f"http://127.0.0.1:{self.server_address[1]}"
+        self.hits = Counter()
+        self.empty_queries = set()
+        self.details_delay = 0.0
+
+class _PlacesHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urllib.parse.urlparse(self.path)
+        params = dict(urllib.parse.parse_qsl(url.query))
+        stub = self.server
+
+        if url.path.endswith('/textsearch/json'):
+            stub.hits['search'] += 1
+            query = params.get('query', '')
+            if query in stub.empty_queries:
+                self._json({'status': 'ZERO_RESULTS', 'results': []})
+                return
+            city = query.replace('tourist attractions in ', '')
+            self._json({'status': 'OK', 'results': [
+                {
+                    'name': f"{city} Sight {i}",
+                    'rating': 4.0 + i / 10,
+                    'place_id': f"{city}-{i}",
+                    'geometry': {'location': {'lat': 41.9 + i / 100, 'lng': 12.5}}
+                }
+                for i in range(1, 4)
+            ]})
+        elif url.path.endswith('/details/json'):
+            stub.hits['details'] += 1
+            time.sleep(stub.details_delay)
+            self._json({'status': 'OK', 'result': {
+                'place_id': params.get('place_id'),
+                'opening_hours': {'weekday_text': WEEKDAY_TEXT}
+            }})
+        else:
+            self.send_error(404)
+
+    def _json(self, body):
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def stub():
+    server = PlacesStub()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def make_fetcher(stub, tmp_path, monkeypatch):
+    """Fetcher pointed at the stub with its cache in tmp_path; keyword args override env"""
+    monkeypatch.setenv('GOOGLE_PLACES_API_KEY', 'AIzaTestStub')  # googlemaps checks the prefix
+    monkeypatch.setenv('GOOGLE_PLACES_BASE_URL', stub.base_url)
+    monkeypatch.setenv('VB_CACHE_DIR', str(tmp_path))
+    monkeypatch.setenv('GOOGLE_PLACES_QPS', '1000')
+    monkeypatch.setenv('GOOGLE_PLACES_BURST', '1000')
+    monkeypatch.setenv('GOOGLE_PLACES_DAILY_QUOTA', '1000')
+
+    def make(**env):
+        for name, value in env.items():
+            monkeypatch.setenv(name, str(value))
+        return GooglePlacesFetcher()
+    return make
+
+def test_search_is_served_from_the_persistent_cache(stub, make_fetcher):
+    first = make_fetcher().search_attractions('Rome')
+    assert [a['name'] for a in first] == ['Rome Sight 1', 'Rome Sight 2', 'Rome Sight 3']
+    assert first[0]['lat'] == pytest.approx(41.91)
+
+    # A new fetcher (as after a restart) reads the same SQLite cache
+    assert make_fetcher().search_attractions('Rome') == first
+    assert stub.hits['search'] == 1
+
+def test_empty_search_is_not_cached(stub, make_fetcher):
+    stub.empty_queries.add('tourist attractions in Atlantis')
+    fetcher = make_fetcher()
+
+    assert fetcher.search_attractions('Atlantis') == []
+    assert fetcher.search_attractions('Atlantis') == []
+    assert stub.hits['search'] == 2
+
+def test_daily_quota_is_enforced_and_survives_a_restart(stub, make_fetcher):
+    fetcher = make_fetcher(GOOGLE_PLACES_DAILY_QUOTA=2)
+    assert fetcher.search_attractions('Rome')
+    assert fetcher.search_attractions('Paris')
+    assert fetcher.search_attractions('Oslo') == []
+    assert stub.hits['search'] == 2
+
+    restarted = make_fetcher(GOOGLE_PLACES_DAILY_QUOTA=2)
+    assert restarted.limiter.remaining_today() == 0
+    assert restarted.search_attractions('Lima') == []
+    # Cached queries cost nothing and are still served
+    assert restarted.search_attractions('Rome')
+    assert stub.hits['search'] == 2
+
+def test_rate_limit_spaces_requests(stub, make_fetcher):
+    fetcher = make_fetcher(GOOGLE_PLACES_QPS=10, GOOGLE_PLACES_BURST=1)
+    started = time.monotonic()
+    for city in ('Rome', 'Paris', 'Oslo', 'Lima'):
+        fetcher.search_attractions(city)
+    # One token up front, then one every 100 ms
+    assert time.monotonic() - started >= 0.25
+    assert stub.hits['search'] == 4
+
+def test_top_place_details_are_concurrent_and_cached(stub, make_fetcher):
+    fetcher = make_fetcher()
+    places = fetcher.search_attractions('Rome')
+    stub.details_delay = 0.3
+
+    started = time.monotonic()
+    details = fetcher.get_top_place_details(places, top_n=2, fields=GooglePlacesFetcher.HOURS_FIELDS)
+    assert time.monotonic() - started < 0.55
+    assert set(details) == {'Rome-1', 'Rome-2'}
+    assert stub.hits['details'] == 2
+
+    assert fetcher.get_top_place_details(places, top_n=2, fields=GooglePlacesFetcher.HOURS_FIELDS) == details
+    assert stub.hits['details'] == 2
+
+def test_summarize_hours():
+    assert GooglePlacesFetcher.summarize_hours({'weekday_text': WEEKDAY_TEXT}) == (
+        "usually 9:00 AM – 7:00 PM, closed Monday"
+    )
+    assert GooglePlacesFetcher.summarize_hours({'weekday_text': ["Monday: Open 24 hours"] * 7}) == "Open 24 hours"
+    assert GooglePlacesFetcher.summarize_hours(None) == ''
+
+def test_token_bucket_rejects_a_zero_rate():
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0)
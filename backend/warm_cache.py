@@ -0,0 +1,60 @@
+"""Warm the enrichment, image and prompt caches for popular destinations.
+
+Run from the backend directory:
+
+    python warm_cache.py run                 # enrichment + image downloads
+    python warm_cache.py run --prompts       # also evaluate prompt prefixes
+    python warm_cache.py report              # coverage and freshness
+"""
+import argparse
+import asyncio
+import json
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('command', choices=['run', 'report'])
+    parser.add_argument('--file', help='destinations file (default: popular_destinations.txt)')
+    parser.add_argument('--max-age-hours', type=float, default=20.0,
+                        help='redo work older than this (default: 20)')
+    parser.add_argument('--rate', type=float, default=1.0,
+                        help='requests per second per upstream host (default: 1)')
+    parser.add_argument('--prompts', action='store_true',
+                        help='evaluate prompt prefixes (needs the model and LLM_PROMPT_CACHE_DIR)')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args()
+
+    from services.cache_warmer import cache_report, load_destinations
+    destinations = load_destinations(args.file)
+
+    if args.command == 'run':
+        from services.cache_warmer import CacheWarmer
+        from services.itinerary_planner import ItineraryPlanner
+
+        # The models are only needed to evaluate prompt prefixes; a fetch-only
+        # warm shouldn't spend seconds and gigabytes loading them
+        planner = ItineraryPlanner(load_models=args.prompts)
+        warmer = CacheWarmer(planner, host_rate=args.rate, max_age_hours=args.max_age_hours)
+        asyncio.run(warmer.run(destinations, warm_prompts=args.prompts))
+        cache = warmer.cache
+    else:
+        # The report only reads the SQLite cache; no planner (or model) needed
+        from services.enrichment_cache import EnrichmentCache
+        cache = EnrichmentCache()
+
+    report = cache_report(cache, destinations, args.max_age_hours)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"{'destination':<28} {'enriched':>9} {'images':>8} {'prompt':>8}")
+    for row in report['rows']:
+        enriched = f"{row['enriched_age_hours']}h" if row['enriched_age_hours'] is not None else '-'
+        images = f"{row['thumbs_cached']}/{row['thumbs_total']}"
+        prompt = f"{row['prompt_age_hours']}h" if row['prompt_age_hours'] is not None else '-'
+        print(f"{row['name'][:28]:<28} {enriched:>9} {images:>8} {prompt:>8}")
+    print(f"\nCoverage: {report['enriched']:.0%} enriched, {report['fresh']:.0%} fresh, "
+          f"{report['thumbnails']:.0%} images, {report['prompts']:.0%} prompts "
+          f"(median age {report['median_age_hours']}h, oldest {report['oldest_age_hours']}h)")
+
+if __name__ == '__main__':
+    main()
@@ -111,17 +111,22 @@ if ! ls backend/models/*.gguf 1> /dev/null 2>&1; then
     echo ""
     echo "⚠️  WARNING: No GGUF model found in backend/models/"
     echo ""
-    echo "Download a model with:"
-    echo "  cd backend/models"
-    echo "  curl -L -O https://huggingface.co/TheBloke/Mistral-7B-Instruct-v0.2-GGUF/resolve/main/mistral-7b-instruct-v0.2.Q4_K_M.gguf"
-    echo "  cd ../.."
+    echo "Download a model with (resumes if interrupted):"
+    echo "  cd backend && venv/bin/python download_model.py mistral-7b-instruct && cd .."
+    echo "or use the Download model button in the app"
     echo "⚠️  Continuing without model - some features may not work"
     echo ""
 else
-    MODEL_FILE=$(ls backend/models/*.gguf | head -1)
-    MODEL_NAME=$(basename "$MODEL_FILE")
-    MODEL_SIZE=$(ls -lh "$MODEL_FILE" | awk '{print $5}')
-    echo "✓ Model found: $MODEL_NAME ($MODEL_SIZE)"
+    MODEL_COUNT=$(ls backend/models/*.gguf | wc -l | tr -d ' ')
+    if [ "$MODEL_COUNT" -gt 1 ]; then
+        echo "✓ Found $MODEL_COUNT models; the backend loads the fastest benchmarked one"
+        echo "  (benchmark them with: cd backend && venv/bin/python benchmark_models.py run)"
+    else
+        MODEL_FILE=$(ls backend/models/*.gguf | head -1)
+        MODEL_NAME=$(basename "$MODEL_FILE")
+        MODEL_SIZE=$(ls -lh "$MODEL_FILE" | awk '{print $5}')
+        echo "✓ Model found: $MODEL_NAME ($MODEL_SIZE)"
+    fi
 fi
 
 # Create .env if it doesn't exist
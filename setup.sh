@@ -30,11 +30,15 @@ if command -v python3 &> /dev/null; then
 elif command -v python &> /dev/null; then
     PYTHON_CMD=python
 else
-    echo "❌ Python is not installed. Please install Python 3.8+ from https://python.org"
+    echo "❌ Python is not installed. Please install Python 3.10+ from https://python.org"
     exit 1
 fi
 
 PYTHON_VERSION=$($PYTHON_CMD --version 2>&1 | awk '{print $2}')
+if ! $PYTHON_CMD -c 'import sys; sys.exit(sys.version_info < (3, 10))'; then
+    echo "❌ Python $PYTHON_VERSION is too old. Please install Python 3.10+ from https://python.org"
+    exit 1
+fi
 echo "✓ Python $PYTHON_VERSION found"
 
 # Install Node dependencies
@@ -85,11 +89,10 @@ if ls models/*.gguf 1> /dev/null 2>&1; then
 else
     echo "⚠️  No GGUF model found in backend/models/"
     echo ""
-    echo "Please download a model file. Recommended:"
-    echo "  - Mistral 7B Instruct Q4_K_M (~4GB)"
+    echo "Download the recommended Mistral 7B Instruct Q4_K_M (~4GB) with:"
+    echo "  cd backend && venv/bin/python download_model.py mistral-7b-instruct"
     echo ""
-    echo "Download from: https://huggingface.co/TheBloke"
-    echo "Place the .gguf file in: backend/models/"
+    echo "Interrupted downloads resume; see python download_model.py --list for other models"
 fi
 
 # Create .env if it doesn't exist
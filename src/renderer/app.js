@@ -3,6 +3,13 @@ let destinations = [];
 let currentItinerary = null;
 let backendURL = 'http://127.0.0.1:8000';
 let itineraryHistory = [];
+let prefetchedDestinations = new Map(); // name -> time prefetch was requested
+const PREFETCH_TTL_MS = 10 * 60 * 1000; // Backend keeps enrichment for 15 minutes
+const RECOMMENDED_MODEL = 'mistral-7b-instruct'; // Catalog name in backend/llm/download.py
+let downloadPollTimer = null;
+let downloadStates = new Map(); // file name -> last state seen, to announce changes once
+let pendingRefinement = null; // id of the progressive plan still being refined
+const REFINEMENT_POLL_MS = 2000;
 
 // Helper function to get Tauri invoke if available
 function getTauriInvoke() {
@@ -62,6 +69,7 @@ document.addEventListener('DOMContentLoaded', async () => {
     loadSavedItinerary();
 
     checkBackendHealth();
+    pollModelDownloads(); // Pick up a download started before a reload
 
     // Check backend health periodically
     setInterval(checkBackendHealth, 10000);
@@ -73,6 +81,34 @@ function setupEventListeners() {
     // export-pdf-btn uses onclick in HTML, no need to add listener here
     document.getElementById('history-btn').addEventListener('click', toggleHistory);
     document.getElementById('close-history').addEventListener('click', toggleHistory);
+
+    // Start enriching a destination as soon as its name field loses focus,
+    // so only LLM time remains when Generate is pressed
+    document.getElementById('destinations-list').addEventListener('focusout', (event) => {
+        if (event.target.dataset.field === 'name') {
+            prefetchDestination(event.target.value.trim());
+        }
+    });
+}
+
+async function prefetchDestination(name) {
+    const key = name.toLowerCase();
+    const requestedAt = prefetchedDestinations.get(key);
+    if (!name || (requestedAt && Date.now() - requestedAt < PREFETCH_TTL_MS)) return;
+    prefetchedDestinations.set(key, Date.now());
+
+    try {
+        await fetch(`${backendURL}/api/prefetch`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ destinations: [{ name }] })
+        });
+        console.log('Prefetch started for', name);
+    } catch (error) {
+        // Best effort: /api/plan gathers everything itself if this fails
+        prefetchedDestinations.delete(key);
+        console.log('Prefetch failed for', name, error);
+    }
 }
 
 function addDestination() {
@@ -223,7 +259,10 @@ async function generateItinerary() {
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify({
                 destinations: destinationsData,
-                preferences: preferences
+                preferences: preferences,
+                // A draft comes back within seconds when the backend has a
+                // draft model; the full plan replaces it once refined
+                progressive: true
             })
         });
 
@@ -235,13 +274,19 @@ async function generateItinerary() {
         const data = await response.json();
         currentItinerary = data;
 
-        // Save to localStorage
-        saveItinerary(data);
-
-        // Display markdown preview
-        displayMarkdownPreview(data.markdown);
-
-        showStatus('Itinerary generated successfully!', 'success');
+        const progressive = data.itinerary.generation?.progressive;
+        if (data.itinerary.draft && progressive) {
+            // Only the refined version goes into history
+            pendingRefinement = progressive.id;
+            displayMarkdownPreview(data.markdown, true);
+            showStatus(`Draft ready in ${progressive.draft_seconds}s, refining...`, 'info');
+            pollRefinement(progressive.id);
+        } else {
+            pendingRefinement = null;
+            saveItinerary(data);
+            displayMarkdownPreview(data.markdown);
+            showStatus('Itinerary generated successfully!', 'success');
+        }
 
         // Enable export button with multiple attempts
         const exportBtn = document.getElementById('export-pdf-btn');
@@ -271,11 +316,70 @@ async function generateItinerary() {
     }
 }
 
-function displayMarkdownPreview(markdown) {
+// Gallery images are served by the backend's image proxy as resized WebP
+// variants; turn its relative links into responsive <img> tags
+const PROXY_IMAGE_PATTERN = /!\[([^\]]*)\]\((\/api\/images\/[0-9a-f]{32})\?w=\d+\)/g;
+const PROXY_IMAGE_WIDTHS = [400, 800, 1600];
+
+function resolveProxyImages(markdown) {
+    return markdown.replace(PROXY_IMAGE_PATTERN, (match, alt, path) => {
+        const src = `${backendURL}${path}`;
+        const srcset = PROXY_IMAGE_WIDTHS.map(w => `${src}?w=${w} ${w}w`).join(', ');
+        const safeAlt = alt.replace(/&/g, '&amp;').replace(/"/g, '&quot;').replace(/</g, '&lt;');
+        return `<img src="${src}?w=800" srcset="${srcset}" sizes="(max-width: 900px) 100vw, 800px" alt="${safeAlt}" loading="lazy" decoding="async">`;
+    });
+}
+
+function displayMarkdownPreview(markdown, isDraft = false, keepScroll = false) {
     const previewContent = document.getElementById('preview-content');
-    const html = marked.parse(markdown);
-    previewContent.innerHTML = html;
-    previewContent.scrollTop = 0;
+    const html = marked.parse(resolveProxyImages(markdown));
+    const banner = isDraft
+        ? '<div class="draft-banner">✏️ Quick draft. The detailed itinerary will replace it when ready.</div>'
+        : '';
+    const scrollTop = previewContent.scrollTop;
+    previewContent.innerHTML = banner + html;
+    previewContent.scrollTop = keepScroll ? scrollTop : 0;
+}
+
+async function pollRefinement(id) {
+    // A newer generation replaced this one
+    if (pendingRefinement !== id) return;
+
+    try {
+        const response = await fetch(`${backendURL}/api/plan/refined/${id}`);
+        if (response.status === 202) {
+            setTimeout(() => pollRefinement(id), REFINEMENT_POLL_MS);
+            return;
+        }
+        if (!response.ok) {
+            const error = await response.json();
+            throw new Error(error.detail || 'Refinement failed');
+        }
+
+        const data = await response.json();
+        if (pendingRefinement !== id) return;
+        pendingRefinement = null;
+        saveItinerary(data);
+
+        // Swap it in unless the user opened another itinerary meanwhile
+        if (currentItinerary?.itinerary?.generation?.progressive?.id === id) {
+            currentItinerary = data;
+            displayMarkdownPreview(data.markdown, false, true);
+        }
+
+        const progressive = data.itinerary.generation.progressive;
+        showStatus(`Detailed itinerary ready (draft after ${progressive.draft_seconds}s, full plan after ${progressive.refined_seconds}s)`, 'success');
+    } catch (error) {
+        console.error('Error refining itinerary:', error);
+        if (pendingRefinement === id) {
+            // The draft is still usable; keep it
+            pendingRefinement = null;
+            if (currentItinerary?.itinerary?.generation?.progressive?.id === id) {
+                saveItinerary(currentItinerary);
+            }
+            showStatus(`Could not refine the draft: ${error.message}`, 'error');
+        }
+    }
 }
 
 window.exportPDF = async function() {
@@ -359,10 +463,15 @@ async function checkBackendHealth() {
         const response = await fetch(`${backendURL}/health`);
         const data = await response.json();
 
+        const llmStatus = data.llm_loaded ? '| LLM: Ready ✓' : (data.model_missing ? '| LLM: No model' : '| LLM: Loading...');
         statusElement.innerHTML = `
             <span class="status-dot status-online"></span>
-            <span>Backend: Online ${data.llm_loaded ? '| LLM: Ready ✓' : '| LLM: Loading...'}</span>
+            <span>Backend: Online ${llmStatus}</span>
         `;
+        if (data.model_missing && !downloadPollTimer) {
+            document.getElementById('model-download').innerHTML =
+                `<button class="btn-download-model" onclick="startModelDownload()">⬇️ Download model</button>`;
+        }
     } catch (error) {
         console.error('Backend health check failed:', error);
         statusElement.innerHTML = `
@@ -372,6 +481,86 @@ async function checkBackendHealth() {
     }
 }
 
+// Models are downloaded by the backend (parallel, resumable, checksum
+// verified); the app only starts them and shows progress
+window.startModelDownload = async function(model = RECOMMENDED_MODEL) {
+    try {
+        const response = await fetch(`${backendURL}/api/models/download`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ model })
+        });
+        if (!response.ok) {
+            const error = await response.json();
+            throw new Error(error.detail || 'Failed to start the download');
+        }
+        pollModelDownloads();
+    } catch (error) {
+        showStatus(`Error: ${error.message}`, 'error');
+    }
+};
+
+async function pollModelDownloads() {
+    clearTimeout(downloadPollTimer);
+    downloadPollTimer = null;
+    try {
+        const response = await fetch(`${backendURL}/api/models/downloads`);
+        const data = await response.json();
+        if (renderModelDownloads(data.downloads)) {
+            downloadPollTimer = setTimeout(pollModelDownloads, 1000);
+        }
+    } catch (error) {
+        console.log('Download status unavailable:', error);
+    }
+}
+
+function formatBytes(bytes) {
+    if (bytes == null) return '?';
+    const units = ['B', 'KB', 'MB', 'GB'];
+    let i = 0;
+    while (bytes >= 1024 && i < units.length - 1) {
+        bytes /= 1024;
+        i++;
+    }
+    return `${bytes.toFixed(i ? 1 : 0)} ${units[i]}`;
+}
+
+// Returns true while a download is still running
+function renderModelDownloads(downloads) {
+    const element = document.getElementById('model-download');
+
+    downloads.forEach(d => {
+        const previous = downloadStates.get(d.name);
+        if (previous && previous !== d.state) {
+            if (d.state === 'done') {
+                showStatus(`Downloaded ${d.name}${d.checksum_verified ? ' (checksum verified)' : ''}`, 'success');
+                checkBackendHealth();
+            } else if (d.state === 'error') {
+                showStatus(`Model download failed: ${d.error}`, 'error');
+            }
+        }
+        downloadStates.set(d.name, d.state);
+    });
+
+    const active = downloads.find(d => ['pending', 'downloading', 'verifying'].includes(d.state));
+    if (!active) {
+        element.innerHTML = '';
+        return false;
+    }
+
+    const percent = active.percent || 0;
+    const eta = active.eta_seconds ? ` · ${Math.floor(active.eta_seconds / 60)}m ${active.eta_seconds % 60}s left` : '';
+    const detail = active.state === 'verifying'
+        ? 'verifying checksum...'
+        : `${percent.toFixed(1)}% · ${formatBytes(active.bytes_per_second)}/s${eta}`;
+    element.innerHTML = `
+        <span>⬇️ ${active.name}</span>
+        <div class="download-bar"><div class="download-bar-fill" style="width: ${percent}%"></div></div>
+        <span>${detail}</span>
+    `;
+    return true;
+}
+
 function showStatus(message, type) {
     const statusElement = document.getElementById('status-message');
     statusElement.textContent = message;